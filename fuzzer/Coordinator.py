@@ -0,0 +1,227 @@
+from types import NoneType
+import os
+import time
+import uuid
+import socket
+from fuzzer.Fuzzer import Result, GeneralException
+
+#the largest shard number SQLite can store.
+MAX_SHARDS = 2 ** 63 - 1
+
+class Coordinator(object):
+    """
+    Coordinator splits a keyspace into shards and hands them out to workers
+    on any number of hosts through leases stored in the fuzzer database.
+    A worker claims a shard, heartbeats while it works, and releases it once
+    every candidate has been yielded. Leases that are not renewed in time
+    expire and are claimed again, so the range of a crashed worker is
+    retried.
+
+    Methods:
+
+    public:
+        __init__(self, fuzzer_instance, keyspace,
+                 shard_size=100000, lease_timeout=300)
+        initialize(self)
+        claim(self, worker_id)
+        heartbeat(self, lease)
+        release(self, lease, completed=True)
+        progress(self)
+        work(self, worker_id=None, heartbeat_every=1000,
+             output_format="{fuzzed_string}")
+    """
+    def __init__(self, fuzzer_instance, keyspace,
+                 shard_size=100000, lease_timeout=300):
+        """
+        Arguments:
+
+        fuzzer_instance: The fuzzer whose database holds the leases. Every
+        worker must use the same database and table name.
+
+        keyspace: The keyspace to divide. Every worker must build the same
+        keyspace.
+
+        shard_size: The number of candidates in a shard.
+
+        lease_timeout: The number of seconds a lease is held without a
+        heartbeat before it can be claimed by another worker.
+        """
+        if not isinstance(shard_size, (int, long)) or shard_size < 1:
+            raise ValueError("`shard_size` must be a positive integer.")
+        self.fuzzer = fuzzer_instance
+        self.sql_engine = fuzzer_instance.sql_engine
+        self.keyspace = keyspace
+        self.shard_size = shard_size
+        self.lease_timeout = lease_timeout
+        self.table_name = fuzzer_instance.table_name + "_shards"
+        self.settings_table_name = (fuzzer_instance.table_name +
+                                    "_shard_settings")
+        self.shard_count = -(-keyspace.count // shard_size)
+    def initialize(self):
+        """
+        Create the shard tables, if there are not already ones. Call this
+        once before starting workers. Existing tables must have been created
+        for a keyspace of the same size and the same shard size.
+
+        Shards are only stored once they are claimed, and a shard's bounds
+        are computed from its number, so keyspaces of any size can be
+        divided.
+        """
+        try:
+            self.sql_engine.create_database(
+                           self.table_name,
+                           ("shard_id", "INTEGER PRIMARY KEY"),
+                           ("owner", "TEXT"),
+                           ("token", "TEXT"),
+                           ("lease_expires", "REAL"),
+                           ("completed", "BOOL")
+                           )
+        except self.fuzzer.sql_engine_module.TableAlreadyExists:
+            #the sizes are stored as text, as they may not fit in an INTEGER.
+            settings = list(self.sql_engine.read_query(
+                           "SELECT count, shard_size FROM %s;"
+                           % self.settings_table_name))
+            if settings != [(str(self.keyspace.count), str(self.shard_size))]:
+                raise KeyspaceMismatch("Table: `%s` was created for a\
+                                        different keyspace." % self.table_name)
+            return True
+        self.sql_engine.create_database(self.settings_table_name,
+                                        ("count", "TEXT"),
+                                        ("shard_size", "TEXT"))
+        self.sql_engine.write_query(
+            "INSERT INTO %s (count, shard_size) VALUES (?, ?);"
+            % self.settings_table_name,
+            (str(self.keyspace.count), str(self.shard_size))
+        )
+        return True
+    def claim(self, worker_id):
+        """
+        Lease the first shard that is neither completed nor held by a live
+        lease, or else the next shard that has not been claimed yet. Returns
+        a Lease, or None when there is nothing left to claim.
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        #single statements, so two workers can never claim the same shard.
+        self.sql_engine.write_query(
+            "UPDATE %s SET owner = ?, token = ?, lease_expires = ?\
+             WHERE shard_id = (SELECT shard_id FROM %s\
+                               WHERE completed = 0 AND\
+                                     (token IS NULL OR lease_expires < ?)\
+                               ORDER BY shard_id LIMIT 1);"
+            % (self.table_name, self.table_name),
+            (worker_id, token, now + self.lease_timeout, now)
+        )
+        claimed = list(self.sql_engine.read_query(
+                      "SELECT shard_id FROM %s WHERE token = ?;"
+                      % self.table_name, (token,)))
+        if len(claimed) == 0:
+            self.sql_engine.write_query(
+                "INSERT INTO %s (shard_id, owner, token, lease_expires,\
+                                 completed)\
+                 SELECT next_shard, ?, ?, ?, 0\
+                 FROM (SELECT COALESCE(MAX(shard_id) + 1, 0) AS next_shard\
+                       FROM %s)\
+                 WHERE next_shard < ?;"
+                % (self.table_name, self.table_name),
+                (worker_id, token, now + self.lease_timeout,
+                 min(self.shard_count, MAX_SHARDS))
+            )
+            claimed = list(self.sql_engine.read_query(
+                          "SELECT shard_id FROM %s WHERE token = ?;"
+                          % self.table_name, (token,)))
+        if len(claimed) == 0:
+            return None
+        shard_id = claimed[0][0]
+        start = shard_id * self.shard_size
+        stop = min(start + self.shard_size, self.keyspace.count)
+        return Lease(shard_id, start, stop, worker_id, token)
+    def heartbeat(self, lease):
+        """
+        Extend a lease. Returns False if the lease expired and was claimed by
+        another worker, in which case the shard should be abandoned.
+        """
+        return self.sql_engine.write_query(
+                   "UPDATE %s SET lease_expires = ?\
+                    WHERE shard_id = ? AND token = ?;" % self.table_name,
+                   (time.time() + self.lease_timeout, lease.shard_id,
+                    lease.token)
+               ) == 1
+    def release(self, lease, completed=True):
+        """
+        Give up a lease. If `completed` is True the shard is marked as done,
+        otherwise it is returned to be claimed again.
+        """
+        return self.sql_engine.write_query(
+                   "UPDATE %s SET token = NULL, lease_expires = NULL,\
+                    completed = ? WHERE shard_id = ? AND token = ?;"
+                   % self.table_name,
+                   (1 if completed else 0, lease.shard_id, lease.token)
+               ) == 1
+    def progress(self):
+        """
+        Return a tuple of the number of completed shards and the number of
+        shards in total.
+        """
+        completed = list(self.sql_engine.read_query(
+                        "SELECT COALESCE(SUM(completed), 0) FROM %s;"
+                        % self.table_name))[0][0]
+        return (completed, self.shard_count)
+    def work(self, worker_id=None, heartbeat_every=1000,
+             output_format="{fuzzed_string}"):
+        """
+        Claim shards until there are none left, yielding a Result for every
+        candidate in them. A shard is only marked completed once its last
+        result has been handled and the outcomes submitted so far are
+        committed, so a crashed worker's shard is retried.
+
+        Arguments:
+
+        worker_id: Recorded as the owner of claimed shards. Defaults to the
+        host name and process id.
+
+        heartbeat_every: The number of candidates between heartbeats. Keep
+        the time taken to check this many candidates well under
+        `lease_timeout`.
+
+        output_format: The format in which the fuzzed string sould be output.
+        """
+        if isinstance(worker_id, NoneType):
+            worker_id = "%s:%s" % (socket.gethostname(), os.getpid())
+        while True:
+            lease = self.claim(worker_id)
+            if isinstance(lease, NoneType):
+                return
+            lost = False
+            shard = self.keyspace[lease.start:lease.stop]
+            for number, fuzzed_string in enumerate(shard):
+                if number and number % heartbeat_every == 0:
+                    if not self.heartbeat(lease):
+                        #another worker owns the shard now.
+                        lost = True
+                        break
+                attempt = output_format.format(fuzzed_string=fuzzed_string)
+                yield Result(self.fuzzer, attempt,
+                             prohibited=self.keyspace.prohibit)
+            if not lost:
+                #a completed shard is never retried, so its outcomes must
+                #be in the database first.
+                self.fuzzer.commit_to_database()
+                self.release(lease)
+
+class Lease(object):
+    """
+    A claim on a shard of the keyspace, returned by `Coordinator.claim`.
+    """
+    def __init__(self, shard_id, start, stop, owner, token):
+        self.shard_id = shard_id
+        self.start = start
+        self.stop = stop
+        self.owner = owner
+        self.token = token
+
+class KeyspaceMismatch(GeneralException):
+    """
+    Raised when a shard table was created for a different keyspace.
+    """
+    pass
@@ -0,0 +1,203 @@
+import struct
+
+class Corpus(object):
+    """
+    Corpus keeps the inputs that reached new coverage, and mutates them into
+    new attempts. Every input is scheduled for a number of mutations, its
+    energy, which favors inputs that found more new features, small inputs
+    and inputs that were picked less often.
+
+    Methods:
+
+    public:
+        __init__(self, generator, max_length=4096)
+        __len__(self)
+        __iter__(self)
+        add(self, value, coverage, force=False)
+        energy(self, entry)
+        schedule(self)
+        mutate(self, value)
+    private:
+        _havoc(self, data)
+        _splice(self, data)
+    """
+    def __init__(self, generator, max_length=4096):
+        """
+        Arguments:
+
+        generator: The `random.Random` instance mutations are drawn from.
+
+        max_length: The longest input a mutation may produce.
+        """
+        if not isinstance(max_length, int) or max_length < 1:
+            raise ValueError("`max_length` must be a positive integer.")
+        self.generator = generator
+        self.max_length = max_length
+        self.entries = []
+        #every feature reached by any input so far.
+        self.features = set()
+    def __len__(self):
+        return len(self.entries)
+    def __iter__(self):
+        return iter(self.entries)
+    def add(self, value, coverage, force=False):
+        """
+        Keep `value` if its coverage reached a feature no kept input reached
+        before. Returns the new CorpusEntry, or None if it was not kept.
+
+        Arguments:
+
+        value: The input, a string of bytes.
+
+        coverage: A collection of the features, such as branch ids, the
+        input reached. Features must be hashable.
+
+        force: Keep the input even if nothing new was reached, for seeds.
+        """
+        features = frozenset(coverage)
+        new = features - self.features
+        if not new and not force:
+            return None
+        self.features.update(new)
+        entry = CorpusEntry(str(value), features, len(new))
+        self.entries.append(entry)
+        return entry
+    def energy(self, entry):
+        """
+        Return the number of mutations `entry` gets each time it is
+        scheduled.
+        """
+        energy = 16 * min(8, 1 + entry.new_features)
+        if len(entry.value) <= 64:
+            energy *= 2
+        elif len(entry.value) > 1024:
+            energy //= 2
+        #inputs that were mutated often have likely given what they can.
+        return max(1, energy // (1 + entry.picks // 4))
+    def schedule(self):
+        """
+        Yield corpus entries without end, each repeated for its energy.
+        Entries are cycled in order, and inputs added while cycling are
+        picked up in the same cycle.
+        """
+        while True:
+            if len(self.entries) == 0:
+                return
+            index = 0
+            while index < len(self.entries):
+                entry = self.entries[index]
+                entry.picks += 1
+                for repeat in xrange(self.energy(entry)):
+                    yield entry
+                index += 1
+    def mutate(self, value):
+        """
+        Return a mutated copy of `value`. Most mutations stack a few random
+        changes (havoc); some first splice in part of another input.
+        """
+        data = bytearray(value)
+        if len(self.entries) > 1 and self.generator.random() < 0.1:
+            data = self._splice(data)
+        data = self._havoc(data)
+        return str(data[:self.max_length])
+
+    def _havoc(self, data):
+        """
+        Apply a random stack of 1 to 16 mutations to `data`.
+        """
+        generator = self.generator
+        for count in xrange(1 << generator.randint(0, 4)):
+            data = generator.choice(MUTATIONS)(data, generator)
+        return data
+    def _splice(self, data):
+        """
+        Join a prefix of `data` with a suffix of another corpus input.
+        """
+        other = bytearray(self.generator.choice(self.entries).value)
+        return (data[:self.generator.randint(0, len(data))] +
+                other[self.generator.randint(0, len(other)):])
+
+class CorpusEntry(object):
+    """
+    An input kept in a Corpus, with the features it reached.
+    """
+    def __init__(self, value, features, new_features):
+        self.value = value
+        self.features = features
+        #the number of features it was the first input to reach.
+        self.new_features = new_features
+        #the number of times it was scheduled for mutation.
+        self.picks = 0
+
+#byte values that often sit on boundaries in parsers.
+INTERESTING_BYTES = [0x00, 0x01, 0x10, 0x20, 0x40, 0x64, 0x7f, 0x80, 0xff]
+INTERESTING_WORDS = [0, 0x80, 0xff, 0x100, 0x200, 0x3e8, 0x7fff, 0x8000,
+                     0xffff]
+
+def _flip_bit(data, generator):
+    if len(data) == 0:
+        return _insert_bytes(data, generator)
+    bit = generator.randrange(len(data) * 8)
+    data[bit >> 3] ^= 1 << (bit & 7)
+    return data
+
+def _random_byte(data, generator):
+    if len(data) == 0:
+        return _insert_bytes(data, generator)
+    data[generator.randrange(len(data))] = generator.randrange(256)
+    return data
+
+def _interesting_byte(data, generator):
+    if len(data) == 0:
+        return _insert_bytes(data, generator)
+    data[generator.randrange(len(data))] = generator.choice(INTERESTING_BYTES)
+    return data
+
+def _interesting_word(data, generator):
+    if len(data) < 2:
+        return _insert_bytes(data, generator)
+    position = generator.randrange(len(data) - 1)
+    data[position:position + 2] = struct.pack(
+                                      generator.choice("<>") + "H",
+                                      generator.choice(INTERESTING_WORDS))
+    return data
+
+def _arithmetic(data, generator):
+    if len(data) == 0:
+        return _insert_bytes(data, generator)
+    position = generator.randrange(len(data))
+    data[position] = (data[position] + generator.randint(-35, 35)) % 256
+    return data
+
+def _insert_bytes(data, generator):
+    position = generator.randint(0, len(data))
+    if generator.random() < 0.5:
+        inserted = bytearray(generator.randrange(256)
+                             for count in xrange(generator.randint(1, 4)))
+    else:
+        #repeat one byte, like a run of padding.
+        inserted = bytearray([generator.randrange(256)] *
+                             generator.randint(1, 32))
+    data[position:position] = inserted
+    return data
+
+def _delete_bytes(data, generator):
+    if len(data) < 2:
+        return data
+    position = generator.randrange(len(data))
+    del data[position:position + generator.randint(1, len(data) - position)]
+    return data
+
+def _duplicate_bytes(data, generator):
+    if len(data) == 0:
+        return _insert_bytes(data, generator)
+    position = generator.randrange(len(data))
+    chunk = data[position:position + generator.randint(1, 16)]
+    target = generator.randint(0, len(data))
+    data[target:target] = chunk
+    return data
+
+#the mutations havoc chooses from. Each takes a bytearray and a generator,
+#and returns the mutated bytearray.
+MUTATIONS = [_flip_bit, _random_byte, _interesting_byte, _interesting_word,
+             _arithmetic, _insert_bytes, _delete_bytes, _duplicate_bytes]
@@ -0,0 +1,271 @@
+from types import NoneType
+from fuzzer.Harness import TargetCrashed, TargetTimeout
+import atexit
+import os
+import select
+import shutil
+import signal
+import struct
+import subprocess
+import tempfile
+import time
+try:
+    import ctypes
+    _libc = ctypes.CDLL(None, use_errno=True)
+except (ImportError, OSError, AttributeError):
+    #without prctl, targets are only cleaned up when their worker exits.
+    _libc = None
+
+class Executor(object):
+    """
+    Executor runs an external program on attempts, as a target for
+    `Fuzzer.run`. Attempts are given to the program on stdin, in a file, or
+    as an argument. In persistent mode the program is started once and
+    handles attempt after attempt, so no process is created per attempt.
+    The outcome comes from the exit status, and a program killed by a
+    signal is reported as a crash.
+
+    Methods:
+
+    public:
+        __init__(self, command, mode="stdin", persistent=False,
+                 delimiter=None, timeout=None, success_codes=(0,))
+        __call__(self, attempt)
+        close(self)
+    private:
+        _arguments(self, attempt)
+        _run_once(self, attempt)
+        _run_persistent(self, attempt)
+        _spawn(self, arguments, stdin)
+        _read(self, process, deadline, until_line)
+        _finish(self, process, killed=False)
+    """
+    def __init__(self, command, mode="stdin", persistent=False,
+                 delimiter=None, timeout=None, success_codes=(0,)):
+        """
+        Arguments:
+
+        command: The program and its arguments, as a list.
+
+        mode: How an attempt is given to the program. "stdin" writes it to
+        the program's standard input. "file" writes it to a temporary file
+        and replaces "@@" in `command` with its path. "argv" replaces "@@"
+        in `command` with the attempt itself.
+
+        persistent: If True, the program is started once and kept running.
+        It must read attempts from stdin, each sent as its length in 4 bytes
+        (big endian) followed by the attempt, and answer every attempt with
+        a line holding its status code. If it exits, it is started again for
+        the next attempt. Only for "stdin" mode.
+
+        delimiter: Send every attempt followed by this instead of its
+        length, for programs that read an attempt per line. Attempts that
+        contain it raise ValueError, as the program would read them as two.
+
+        timeout: The number of seconds an attempt may run before the program
+        is killed and TargetTimeout is raised. Keep it below the timeout of
+        `Fuzzer.run`. None waits forever.
+
+        success_codes: The exit statuses, or persistent status codes, that
+        mean the attempt succeeded.
+        """
+        if not isinstance(command, list) or len(command) == 0:
+            raise TypeError("`command` must be a non-empty list.")
+        if mode not in ("stdin", "file", "argv"):
+            raise ValueError("`mode` must be \"stdin\", \"file\" or \"argv\".")
+        if mode != "stdin" and "@@" not in command:
+            raise ValueError("`command` must contain \"@@\" in %s mode."
+                             % mode)
+        if persistent and mode != "stdin":
+            raise ValueError("Persistent mode needs \"stdin\" mode.")
+        if not isinstance(delimiter, (NoneType, str)) or delimiter == "":
+            raise ValueError("`delimiter` must be a non-empty string.")
+        self.command = command
+        self.mode = mode
+        self.persistent = persistent
+        self.delimiter = delimiter
+        self.timeout = timeout
+        self.success_codes = success_codes
+        #the running program in persistent mode, started on first use so
+        #every forked worker gets its own.
+        self.process = None
+        #output of the persistent program read past the last status line.
+        self.pending = ""
+        #the attempt files of every worker are kept in one directory made
+        #by this process, so it can remove those of killed workers too.
+        self.directory = None
+        self.owner = os.getpid()
+        if mode == "file":
+            self.directory = tempfile.mkdtemp(prefix="fuzzer")
+            atexit.register(shutil.rmtree, self.directory, True)
+    def __call__(self, attempt):
+        """
+        Run the program on an attempt, returning True if its status is in
+        `success_codes`. Raises TargetCrashed when a signal killed it, and
+        TargetTimeout when it ran past the timeout.
+        """
+        if self.persistent:
+            return self._run_persistent(attempt)
+        return self._run_once(attempt)
+    def close(self):
+        """
+        Stop the persistent program and remove the attempt file, if any.
+        Called in the process that created the executor, it removes the
+        attempt files of every worker, so those of killed workers are not
+        left behind. The directory holding them is removed at exit.
+        """
+        if not isinstance(self.process, NoneType):
+            if self.process.poll() is None:
+                self.process.kill()
+            self._finish(self.process, killed=True)
+            self.process = None
+        if not isinstance(self.directory, NoneType):
+            if os.getpid() == self.owner:
+                names = os.listdir(self.directory)
+            else:
+                names = [str(os.getpid())]
+            for name in names:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    #the attempt file was never written.
+                    pass
+
+    def _arguments(self, attempt):
+        """
+        Return the command for an attempt, with "@@" replaced.
+        """
+        if self.mode == "stdin":
+            return self.command
+        if self.mode == "file":
+            #one file per process, so forked workers do not share one.
+            path = os.path.join(self.directory, str(os.getpid()))
+            with open(path, "wb") as attempt_file:
+                attempt_file.write(attempt)
+            attempt = path
+        return list(attempt if argument == "@@" else argument
+                    for argument in self.command)
+    def _run_once(self, attempt):
+        """
+        Start the program for one attempt and wait for it to exit.
+        """
+        process = self._spawn(self._arguments(attempt),
+                              self.mode == "stdin")
+        if self.mode == "stdin":
+            try:
+                process.stdin.write(attempt)
+            except IOError:
+                #the program exited without reading all of it.
+                pass
+            process.stdin.close()
+        deadline = None
+        if not isinstance(self.timeout, NoneType):
+            deadline = time.time() + self.timeout
+        #the program holds stdout open until it exits.
+        self._read(process, deadline, False)
+        return self._finish(process) in self.success_codes
+    def _run_persistent(self, attempt):
+        """
+        Send an attempt to the running program and read its status line.
+        """
+        if isinstance(self.delimiter, NoneType):
+            message = struct.pack(">I", len(attempt)) + attempt
+        elif self.delimiter in attempt:
+            raise ValueError("The attempt contains the delimiter %r."
+                             % self.delimiter)
+        else:
+            message = attempt + self.delimiter
+        if isinstance(self.process, NoneType):
+            self.process = self._spawn(self.command, True)
+            self.pending = ""
+        process = self.process
+        deadline = None
+        if not isinstance(self.timeout, NoneType):
+            deadline = time.time() + self.timeout
+        try:
+            process.stdin.write(message)
+            process.stdin.flush()
+        except IOError:
+            pass
+        line = self._read(process, deadline, True)
+        if line.endswith("\n"):
+            try:
+                return int(line) in self.success_codes
+            except ValueError:
+                self.close()
+                raise ValueError("The program answered %r instead of a\
+                                  status code." % line)
+        #it exited instead of answering, start it again next time.
+        self.process = None
+        return self._finish(process) in self.success_codes
+    def _spawn(self, arguments, stdin):
+        """
+        Start the program. Its output is piped back, and on Linux it is
+        killed if the worker running it dies.
+        """
+        return subprocess.Popen(arguments,
+                                stdin=subprocess.PIPE if stdin else None,
+                                stdout=subprocess.PIPE,
+                                #closing every descriptor is slow, so it is
+                                #only done for programs that stay running.
+                                close_fds=self.persistent,
+                                preexec_fn=_die_with_parent)
+    def _read(self, process, deadline, until_line):
+        """
+        Read the program's output until it closes stdout, or until the end
+        of a line when `until_line` is set. The program is killed and
+        TargetTimeout raised at the deadline. Output is read straight from
+        the pipe, so a partial line never blocks past the deadline, and
+        anything after the line is kept for the next read.
+        """
+        output = []
+        if until_line:
+            output.append(self.pending)
+            self.pending = ""
+            if "\n" in output[0]:
+                line, self.pending = output[0].split("\n", 1)
+                return line + "\n"
+        descriptor = process.stdout.fileno()
+        while True:
+            wait = None
+            if not isinstance(deadline, NoneType):
+                wait = max(0, deadline - time.time())
+            if not select.select([descriptor], [], [], wait)[0]:
+                process.kill()
+                self._finish(process, killed=True)
+                if process is self.process:
+                    self.process = None
+                raise TargetTimeout("The program ran past %s seconds."
+                                    % self.timeout)
+            chunk = os.read(descriptor, 65536)
+            if not chunk:
+                return "".join(output)
+            output.append(chunk)
+            if until_line and "\n" in chunk:
+                line, self.pending = "".join(output).split("\n", 1)
+                return line + "\n"
+    def _finish(self, process, killed=False):
+        """
+        Wait for the program to exit and return its exit status. Raises
+        TargetCrashed if a signal ended it, unless it was `killed` by us.
+        """
+        for pipe in (process.stdin, process.stdout):
+            if not isinstance(pipe, NoneType):
+                pipe.close()
+        status = process.wait()
+        if status < 0 and not killed:
+            raise TargetCrashed("The program was killed by signal %s."
+                                % -status)
+        return status
+
+def _die_with_parent():
+    """
+    Ask Linux to kill the program when the process that started it dies,
+    so killed workers do not leave it running.
+    """
+    if not isinstance(_libc, NoneType):
+        try:
+            #PR_SET_PDEATHSIG
+            _libc.prctl(1, signal.SIGKILL)
+        except AttributeError:
+            pass
@@ -1,7 +1,26 @@
 from types import NoneType
 import fuzzer.sqlengines.sqliteengine as SQLiteEngine
+from fuzzer.Keyspace import Keyspace, Permutation, prune_alphabet, \
+                            compile_output_format, encode_alphabet, \
+                            character_table, CachedEvaluator, parse_mask, \
+                            LengthSweep
+from fuzzer.Wordlist import Wordlist
+from fuzzer.Grammar import Grammar, parse_bnf
+from fuzzer.Corpus import Corpus
+from fuzzer.Harness import Harness, ThreadedHarness
 import random
+import sys
+import ast
+import hashlib
 import datetime
+import time
+import collections
+import multiprocessing
+try:
+    import numpy
+except ImportError:
+    #numpy is optional, random batches fall back to pure Python without it.
+    numpy = None
 
 class Fuzzer(object):
     """
@@ -16,20 +35,97 @@ class Fuzzer(object):
                  cache_tablenames=True,
                  sql_engine=SQLiteEngine,
                  table_name=datetime.datetime.today().strftime(
-                                                     "attempts%m%d%y"))
+                                                     "attempts%m%d%y"),
+                 engine_options=None, schema="text", deduplicate=False)
         initialize(self)
+        migrate(self, source_table, chunk_size=10000)
         commit_to_database(self)
+        close(self)
         sequential_fuzz(self, prohibit=None, length=5,
                         output_format="{fuzzed_string}",
                         character_evaluator=chr,
-                        minimum=0, maximum=255)
+                        minimum=0, maximum=255,
+                        resume=False, checkpoint_every=None,
+                        mode="text", element_width=1, byteorder="big",
+                        reuse_buffer=False, pure_evaluator=False,
+                        evaluator_cache_size=None, mask=None, charsets=None,
+                        min_length=None, max_length=None)
+        sequential_fuzz_batches(self, batch_size=1024, prohibit=None,
+                                length=5, output_format="{fuzzed_string}",
+                                character_evaluator=chr,
+                                minimum=0, maximum=255, pure_evaluator=False,
+                                evaluator_cache_size=None, mask=None,
+                                charsets=None, min_length=None,
+                                max_length=None)
+        parallel_sequential_fuzz(self, check, workers=None,
+                                 successes_only=False, shard_size=10000,
+                                 prohibit=None, length=5,
+                                 output_format="{fuzzed_string}",
+                                 character_evaluator=chr,
+                                 minimum=0, maximum=255,
+                                 pure_evaluator=False,
+                                 evaluator_cache_size=None, mask=None,
+                                 charsets=None, min_length=None,
+                                 max_length=None)
+        mask_fuzz(self, mask, charsets=None, prohibit=None,
+                  output_format="{fuzzed_string}",
+                  resume=False, checkpoint_every=None,
+                  mode="text", reuse_buffer=False,
+                  min_length=None, max_length=None)
+        mask_keyspace(self, mask, charsets=None, prohibit=None,
+                      min_length=None, max_length=None)
         random_fuzz(self, prohibit=None, length=5,
                     output_format="{fuzzed_string}",
                     character_evaluator=chr,
-                    minimum=0, maximum=255)
+                    minimum=0, maximum=255,
+                    seed=None, stream_id=0, unique=False,
+                    mode="text", element_width=1, byteorder="big",
+                    pure_evaluator=False, evaluator_cache_size=None)
+        random_fuzz_batches(self, batch_size=1024, prohibit=None,
+                            length=5, output_format="{fuzzed_string}",
+                            character_evaluator=chr,
+                            minimum=0, maximum=255, vectorized=True,
+                            seed=None, stream_id=0)
+        wordlist_fuzz(self, path, rules=None, prohibit=None,
+                      output_format="{fuzzed_string}", chunk_size=1048576)
+        wordlist_fuzz_batches(self, path, rules=None, prohibit=None,
+                              output_format="{fuzzed_string}",
+                              chunk_size=1048576)
+        grammar_fuzz(self, grammar, start="<start>", max_depth=10,
+                     strategy="breadth", seed=None, stream_id=0,
+                     prohibit=None, output_format="{fuzzed_string}")
+        coverage_fuzz(self, seeds=None, iterations=None, max_length=4096,
+                      seed=None, stream_id=0, resume=False,
+                      output_format="{fuzzed_string}")
+        run(self, target, generator, workers=None, timeout=10)
+        arun(self, target, generator, concurrency=100)
     private:
-        _increment(self, values, minimum=0,
-                   maximum=255, reset=True)
+        _validate_arguments(self, prohibit, output_format,
+                            character_evaluator, minimum, maximum,
+                            mode="text")
+        _validate_output(self, prohibit, output_format)
+        _sequential_keyspace(self, prohibit, length, character_evaluator,
+                             minimum, maximum, pure_evaluator,
+                             evaluator_cache_size, mask, charsets,
+                             min_length, max_length)
+        _prohibit_id(self, prohibit)
+        _prohibit_list(self, prohibit_id)
+        _tailed_result(self, row)
+        _checkpoint_configuration(self, **parameters)
+        _initialize_checkpoints(self)
+        _load_checkpoint(self, configuration)
+        _save_checkpoint(self, configuration, position)
+        _initialize_corpus(self)
+        _load_corpus(self)
+        _save_corpus_entry(self, entry)
+        _initialize_crashes(self)
+        _save_crash(self, attempt, kind, detail)
+        _dispatch(self, generator)
+        _submit_outcomes(self, outcomes)
+        _random_rows(self, batch_size, prohibit, length,
+                     character_evaluator, minimum, maximum, seed)
+        _numpy_random_rows(self, batch_size, prohibit, length,
+                           character_evaluator, minimum, maximum, seed)
 
     """
     def __init__(self, database="fuzzerdb.db",
@@ -37,84 +133,337 @@ class Fuzzer(object):
                  cache_tablenames=True,
                  sql_engine=SQLiteEngine,
                  table_name=datetime.datetime.today().strftime(
-                                                     "attempts%m%d%y")):
+                                                     "attempts%m%d%y"),
+                 engine_options=None, schema="text", deduplicate=False):
+        #"text" stores every value as its repr, as older tables do. "compact"
+        #stores candidates as BLOBs, outcomes and times as integers, and
+        #prohibit lists once in a lookup table.
+        if schema not in ("text", "compact"):
+            raise ValueError("`schema` must be \"text\" or \"compact\".")
+        if deduplicate and schema != "compact":
+            raise ValueError("`deduplicate` needs the compact schema.")
+        self.schema = schema
+        self.deduplicate = deduplicate
+        #prohibit list reprs to their ids in the lookup table, and back.
+        self.prohibit_ids = {}
+        self.prohibit_lists = {}
         #needed so that we can catch exceptions thrown
         self.sql_engine_module = sql_engine
-        #needed for persistant storage.
+        #needed for persistant storage. engine_options are passed on as
+        #they are, as every engine has its own, e.g. the writer thread and
+        #connection pragmas of the SQLite engine.
+        if isinstance(engine_options, NoneType):
+            engine_options = {}
         self.sql_engine = sql_engine.SQLEngine(database,
-                                               tables_to_cache=cache_tablenames)
+                                               tables_to_cache=cache_tablenames,
+                                               **engine_options)
         self.table_name = table_name
+        if schema == "compact":
+            self.sql_engine.store_raw(table_name)
     def initialize(self):
         """
-        Initialize the database table, if there is not already one.
+        Initialize the database table, if there is not already one. With the
+        compact schema, the prohibit lookup table is created too, and with
+        `deduplicate` a candidate already in the table is not stored again.
+        The layout of an existing table is not changed.
         """
+        if self.schema == "compact":
+            try:
+                self.sql_engine.create_database(
+                               self.table_name + "_prohibits",
+                               ("prohibit_id", "INTEGER PRIMARY KEY"),
+                               ("prohibited", "TEXT UNIQUE")
+                               )
+            except self.sql_engine_module.TableAlreadyExists:
+                pass
+            columns = [("attempt_id", "INTEGER PRIMARY KEY"),
+                       ("attempted", "BLOB UNIQUE ON CONFLICT IGNORE"
+                                     if self.deduplicate else "BLOB"),
+                       ("prohibit_id", "INTEGER"),
+                       ("successful", "INTEGER"),
+                       #seconds since the epoch.
+                       ("created_at", "INTEGER")]
+        else:
+            columns = [("attempt_id", "INTEGER PRIMARY KEY"),
+                       ("attempted", "TEXT"),
+                       ("prohibited", "TEXT"),
+                       ("successful", "BOOL"),
+                       ("created_at", "TEXT"),
+                       ("updated_at", "TEXT")]
         try:
-            self.sql_engine.create_database(
-                           self.table_name,
-                           ("attempt_id", "INTEGER PRIMARY KEY"),
-                           ("attempted", "TEXT"),
-                           ("prohibited", "TEXT"),
-                           ("successful", "BOOL"),
-                           ("created_at", "TEXT"),
-                           ("updated_at", "TEXT")
-                           )
+            self.sql_engine.create_database(self.table_name, *columns)
         except self.sql_engine_module.TableAlreadyExists:
             pass
         return True
+    def migrate(self, source_table, chunk_size=10000):
+        """
+        Copy the rows of a table in the text schema, such as an older
+        `attemptsMMDDYY` table, into this fuzzer's compact table, in order.
+        The source table is left as it is. Returns the number of rows read.
+
+        Arguments:
+
+        source_table: The name of the table to copy from.
+
+        chunk_size: The number of rows copied per transaction.
+        """
+        if self.schema != "compact":
+            raise ValueError("Rows can only be migrated to the compact schema.")
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError("`chunk_size` must be a positive integer.")
+        self.initialize()
+        query = "INSERT INTO %s (attempted, prohibit_id, successful,\
+                 created_at) VALUES (?, ?, ?, ?);" % self.table_name
+        migrated = 0
+        last_id = -1
+        #prohibit lists and times repeat across rows, so each is parsed once.
+        prohibit_ids = {}
+        times = {}
+        while True:
+            rows = list(self.sql_engine.read_query(
+                       "SELECT attempt_id, attempted, prohibited, successful,\
+                        created_at FROM %s WHERE attempt_id > ?\
+                        ORDER BY attempt_id LIMIT ?;" % source_table,
+                       (last_id, chunk_size)))
+            if len(rows) == 0:
+                return migrated
+            converted = []
+            for attempt_id, attempted, prohibited, successful, created_at \
+                in rows:
+                if prohibited not in prohibit_ids:
+                    prohibit_ids[prohibited] = self._prohibit_id(
+                        _unrepr(prohibited or "''") or None)
+                if created_at not in times:
+                    try:
+                        times[created_at] = int(time.mktime(time.strptime(
+                                                _unrepr(created_at), "%c")))
+                    except (ValueError, SyntaxError, TypeError):
+                        #times written in another locale are not kept.
+                        times[created_at] = None
+                converted.append((_blob(_unrepr(attempted)),
+                                  prohibit_ids[prohibited],
+                                  int(successful in ("True", 1, "1")),
+                                  times[created_at]))
+            self.sql_engine.write_many(query, converted)
+            migrated += len(rows)
+            last_id = rows[-1][0]
     def commit_to_database(self):
         """
         Trigger SQL engine to commit all values awaiting insertion.
         """
         self.sql_engine.commit_pool()
+    def close(self):
+        """
+        Stop the SQL engine's writer thread, if any, commit all values
+        awaiting insertion and close the calling thread's connection.
+        """
+        self.sql_engine.close()
 
-    def _increment(self, values, minimum=0,
-                   maximum=255, reset=True):
+    def _validate_arguments(self, prohibit, output_format,
+                            character_evaluator, minimum, maximum,
+                            mode="text"):
         """
-        Handles incrementation of a list in place.
+        Make sure the generation arguments are the correct type to prevent
+        undefined behavior. Raises on the first invalid argument.
+        """
+        if not isinstance(minimum, int):
+            raise TypeError("`minimum` must be an integer.")
+        if not isinstance(maximum, int):
+            raise TypeError("`maximum` must be an integer.")
+        if minimum > maximum:
+            raise ValueError("`minimum` must be less than `maximum`.")
+        if mode not in ("text", "bytes"):
+            raise ValueError("`mode` must be \"text\" or \"bytes\".")
+        #bytes mode packs numbers itself, the evaluator is not used.
+        if maximum > 255 and character_evaluator == chr and mode == "text":
+            raise TooHighForChr("`maximum` is too large for chr,\
+                                 must be between 0 and 255.")
+        self._validate_output(prohibit, output_format)
+    def _validate_output(self, prohibit, output_format):
+        """
+        Make sure `prohibit` and `output_format` are the correct type.
+        Raises on the first invalid argument.
+        """
+        if not isinstance(output_format, str):
+            raise TypeError("output_format should be a string.")
+        if not isinstance(prohibit, NoneType):
+            if not isinstance(prohibit, list):
+                raise TypeError("`prohibit` must be a list.")
+            else:
+                for value in prohibit:
+                    if not isinstance(value, str):
+                        raise TypeError("Values in prohibit must be a string.")
+                    else:
+                        if len(value) > 1:
+                            raise ValueError("Values in prohibit must only be\
+                                              one character long.")
 
-        Arguments:
+    def _prohibit_id(self, prohibit):
+        """
+        Return the id of a prohibit list in the lookup table, adding it on
+        first use.
+        """
+        key = "" if isinstance(prohibit, NoneType) else repr(prohibit)
+        if key not in self.prohibit_ids:
+            self.sql_engine.write_query(
+                "INSERT OR IGNORE INTO %s_prohibits (prohibited) VALUES (?);"
+                % self.table_name, (key,))
+            for result in self.sql_engine.read_query(
+                    "SELECT prohibit_id FROM %s_prohibits WHERE prohibited = ?;"
+                    % self.table_name, (key,)):
+                self.prohibit_ids[key] = result[0]
+        return self.prohibit_ids[key]
+    def _prohibit_list(self, prohibit_id):
+        """
+        Return the prohibit list of an id in the lookup table.
+        """
+        if prohibit_id not in self.prohibit_lists:
+            for result in self.sql_engine.read_query(
+                    "SELECT prohibited FROM %s_prohibits WHERE prohibit_id = ?;"
+                    % self.table_name, (prohibit_id,)):
+                self.prohibit_lists[prohibit_id] = \
+                    ast.literal_eval(result[0]) if result[0] else None
+        return self.prohibit_lists.get(prohibit_id)
+    def _checkpoint_configuration(self, **parameters):
+        """
+        Turn generation parameters into the text checkpoints are stored
+        under. Evaluators are identified by their module and name, so only
+        functions that can be found again by them are accepted.
+        """
+        evaluator = parameters.get("character_evaluator")
+        if not isinstance(evaluator, NoneType):
+            module = getattr(evaluator, "__module__", None)
+            name = getattr(evaluator, "__name__", None)
+            #lambdas, nested functions and methods could share a name with
+            #another evaluator, and so a checkpoint.
+            if not isinstance(name, str) or \
+               getattr(sys.modules.get(module), name, None) is not evaluator:
+                raise ValueError("Checkpoints need a `character_evaluator`\
+                                  defined at the top level of a module.")
+            #builtins keep their bare name, as older checkpoints use it.
+            parameters["character_evaluator"] = name \
+                if module == "__builtin__" else "%s.%s" % (module, name)
+        return repr(sorted(parameters.items()))
+    def _initialize_checkpoints(self):
+        """
+        Create the checkpoint table, if there is not already one.
+        """
+        try:
+            self.sql_engine.create_database(
+                           self.table_name + "_checkpoints",
+                           ("checkpoint_id", "INTEGER PRIMARY KEY"),
+                           ("configuration", "TEXT UNIQUE"),
+                           #stored as text, positions can exceed 64 bits.
+                           ("position", "TEXT"),
+                           ("updated_at", "TEXT")
+                           )
+        except self.sql_engine_module.TableAlreadyExists:
+            pass
+        return True
+    def _load_checkpoint(self, configuration):
+        """
+        Return the last checkpointed position for a configuration, or 0 if
+        there is none.
+        """
+        for result in self.sql_engine.read_query(
+                "SELECT position FROM %s_checkpoints WHERE configuration = ?;"
+                % self.table_name, (configuration,)):
+            return int(result[0])
+        return 0
+    def _save_checkpoint(self, configuration, position):
+        """
+        Record the position for a configuration, replacing the previous one.
+        The outcomes of the candidates before it are committed first, so a
+        resumed run never skips outcomes that were lost.
+        """
+        self.commit_to_database()
+        self.sql_engine.write_query(
+            "INSERT OR REPLACE INTO %s_checkpoints\
+             (configuration, position, updated_at) VALUES (?, ?, ?);"
+            % self.table_name,
+            (configuration, str(position),
+             datetime.datetime.now().strftime("%c"))
+        )
+        return True
 
-        values: This is the list that will be incremented. Should only
-        be integers in the list.
-
-        minimum: This is used for resetting values in the list once
-        they have hit the maximum.
-
-        maximum: This is used for determining if the list is completely
-        incremented, as well as determining to reset or not.
-
-        reset: This is used to tell the incrementor to reset a value at
-        it's maximum or not.
-        """
-        if values[0] >= maximum:
-            #first index hit its maximum, check if the rest are maxed
-            done = False
-            for value in values:
-                if value < maximum:
-                    #there is a value not maxed, incrementation continues
-                    done = False
-                    break
-                elif value >= maximum:
-                    done = True
-            #all values have been maxed, finish the function
-            if done:
-                return True
-        for index, value in enumerate(reversed(values)):
-            if value >= maximum:
-                if reset:
-                    #reset the index and jump to next iteration
-                    values[(len(values)-1)-index] = minimum
-                    continue
-            elif value < maximum:
-                #increment, there still might be more to increment, so assume
-                #not done.
-                values[(len(values)-1)-index] += 1
-                return False
+    def _initialize_corpus(self):
+        """
+        Create the corpus table, if there is not already one.
+        """
+        try:
+            self.sql_engine.create_database(
+                           self.table_name + "_corpus",
+                           ("entry_id", "INTEGER PRIMARY KEY"),
+                           #hex encoded, inputs are arbitrary bytes.
+                           ("value", "TEXT"),
+                           ("features", "TEXT"),
+                           ("new_features", "INTEGER"),
+                           ("created_at", "TEXT")
+                           )
+        except self.sql_engine_module.TableAlreadyExists:
+            pass
+        return True
+    def _load_corpus(self):
+        """
+        Return the saved corpus inputs in the order they were found, as
+        (value, features, new_features) tuples.
+        """
+        return list((value.decode("hex"), ast.literal_eval(features),
+                     new_features)
+                    for value, features, new_features in
+                    self.sql_engine.read_query(
+                        "SELECT value, features, new_features FROM %s_corpus\
+                         ORDER BY entry_id;" % self.table_name))
+    def _save_corpus_entry(self, entry):
+        """
+        Record an input kept in the corpus.
+        """
+        self.sql_engine.write_query(
+            "INSERT INTO %s_corpus (value, features, new_features, created_at)\
+             VALUES (?, ?, ?, ?);" % self.table_name,
+            (entry.value.encode("hex"), repr(sorted(entry.features)),
+             entry.new_features, datetime.datetime.now().strftime("%c"))
+        )
+        return True
+
+    def _initialize_crashes(self):
+        """
+        Create the crash table, if there is not already one.
+        """
+        try:
+            self.sql_engine.create_database(
+                           self.table_name + "_crashes",
+                           ("crash_id", "INTEGER PRIMARY KEY"),
+                           #the repr of the attempt, exact for any bytes.
+                           ("attempted", "TEXT"),
+                           ("kind", "TEXT"),
+                           ("detail", "TEXT"),
+                           ("created_at", "TEXT")
+                           )
+        except self.sql_engine_module.TableAlreadyExists:
+            pass
+        return True
+    def _save_crash(self, attempt, kind, detail):
+        """
+        Record an attempt that crashed, hung, or raised in the target.
+        """
+        self.sql_engine.write_query(
+            "INSERT INTO %s_crashes (attempted, kind, detail, created_at)\
+             VALUES (?, ?, ?, ?);" % self.table_name,
+            (repr(attempt), kind, detail,
+             datetime.datetime.now().strftime("%c"))
+        )
+        return True
 
     def sequential_fuzz(self, prohibit=None, length=5, 
                         output_format="{fuzzed_string}",
                         character_evaluator=chr,
-                        minimum=0, maximum=255):
+                        minimum=0, maximum=255,
+                        resume=False, checkpoint_every=None,
+                        mode="text", element_width=1, byteorder="big",
+                        reuse_buffer=False, pure_evaluator=False,
+                        evaluator_cache_size=None, mask=None, charsets=None,
+                        min_length=None, max_length=None):
         """
         Generates all possibilities sequentially with a given length.
 
@@ -123,8 +472,9 @@ class Fuzzer(object):
         length: The length of the fuzzed string. Does not pertain to length
         of output_format.
 
-        prohibit: A list of prohibited characters. Any results generated
-        with a character in this list will be skipped and not returned.
+        prohibit: A list of prohibited characters. They are removed from the
+        characters the fuzzed string is built from, so no result containing
+        one is ever generated.
 
         output_format: The format in which the fuzzed string sould be output.
         This requires the format variable `fuzzed_string` to be present in
@@ -143,73 +493,305 @@ class Fuzzer(object):
         list that will be generated. This directly translates into the highest
         character that will be generated in the result.
 
+        resume: If True, continue from the last checkpoint saved for the
+        same parameters instead of the first candidate. Checkpoints tell
+        evaluators apart by module and name, so `character_evaluator` must
+        be a builtin or defined at the top level of a module.
+
+        checkpoint_every: The number of candidates between checkpoints of
+        the position into the database. A checkpoint records that every
+        candidate before it has been handled, and commits their outcomes
+        first. Through `run` or `arun`, it records the lowest candidate
+        whose outcome is not in yet. Defaults to no checkpoints.
+
+        mode: "text" builds strings with `character_evaluator` and
+        `output_format.format`. "bytes" packs every number straight into
+        `element_width` bytes and places it into `output_format` compiled
+        once, which is much faster. In bytes mode `maximum` may exceed 255,
+        `character_evaluator` is not used, and `prohibit` matches numbers
+        by their ordinal.
+
+        element_width: The number of bytes every number is packed into in
+        bytes mode.
+
+        byteorder: "big" or "little", the byte order of wide elements in
+        bytes mode.
+
+        reuse_buffer: In bytes mode, if True every result's value is the
+        same bytearray, updated in place for the next attempt instead of
+        copied. Only use the value before moving to the next result.
+
+        pure_evaluator: Declares that `character_evaluator` always returns
+        the same character for a number, such as a codec encode. Its
+        characters are then computed once into a lookup table instead of
+        calling it during generation. `chr` is always treated as pure.
+
+        evaluator_cache_size: If `character_evaluator` is not declared pure,
+        keep this many of its recent characters in a least recently used
+        cache. Useful for costly evaluators over sparse or huge ranges.
+
+        mask: A hashcat style mask giving the characters of every position,
+        see `mask_fuzz`. Overrides `length`, `minimum`, `maximum` and
+        `character_evaluator`.
+
+        charsets: The custom charsets of `mask`, see `mask_fuzz`.
+
+        min_length, max_length: If either is given, every length from
+        `min_length` (default 1) to `max_length` (default `length`, or the
+        length of `mask`) is generated as one keyspace, shorter lengths
+        first. Masks use their first positions for shorter lengths. Resume
+        positions and shards count across the whole sweep.
         """
         #make sure everything is the correct type to prevent undefined behavior
-        if not isinstance(minimum, int):
-            raise TypeError("`minimum` must be an integer.")
-        if not isinstance(maximum, int):
-            raise TypeError("`maximum` must be an integer.")
-        if minimum > maximum:
-            raise ValueError("`minimum` must be less than `maximum`")
-        if maximum > 255 and character_evaluator == chr:
-            raise TooHighForChr("`maximum` is too large for chr,\
-                                 must be between 0 and 255.")
-        if not isinstance(output_format, str):
-            raise TypeError("output_format should be a string.")
-        if not isinstance(prohibit, NoneType):
-            if not isinstance(prohibit, list):
-                raise TypeError("`prohibit` must be a list.")
+        self._validate_arguments(prohibit, output_format, character_evaluator,
+                                 minimum, maximum, mode=mode)
+        if not isinstance(checkpoint_every, NoneType):
+            if not isinstance(checkpoint_every, int) or checkpoint_every < 1:
+                raise ValueError("`checkpoint_every` must be a positive\
+                                  integer.")
+
+        #the keyspace steps to the next candidate in place, so only the
+        #positions that carry are touched on each iteration.
+        #prohibited characters are pruned from the alphabet up front, so
+        #they are never generated.
+        keyspace = self._sequential_keyspace(prohibit, length,
+                                             character_evaluator
+                                             if mode == "text"
+                                             else _byte_character,
+                                             minimum, maximum, pure_evaluator,
+                                             evaluator_cache_size, mask,
+                                             charsets, min_length, max_length)
+        checkpointing = resume or not isinstance(checkpoint_every, NoneType)
+        if checkpointing:
+            self._initialize_checkpoints()
+            parameters = dict(prohibit=prohibit, output_format=output_format)
+            if not isinstance(mask, NoneType):
+                parameters.update(mask=mask,
+                                  charsets=sorted((charsets or {}).items()))
             else:
-                for value in prohibit:
-                    if not isinstance(value, str):
-                        raise TypeError("Values in prohibit must be a string.")
-                    else:
-                        if len(value) > 1:
-                            raise ValueError("Values in prohibit must only be\
-                                              one character long.")
+                parameters.update(length=length, minimum=minimum,
+                                  maximum=maximum)
+            if not isinstance(min_length, NoneType) or \
+               not isinstance(max_length, NoneType):
+                parameters.update(min_length=min_length,
+                                  max_length=max_length)
+            if mode == "bytes":
+                parameters.update(mode=mode, element_width=element_width,
+                                  byteorder=byteorder)
+            elif isinstance(mask, NoneType):
+                parameters["character_evaluator"] = character_evaluator
+            configuration = self._checkpoint_configuration(**parameters)
+        position = self._load_checkpoint(configuration) if resume else 0
+        if checkpointing:
+            checkpoint = Checkpoint(self, configuration, checkpoint_every,
+                                    position)
+        if mode == "bytes":
+            attempts = keyspace[position:].iter_bytes(output_format,
+                                                      element_width, byteorder,
+                                                      reuse_buffer)
+        else:
+            attempts = (output_format.format(fuzzed_string=fuzzed_string)
+                        for fuzzed_string in keyspace[position:])
+        for attempt in attempts:
+            result = Result(self, attempt, prohibited=prohibit)
+            if checkpointing:
+                #the caller has handled every candidate before this one once
+                #iteration resumes, unless `run` took the checkpoint over.
+                checkpoint.reached(position)
+                result.checkpoint = checkpoint
+                result.position = position
+            position += 1
+            yield result
+        if checkpointing:
+            checkpoint.exhausted(position)
 
-        #if there are no prohibited characters, begin result generation
-        if isinstance(prohibit, NoneType):
-            #initialize the list with the minimum values
-            temp_list = [minimum]*length
-            #on every iteration, the list will be increased in place.
-            #when the list can no longer be increased, iteration will stop.
-            while not self._increment(temp_list,
-                                      minimum=minimum, maximum=maximum):
-                attempt = output_format.format(fuzzed_string="".join(
-                list(character_evaluator(character) for character in temp_list))
-                )
-                yield Result(self, attempt, prohibited=prohibit)
-        if not isinstance(prohibit, NoneType):
-            #pass attempt is used as a flag to signal the yielding of a result.
-            #if there is a prohibited character, it is set to true and the
-            #result is skipped.
-            pass_attempt = False
-            #initialize the list with the minimum values
-            temp_list = [minimum]*length
-            #increase list values on every iteration.
-            while not self._increment(temp_list,
-                                      minimum=minimum, maximum=maximum):
-                attempt = output_format.format(fuzzed_string="".join(
-                list(character_evaluator(character) for character in temp_list))
-                )
-                #make sure that there is no prohibited character in the yielded
-                #attempt
-                for character in attempt:
-                    if character in prohibit:
-                        pass_attempt = True
-                #if there is a prohibited character, skip the result and
-                #continue iteration.
-                if pass_attempt:
-                    pass_attempt = False
-                    continue
-                else:
-                    yield Result(self, attempt, prohibited=prohibit)
+    def sequential_fuzz_batches(self, batch_size=1024, prohibit=None,
+                                length=5, output_format="{fuzzed_string}",
+                                character_evaluator=chr,
+                                minimum=0, maximum=255, pure_evaluator=False,
+                                evaluator_cache_size=None, mask=None,
+                                charsets=None, min_length=None,
+                                max_length=None):
+        """
+        Generates all possibilities sequentially, in blocks of `batch_size`
+        attempts. Yields ResultBatch objects instead of a Result for every
+        attempt. The last batch may be smaller.
+
+        The remaining arguments are the same as `sequential_fuzz`.
+        """
+        #make sure everything is the correct type to prevent undefined behavior
+        self._validate_arguments(prohibit, output_format, character_evaluator,
+                                 minimum, maximum)
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("`batch_size` must be a positive integer.")
+
+        keyspace = self._sequential_keyspace(prohibit, length,
+                                             character_evaluator,
+                                             minimum, maximum, pure_evaluator,
+                                             evaluator_cache_size, mask,
+                                             charsets, min_length, max_length)
+        for values in keyspace.batches(batch_size):
+            if output_format != "{fuzzed_string}":
+                values = list(output_format.format(fuzzed_string=value)
+                              for value in values)
+            yield ResultBatch(self, values, prohibited=prohibit)
+
+    def parallel_sequential_fuzz(self, check, workers=None,
+                                 successes_only=False, shard_size=10000,
+                                 prohibit=None, length=5,
+                                 output_format="{fuzzed_string}",
+                                 character_evaluator=chr,
+                                 minimum=0, maximum=255,
+                                 pure_evaluator=False,
+                                 evaluator_cache_size=None, mask=None,
+                                 charsets=None, min_length=None,
+                                 max_length=None):
+        """
+        Generates and checks all possibilities sequentially across a pool of
+        processes. The keyspace is split into disjoint, contiguous shards, so
+        every candidate is checked exactly once. Results are yielded in
+        keyspace order with `successful` set to the outcome of `check`.
+
+        Arguments:
+
+        check: The function that tests an attempt. It is called with the
+        formatted attempt and should return True on success. It is run in
+        the worker processes, so it must be picklable (defined at the top
+        level of a module).
+
+        workers: The number of worker processes. Defaults to the number of
+        cores.
+
+        successes_only: If True, only successful results are sent back to
+        this process and yielded.
+
+        shard_size: The number of candidates checked by a worker per task.
+
+        The remaining arguments are the same as `sequential_fuzz`.
+        """
+        #make sure everything is the correct type to prevent undefined behavior
+        self._validate_arguments(prohibit, output_format, character_evaluator,
+                                 minimum, maximum)
+        if not isinstance(shard_size, int) or shard_size < 1:
+            raise ValueError("`shard_size` must be a positive integer.")
+
+        keyspace = self._sequential_keyspace(prohibit, length,
+                                             character_evaluator,
+                                             minimum, maximum, pure_evaluator,
+                                             evaluator_cache_size, mask,
+                                             charsets, min_length, max_length)
+        pool = multiprocessing.Pool(workers)
+        #only a few shards are queued per worker at once, so memory stays
+        #bounded no matter how large the keyspace is.
+        in_flight = collections.deque()
+        max_in_flight = 2 * (workers or multiprocessing.cpu_count())
+        try:
+            start = 0
+            while start < keyspace.count or in_flight:
+                while start < keyspace.count and \
+                      len(in_flight) < max_in_flight:
+                    shard = keyspace[start:start + shard_size]
+                    in_flight.append(pool.apply_async(
+                        _check_shard,
+                        (shard, check, output_format, successes_only)
+                    ))
+                    start += shard_size
+                for attempt, successful in in_flight.popleft().get():
+                    yield Result(self, attempt, prohibited=prohibit,
+                                 successful=successful)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def mask_fuzz(self, mask, charsets=None, prohibit=None,
+                  output_format="{fuzzed_string}",
+                  resume=False, checkpoint_every=None,
+                  mode="text", reuse_buffer=False,
+                  min_length=None, max_length=None):
+        """
+        Generates all possibilities of a hashcat style mask sequentially.
+        Every position has its own charset, so known structure keeps the
+        keyspace small. Use `mask_keyspace` for its exact size.
+
+        Arguments:
+
+        mask: The characters of every position, in order. A position is a
+        literal character, "??" for a literal "?", or one of the charsets
+        ?l (lowercase letters), ?u (uppercase letters), ?d (digits), ?h and
+        ?H (lowercase and uppercase hexadecimal digits), ?s (printable
+        symbols and space), ?a (?l?u?d?s), ?b (every byte), or a custom
+        charset from `charsets`.
+
+        charsets: A dictionary of custom charsets by name, used in the mask
+        as "?<name>". For example {"1": "?l?d"} with the mask "?1?1?1".
+
+        min_length, max_length: Sweep over prefixes of the mask, see
+        `sequential_fuzz`.
+
+        The remaining arguments are the same as `sequential_fuzz`.
+        """
+        return self.sequential_fuzz(prohibit=prohibit,
+                                    output_format=output_format,
+                                    resume=resume,
+                                    checkpoint_every=checkpoint_every,
+                                    mode=mode, reuse_buffer=reuse_buffer,
+                                    mask=mask, charsets=charsets,
+                                    min_length=min_length,
+                                    max_length=max_length)
+
+    def mask_keyspace(self, mask, charsets=None, prohibit=None,
+                      min_length=None, max_length=None):
+        """
+        Return the Keyspace of a mask, see `mask_fuzz`. Its `count` is the
+        exact number of candidates, and it can be divided between hosts
+        with a Coordinator.
+        """
+        return self._sequential_keyspace(prohibit, None, chr, 0, 255, False,
+                                         None, mask, charsets,
+                                         min_length, max_length)
+
+    def _sequential_keyspace(self, prohibit, length, character_evaluator,
+                             minimum, maximum, pure_evaluator,
+                             evaluator_cache_size, mask, charsets,
+                             min_length, max_length):
+        """
+        Build the keyspace of a sequential run. A mask gives every position
+        its own alphabet of characters, which are used as they are, and
+        `min_length` or `max_length` sweep over a range of lengths.
+        """
+        alphabets = None
+        if not isinstance(mask, NoneType):
+            if not isinstance(mask, str):
+                raise TypeError("`mask` must be a string.")
+            alphabets = parse_mask(mask, charsets)
+            length = len(alphabets)
+            #the mask names characters, so their ordinals are not evaluated.
+            character_evaluator = chr
+        if isinstance(min_length, NoneType) and \
+           isinstance(max_length, NoneType):
+            return Keyspace(length=length, minimum=minimum, maximum=maximum,
+                            character_evaluator=character_evaluator,
+                            prohibit=prohibit, pure_evaluator=pure_evaluator,
+                            evaluator_cache_size=evaluator_cache_size,
+                            alphabets=alphabets)
+        return LengthSweep(min_length=1 if isinstance(min_length, NoneType)
+                                        else min_length,
+                           max_length=length if isinstance(max_length,
+                                                           NoneType)
+                                             else max_length,
+                           minimum=minimum, maximum=maximum,
+                           character_evaluator=character_evaluator,
+                           prohibit=prohibit, pure_evaluator=pure_evaluator,
+                           evaluator_cache_size=evaluator_cache_size,
+                           alphabets=alphabets)
 
     def random_fuzz(self, prohibit=None, length=5, 
                     output_format="{fuzzed_string}",
                     character_evaluator=chr,
-                    minimum=0, maximum=255):
+                    minimum=0, maximum=255,
+                    seed=None, stream_id=0, unique=False,
+                    mode="text", element_width=1, byteorder="big",
+                    pure_evaluator=False, evaluator_cache_size=None):
         """
         Generates all possibilities randomly with a given length.
 
@@ -218,8 +800,8 @@ class Fuzzer(object):
         length: The length of the fuzzed string. Does not pertain to length
         of output_format.
 
-        prohibit: A list of prohibited characters. Any results generated
-        with a character in this list will be skipped and not returned.
+        prohibit: A list of prohibited characters. They are removed from the
+        characters that are drawn from, so no draw is wasted on them.
 
         output_format: The format in which the fuzzed string sould be output.
         This requires the format variable `fuzzed_string` to be present in
@@ -234,79 +816,443 @@ class Fuzzer(object):
         list that will be generated. This directly translates into the lowest
         character that will be generated in the result. No character below
         this will be present in the output, despite it being randomly generated.
-        (uses random.randrange())
+        (uses random.choice())
 
         maximum: This is the maximum value of a number in the internal number
         list that will be generated. This directly translates into the highest
         character that will be generated in the result. No character higher
         than this will be present in the output, despite it being randomly
         generated.
-        (uses random.randrange())
+        (uses random.choice())
+
+        seed: Seeds the generator so that a run can be reproduced exactly.
+        Defaults to a fresh seed from the operating system.
+
+        stream_id: Selects one of many independent streams for the same
+        seed, so that parallel workers sharing a seed never draw the same
+        sequence. Give every worker its own stream_id.
+
+        unique: If True, every possibility is generated exactly once, in a
+        random order, and generation stops after one full pass. The order
+        is a keyed permutation of the keyspace, so no memory is spent on
+        remembering what was already generated.
+
+        mode, element_width, byteorder, pure_evaluator,
+        evaluator_cache_size: The same as `sequential_fuzz`.
         """
         #make sure everything is the correct type to prevent undefined behavior
-        if not isinstance(minimum, int):
-            raise TypeError("`minimum` must be an integer.")
-        if not isinstance(maximum, int):
-            raise TypeError("`maximum` must be an integer.")
-        if minimum > maximum:
-            raise ValueError("`minimum` must be less than `maximum`.")
-        if maximum > 255 and character_evaluator == chr:
-            raise TooHighForChr("`maximum` is too large for chr,\
-                                 must be between 0 and 255.")
-        if not isinstance(prohibit, NoneType):
-            if not isinstance(prohibit, list):
-                raise TypeError("`prohibit` must be a list.")
-            else:
-                for value in prohibit:
-                    if not isinstance(value, str):
-                        raise TypeError("Values in prohibit must be a string.")
-                    else:
-                        if len(value) > 1:
-                            raise ValueError("Values in prohibit must only be\
-                                              one character long.")
-        if not isinstance(output_format, str):
-            raise TypeError("output_format should be a string.")
+        self._validate_arguments(prohibit, output_format, character_evaluator,
+                                 minimum, maximum, mode=mode)
 
-        if isinstance(prohibit, NoneType):
-            while True:
-                attempt = output_format.format(fuzzed_string="".join(
-                #run the character evaluator on a random number between the
-                #minimum and maximum for the length of the result specified
-                list(character_evaluator(random.randrange(minimum, maximum))
-                     for index in range(length))
-                ))
+        if mode == "bytes":
+            character_evaluator = _byte_character
+        elif evaluator_cache_size and not pure_evaluator:
+            character_evaluator = CachedEvaluator(character_evaluator,
+                                                  evaluator_cache_size)
+        #prohibited characters are pruned up front, so every draw is usable.
+        alphabet = prune_alphabet(range(minimum, maximum + 1),
+                                  character_evaluator, prohibit)
+        if len(alphabet) == 0:
+            raise ValueError("Every character is prohibited.")
+        #a generator of its own, the global one is shared by everything in
+        #the process and duplicated into every fork.
+        generator = random.Random(_stream_seed(seed, stream_id))
+        if mode == "bytes":
+            #the format is split once, candidates are joined into it.
+            segments = compile_output_format(output_format)
+            encoded = encode_alphabet(alphabet, element_width, byteorder)
+        if unique:
+            keyspace = Keyspace(length=length, alphabet=alphabet,
+                                character_evaluator=character_evaluator,
+                                pure_evaluator=pure_evaluator)
+            permutation = Permutation(keyspace.count, generator)
+            if mode == "bytes":
+                packed = dict(zip(alphabet, encoded))
+                attempts = ("".join([packed[value] for value in
+                                     keyspace.values(index)]).join(segments)
+                            for index in permutation)
+            else:
+                attempts = (output_format.format(fuzzed_string=keyspace[index])
+                            for index in permutation)
+            for attempt in attempts:
                 yield Result(self, attempt, prohibited=prohibit)
-        if not isinstance(prohibit, NoneType):
+            return
+        if mode == "bytes":
+            choice = generator.choice
+            positions = range(length)
             while True:
-                #populate the list. each character will be replaced with
-                #a randomly generated value between the minimum and maximum
-                temp_list = [minimum]*length
-                for index in range(length):
-                    #done is used to define the status of the character
-                    #generated. a character is done if it is not in the
-                    #prohibited characters.
-                    done = False
-                    while not done:
-                        #choose a random value between the minimum and maximum
-                        char_value_attempt = random.randrange(minimum, maximum)
-                        #test to make sure that it is not in the prohibited
-                        #characters. if it is, choose another random value and
-                        #try again.
-                        if character_evaluator(char_value_attempt) in prohibit:
-                            continue
-                        else:
-                            #the character is ok, assign the value in the temp
-                            #list to the value and signify done to continue to
-                            #next index.
-                            temp_list[index] = char_value_attempt
-                            done = True
-                #all values in the temp list have been generated.
-                #turn all the temp list into a string and yield it.
-                attempt = "".join(
-                list(character_evaluator(value) for value in temp_list
-                ))
+                body = "".join([choice(encoded) for index in positions])
+                yield Result(self, body.join(segments), prohibited=prohibit)
+        characters = character_table(alphabet, character_evaluator,
+                                     pure_evaluator)
+        while True:
+            attempt = output_format.format(fuzzed_string="".join(
+            #look up the character of a random number between the minimum
+            #and maximum for the length of the result specified
+            list(generator.choice(characters) for index in range(length))
+            ))
+            yield Result(self, attempt, prohibited=prohibit)
+
+    def random_fuzz_batches(self, batch_size=1024, prohibit=None,
+                            length=5, output_format="{fuzzed_string}",
+                            character_evaluator=chr,
+                            minimum=0, maximum=255, vectorized=True,
+                            seed=None, stream_id=0):
+        """
+        Generates possibilities randomly, in blocks of `batch_size` attempts.
+        Yields ResultBatch objects instead of a Result for every attempt.
+
+        Arguments:
+
+        vectorized: If True and NumPy is installed, every batch is drawn as
+        one matrix instead of one character at a time. Falls back to pure
+        Python when NumPy is not installed. The two draw different
+        sequences for the same seed.
+
+        The remaining arguments are the same as `random_fuzz`.
+        """
+        #make sure everything is the correct type to prevent undefined behavior
+        self._validate_arguments(prohibit, output_format, character_evaluator,
+                                 minimum, maximum)
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("`batch_size` must be a positive integer.")
+
+        if vectorized and not isinstance(numpy, NoneType):
+            rows = self._numpy_random_rows(batch_size, prohibit, length,
+                                           character_evaluator,
+                                           minimum, maximum,
+                                           _stream_seed(seed, stream_id))
+        else:
+            rows = self._random_rows(batch_size, prohibit, length,
+                                     character_evaluator, minimum, maximum,
+                                     _stream_seed(seed, stream_id))
+        for values in rows:
+            if output_format != "{fuzzed_string}":
+                values = list(output_format.format(fuzzed_string=value)
+                              for value in values)
+            yield ResultBatch(self, values, prohibited=prohibit)
+
+    def _random_rows(self, batch_size, prohibit, length,
+                     character_evaluator, minimum, maximum, seed):
+        """
+        Yield lists of `batch_size` random fuzzed strings, in pure Python.
+        """
+        alphabet = prune_alphabet(range(minimum, maximum + 1),
+                                  character_evaluator, prohibit)
+        if len(alphabet) == 0:
+            raise ValueError("Every character is prohibited.")
+        #draw from the characters directly, the evaluator only runs once
+        #per number of the alphabet for the whole batch.
+        characters = list(character_evaluator(value) for value in alphabet)
+        choice = random.Random(seed).choice
+        positions = range(length)
+        while True:
+            yield list("".join([choice(characters) for index in positions])
+                       for number in xrange(batch_size))
+
+    def _numpy_random_rows(self, batch_size, prohibit, length,
+                           character_evaluator, minimum, maximum, seed):
+        """
+        Yield lists of `batch_size` random fuzzed strings, drawing each list
+        as one (batch_size, length) matrix. With `chr` the rows are sliced
+        straight out of the matrix bytes, other evaluators are looked up
+        from a table of their characters.
+        """
+        if character_evaluator == chr:
+            alphabet = numpy.arange(minimum, maximum + 1, dtype=numpy.uint8)
+            if not isinstance(prohibit, NoneType):
+                prohibited = list(ord(value) for value in prohibit
+                                  if len(value) == 1)
+                alphabet = alphabet[~numpy.in1d(alphabet, prohibited)]
+        else:
+            alphabet = numpy.array(list(character_evaluator(value) for value in
+                                        prune_alphabet(range(minimum,
+                                                             maximum + 1),
+                                                       character_evaluator,
+                                                       prohibit)),
+                                   dtype=object)
+        if len(alphabet) == 0:
+            raise ValueError("Every character is prohibited.")
+        if isinstance(seed, NoneType):
+            generator = numpy.random.RandomState()
+        else:
+            #RandomState takes at most 32 bits per word of its seed.
+            generator = numpy.random.RandomState(
+                            list((seed >> shift) & 0xffffffff
+                                 for shift in range(0, 256, 32)))
+        while True:
+            matrix = alphabet[generator.randint(0, len(alphabet),
+                                                size=(batch_size, length))]
+            if length == 0:
+                yield [""] * batch_size
+            elif matrix.dtype == numpy.uint8:
+                raw = matrix.tobytes()
+                yield list(raw[start:start + length] for start in
+                           xrange(0, batch_size * length, length))
+            else:
+                yield list("".join(row) for row in matrix.tolist())
+
+    def wordlist_fuzz(self, path, rules=None, prohibit=None,
+                      output_format="{fuzzed_string}", chunk_size=1048576):
+        """
+        Generates the words of a wordlist, mutated by hashcat style rules.
+        The file is memory mapped and streamed, so it does not have to fit
+        in memory.
+
+        Arguments:
+
+        path: The path of the wordlist, one word per line.
+
+        rules: A list of rules applied to every word, see `Wordlist`. Every
+        word is yielded once per rule, in the order of the rules. Defaults
+        to yielding the words unchanged.
+
+        prohibit: A list of characters. Candidates containing any of them
+        are skipped.
+
+        output_format: The format in which the fuzzed string sould be output.
+
+        chunk_size: The number of bytes of the wordlist read at a time.
+        """
+        for batch in self.wordlist_fuzz_batches(path, rules=rules,
+                                                prohibit=prohibit,
+                                                output_format=output_format,
+                                                chunk_size=chunk_size):
+            for attempt in batch.values:
                 yield Result(self, attempt, prohibited=prohibit)
 
+    def wordlist_fuzz_batches(self, path, rules=None, prohibit=None,
+                              output_format="{fuzzed_string}",
+                              chunk_size=1048576):
+        """
+        Generates the mutated words of a wordlist, yielding a ResultBatch
+        for every chunk of the file instead of a Result for every attempt.
+        Chunks without any candidates are skipped.
+
+        The arguments are the same as `wordlist_fuzz`.
+        """
+        #make sure everything is the correct type to prevent undefined behavior
+        self._validate_output(prohibit, output_format)
+        wordlist = Wordlist(path, rules=rules, chunk_size=chunk_size)
+        for values in wordlist.chunks():
+            if prohibit:
+                values = list(value for value in values
+                              if not any(character in value
+                                         for character in prohibit))
+            if output_format != "{fuzzed_string}":
+                values = list(output_format.format(fuzzed_string=value)
+                              for value in values)
+            if len(values):
+                yield ResultBatch(self, values, prohibited=prohibit)
+
+    def grammar_fuzz(self, grammar, start="<start>", max_depth=10,
+                     strategy="breadth", seed=None, stream_id=0,
+                     prohibit=None, output_format="{fuzzed_string}"):
+        """
+        Generates strings derived from a context free grammar, so every
+        attempt is syntactically valid for structured targets.
+
+        Arguments:
+
+        grammar: A dictionary of nonterminals to their alternatives, BNF
+        text, or a Grammar. See `Grammar` and `parse_bnf` for the formats.
+
+        start: The nonterminal every derivation starts from.
+
+        max_depth: The deepest derivation tree generated.
+
+        strategy: "breadth" generates every derivation once, shallower
+        derivations first. "random" generates random derivations without
+        end.
+
+        seed, stream_id: Seed the random strategy, the same as
+        `random_fuzz`.
+
+        prohibit: A list of characters. Derivations containing any of them
+        are skipped.
+
+        output_format: The format in which the fuzzed string sould be output.
+        """
+        #make sure everything is the correct type to prevent undefined behavior
+        self._validate_output(prohibit, output_format)
+        if strategy not in ("breadth", "random"):
+            raise ValueError("`strategy` must be \"breadth\" or \"random\".")
+        if not isinstance(max_depth, int) or max_depth < 1:
+            raise ValueError("`max_depth` must be a positive integer.")
+        if isinstance(grammar, str):
+            grammar = parse_bnf(grammar)
+        if not isinstance(grammar, Grammar):
+            grammar = Grammar(grammar, start=start)
+
+        if strategy == "breadth":
+            derivations = grammar.derivations(max_depth)
+        else:
+            generator = random.Random(_stream_seed(seed, stream_id))
+            derivations = iter(lambda: grammar.random_derivation(generator,
+                                                                 max_depth),
+                               None)
+        for derivation in derivations:
+            if prohibit and any(character in derivation
+                                for character in prohibit):
+                continue
+            attempt = output_format.format(fuzzed_string=derivation)
+            yield Result(self, attempt, prohibited=prohibit)
+
+    def coverage_fuzz(self, seeds=None, iterations=None, max_length=4096,
+                      seed=None, stream_id=0, resume=False,
+                      output_format="{fuzzed_string}"):
+        """
+        Generates attempts by mutating inputs that reached new coverage of
+        the target. Report the coverage of every attempt with
+        `result.report(coverage)` before moving on to the next result;
+        attempts that reach a feature no earlier attempt did are kept in an
+        in-memory corpus, saved in a `<table_name>_corpus` table, and
+        mutated further.
+
+        Arguments:
+
+        seeds: A list of inputs to start from, tried first. Defaults to the
+        empty string.
+
+        iterations: The number of attempts to generate, including the
+        seeds. Defaults to no limit.
+
+        max_length: The longest input a mutation may produce.
+
+        seed, stream_id: Seed the mutations, the same as `random_fuzz`.
+
+        resume: If True, start from the corpus saved by earlier runs
+        instead of the seeds, when there is one. Features are saved by
+        their repr, so they should be numbers, strings or tuples of them.
+
+        output_format: The format in which the fuzzed string sould be output.
+        """
+        #make sure everything is the correct type to prevent undefined behavior
+        self._validate_output(None, output_format)
+        if not isinstance(iterations, NoneType) and \
+           (not isinstance(iterations, int) or iterations < 0):
+            raise ValueError("`iterations` must be a positive integer.")
+
+        corpus = Corpus(random.Random(_stream_seed(seed, stream_id)),
+                        max_length)
+        self._initialize_corpus()
+        if resume:
+            for value, features, new_features in self._load_corpus():
+                entry = corpus.add(value, features, force=True)
+                entry.new_features = new_features
+        attempts = 0
+        if len(corpus) == 0:
+            for value in (seeds or [""]):
+                if attempts == iterations:
+                    return
+                attempt = output_format.format(fuzzed_string=value)
+                result = Result(self, attempt)
+                yield result
+                attempts += 1
+                #seeds are always kept, so there is something to mutate.
+                self._save_corpus_entry(corpus.add(value,
+                                                   result.coverage or (),
+                                                   force=True))
+        for entry in corpus.schedule():
+            if attempts == iterations:
+                return
+            value = corpus.mutate(entry.value)
+            attempt = output_format.format(fuzzed_string=value)
+            result = Result(self, attempt)
+            yield result
+            attempts += 1
+            if not isinstance(result.coverage, NoneType):
+                kept = corpus.add(value, result.coverage)
+                if not isinstance(kept, NoneType):
+                    self._save_corpus_entry(kept)
+
+    def run(self, target, generator, workers=None, timeout=10):
+        """
+        Run a target on every result of a generator in a pool of forked
+        worker processes, and submit the outcomes. Results are yielded once
+        handled, in the order they finish, with `successful` set. Attempts
+        that make the target raise, crash its process or run past the
+        timeout are failed, saved in a `<table_name>_crashes` table with
+        `crash` set to a (kind, detail) tuple, and the lost worker is
+        replaced. Call `commit_to_database` to write the outcomes. Workers
+        take results ahead of their outcomes, so checkpoints of
+        `sequential_fuzz` are saved at the lowest candidate still running.
+
+        Arguments:
+
+        target: The function that tests an attempt. It is called with the
+        attempt and should return True on success. Workers are forked, so it
+        does not have to be picklable.
+
+        generator: The results to run, such as `self.sequential_fuzz()`.
+
+        workers: The number of worker processes. Defaults to the number of
+        cores.
+
+        timeout: The number of seconds an attempt may run before its worker
+        is killed. None waits forever.
+        """
+        harness = Harness(target, workers, timeout)
+        return self._submit_outcomes(harness.run(self._dispatch(generator)))
+
+    def arun(self, target, generator, concurrency=100):
+        """
+        Run an I/O bound target, such as a request to a network service, on
+        many results of a generator at once, and submit the outcomes. The
+        target runs in `concurrency` threads, which wait on the network in
+        parallel. Results are handled exactly as in `run`, and only in the
+        calling thread, so no thread waits on the database.
+
+        Arguments:
+
+        target: The function that tests an attempt, returning True on
+        success. It is called from many threads at once, and should time out
+        on its own; a `socket.timeout` is recorded as a timeout.
+
+        generator: The results to run, such as `self.random_fuzz()`.
+
+        concurrency: The number of attempts in flight at once.
+        """
+        harness = ThreadedHarness(target, concurrency)
+        return self._submit_outcomes(harness.run(self._dispatch(generator)))
+
+    def _dispatch(self, generator):
+        """
+        Turn the results of a generator into the (result, attempt) jobs of a
+        harness. Harnesses take results ahead of their outcomes, so reused
+        buffers are copied, and checkpoints are taken over from the
+        generator to be saved as outcomes come in.
+        """
+        for result in generator:
+            if isinstance(result.value, bytearray):
+                #the generator rewrites the buffer for the next result.
+                result.value = bytearray(result.value)
+            if not isinstance(result.checkpoint, NoneType):
+                result.checkpoint.dispatch(result.position)
+            yield result, result.value
+
+    def _submit_outcomes(self, outcomes):
+        """
+        Submit the (result, outcome, detail) tuples of a harness, recording
+        crashes, and yield each result. The checkpoint of a result is
+        advanced once its outcome is submitted.
+        """
+        self._initialize_crashes()
+        for result, outcome, detail in outcomes:
+            result.successful = outcome == "success"
+            if outcome in ("success", "fail"):
+                result.crash = None
+            else:
+                result.crash = (outcome, detail)
+                self._save_crash(result.value, outcome, detail)
+            if result.successful:
+                result.success()
+            else:
+                result.fail()
+            if not isinstance(result.checkpoint, NoneType):
+                result.checkpoint.handled(result.position)
+            yield result
+
     def tail(self, table_name, select_conditions={},
              order_by="created_at DESC"):
         """
@@ -410,29 +1356,83 @@ class Fuzzer(object):
                             limit_by = " LIMIT %s;" %\
                                        (last_result[0] - result[0])
                             last_result = result
-                            yield Result(self, result[1], prohibited=result[2])
+                            yield self._tailed_result(result)
             else:
                 for result in self.sql_engine.read_query(query):
                     last_result = result
-                    yield Result(self, result[1], prohibited=result[2])
+                    yield self._tailed_result(result)
                 #done iterating values at time of query. jump to watching db
                 #starting from the last result's id
                 tail_from_id = True
 
 
 
+    def _tailed_result(self, row):
+        """
+        Turn a row read by `tail` into a Result. Rows of the compact schema
+        hold the candidate as a BLOB and the id of the prohibit list.
+        """
+        if self.schema == "compact":
+            return Result(self, str(row[1]),
+                          prohibited=self._prohibit_list(row[2]))
+        return Result(self, row[1], prohibited=row[2])
+
+def _byte_character(value):
+    """
+    Character of a number in bytes mode, used to match `prohibit`. Numbers
+    too wide for a single byte never match.
+    """
+    return chr(value) if value < 256 else None
+
+def _stream_seed(seed, stream_id):
+    """
+    Derive the seed of one stream from a run's seed. Streams are hashed
+    apart, so every stream_id gives an unrelated sequence. Returns None,
+    meaning seed from the operating system, when `seed` is None.
+    """
+    if isinstance(seed, NoneType):
+        return None
+    digest = hashlib.sha256("%s:%s" % (seed, stream_id)).hexdigest()
+    return long(digest, 16)
+
+def _check_shard(shard, check, output_format, successes_only):
+    """
+    Check every candidate in a shard of the keyspace. Run inside the worker
+    processes of `Fuzzer.parallel_sequential_fuzz`, returns a list of
+    (attempt, successful) tuples.
+    """
+    outcomes = []
+    for fuzzed_string in shard:
+        attempt = output_format.format(fuzzed_string=fuzzed_string)
+        successful = bool(check(attempt))
+        if successful or not successes_only:
+            outcomes.append((attempt, successful))
+    return outcomes
+
 class Result(object):
     """
     Used to determine success or failure of an attempt, then submit value into
     engine insertion queue.
     """
-    def __init__(self, fuzzer_instance, attempt, prohibited=None):
+    def __init__(self, fuzzer_instance, attempt, prohibited=None,
+                 successful=None):
         #pull the fuzzer instances sql_engine so that we can append
         #values to it's pool
+        self.fuzzer_instance = fuzzer_instance
         self.engine_instance = fuzzer_instance.sql_engine
         self.table_name = fuzzer_instance.table_name
         self.value = attempt
         self.prohibited = prohibited
+        #outcome of the attempt when it was already checked, None otherwise.
+        self.successful = successful
+        #features the attempt reached, reported by the harness.
+        self.coverage = None
+        #(kind, detail) when the attempt crashed the target in `run`.
+        self.crash = None
+        #the Checkpoint of a checkpointed sequential run, and the position
+        #of the attempt in its keyspace.
+        self.checkpoint = None
+        self.position = None
     def success(self):
         """
         Register with the SQL engine that the result should be entered as a
@@ -447,6 +1447,16 @@ class Result(object):
         """
         self.engine_instance.append_to_pool(self._generate_item(False),
                                             self.table_name)
+    def report(self, coverage):
+        """
+        Report the coverage the attempt reached, for `coverage_fuzz`.
+
+        Arguments:
+
+        coverage: A collection of the features, such as branch ids, that
+        the target reached while handling the attempt.
+        """
+        self.coverage = coverage
     def _generate_item(self, success_value):
         """
         Create the item to submit to the SQL engine.
@@ -456,13 +1466,192 @@ class Result(object):
         success_value: Used as a flag for the result to define success
         or failure.
         """
+        if self.fuzzer_instance.schema == "compact":
+            return {"created_at": int(time.time()),
+                    "prohibit_id": self.fuzzer_instance._prohibit_id(
+                                       self.prohibited),
+                    "attempted": _blob(self.value),
+                    "successful": int(success_value)}
         return {"created_at": datetime.datetime.now().strftime("%c"),
                 "updated_at": datetime.datetime.now().strftime("%c"),
                 "prohibited": "" if isinstance(self.prohibited, NoneType) \
                                  else self.prohibited,
-                "attempted" : self.value,
+                #reused buffers change after this, so store a copy.
+                "attempted" : str(self.value)
+                              if isinstance(self.value, bytearray)
+                              else self.value,
                 "successful": success_value}
 
+class Checkpoint(object):
+    """
+    The checkpoint of a sequential run, shared by its results. The
+    generator saves the position as it is advanced, as every candidate
+    before it has been handled. `Fuzzer.run` and `Fuzzer.arun` take results
+    ahead of their outcomes, so once they dispatch a result the checkpoint
+    is instead saved at the lowest position still in flight.
+
+    Methods:
+
+    public:
+        __init__(self, fuzzer_instance, configuration, every, position)
+        reached(self, position)
+        exhausted(self, position)
+        dispatch(self, position)
+        handled(self, position)
+    private:
+        _save(self, position)
+    """
+    def __init__(self, fuzzer_instance, configuration, every, position):
+        """
+        Arguments:
+
+        fuzzer_instance: The fuzzer whose database holds the checkpoint.
+
+        configuration: The text the checkpoint is stored under.
+
+        every: The number of candidates between checkpoints, or None to
+        only save the position once the run is finished.
+
+        position: The position the run starts from.
+        """
+        self.fuzzer_instance = fuzzer_instance
+        self.configuration = configuration
+        self.every = every
+        self.saved = position
+        #set once a harness handles the results.
+        self.external = False
+        #positions dispatched to a harness without an outcome yet.
+        self.in_flight = set()
+        self.next_position = position
+        #the position after the last candidate, once the generator is done.
+        self.end = None
+    def reached(self, position):
+        """
+        Called by the generator before it yields the candidate at
+        `position`.
+        """
+        if not self.external and self.every and position % self.every == 0:
+            self._save(position)
+    def exhausted(self, position):
+        """
+        Called by the generator once every candidate has been yielded.
+        """
+        self.end = position
+        if not self.external or len(self.in_flight) == 0:
+            self._save(position)
+    def dispatch(self, position):
+        """
+        Called by a harness when it takes the candidate at `position`.
+        """
+        self.external = True
+        self.in_flight.add(position)
+        self.next_position = position + 1
+    def handled(self, position):
+        """
+        Called by a harness once the outcome of the candidate at `position`
+        is submitted.
+        """
+        self.in_flight.discard(position)
+        if len(self.in_flight) == 0 and not isinstance(self.end, NoneType):
+            self._save(self.end)
+            return
+        lowest = min(self.in_flight) if self.in_flight else \
+                 self.next_position
+        if self.every and lowest - self.saved >= self.every:
+            self._save(lowest)
+    def _save(self, position):
+        """
+        Save the position, committing the outcomes before it first.
+        """
+        self.saved = position
+        self.fuzzer_instance._save_checkpoint(self.configuration, position)
+
+class ResultBatch(object):
+    """
+    A block of attempts generated together. Outcomes are submitted for many
+    attempts in one call, without a Result object for every attempt.
+    """
+    def __init__(self, fuzzer_instance, attempts, prohibited=None):
+        self.fuzzer_instance = fuzzer_instance
+        self.engine_instance = fuzzer_instance.sql_engine
+        self.table_name = fuzzer_instance.table_name
+        self.values = attempts
+        self.prohibited = prohibited
+    def __len__(self):
+        return len(self.values)
+    def __iter__(self):
+        return iter(self.values)
+    def __getitem__(self, index):
+        return self.values[index]
+    def success(self, indices=None):
+        """
+        Register with the SQL engine that attempts should be entered as
+        successes.
+
+        Arguments:
+
+        indices: The positions in the batch of the successful attempts.
+        Defaults to every attempt in the batch.
+        """
+        self.engine_instance.extend_pool(self._generate_items(indices, True),
+                                         self.table_name)
+    def fail(self, indices=None):
+        """
+        Register with the SQL engine that attempts should be entered as
+        failures.
+
+        Arguments:
+
+        indices: The positions in the batch of the failed attempts.
+        Defaults to every attempt in the batch.
+        """
+        self.engine_instance.extend_pool(self._generate_items(indices, False),
+                                         self.table_name)
+    def _generate_items(self, indices, success_value):
+        """
+        Create the items to submit to the SQL engine. They match the items
+        of `Result._generate_item`, with one timestamp for the whole batch.
+        """
+        if isinstance(indices, NoneType):
+            indices = xrange(len(self.values))
+        values = self.values
+        if self.fuzzer_instance.schema == "compact":
+            now = int(time.time())
+            prohibit_id = self.fuzzer_instance._prohibit_id(self.prohibited)
+            successful = int(success_value)
+            return list({"created_at": now,
+                         "prohibit_id": prohibit_id,
+                         "attempted": _blob(values[index]),
+                         "successful": successful} for index in indices)
+        now = datetime.datetime.now().strftime("%c")
+        prohibited = "" if isinstance(self.prohibited, NoneType) \
+                        else self.prohibited
+        return list({"created_at": now,
+                     "updated_at": now,
+                     "prohibited": prohibited,
+                     "attempted" : values[index],
+                     "successful": success_value} for index in indices)
+
+def _unrepr(text):
+    """
+    Return the value a text table stores the repr of. Plain strings are
+    unescaped directly, as that is much faster than parsing them.
+    """
+    if text[:1] in ("'", '"'):
+        return str(text)[1:-1].decode("string_escape")
+    return ast.literal_eval(text)
+
+def _blob(value):
+    """
+    Return an attempt as a buffer, stored by SQLite as a BLOB. Bytearrays
+    are copied, as reused buffers change after this.
+    """
+    if isinstance(value, unicode):
+        return buffer(value.encode("utf-8"))
+    if isinstance(value, bytearray):
+        return buffer(str(value))
+    return buffer(value)
+
 class GeneralException(Exception):
     """
     Baseclass for all exceptions raised by Fuzzer.
@@ -0,0 +1,238 @@
+import itertools
+import re
+
+#a nonterminal is any "<name>" without spaces or angle brackets inside.
+NONTERMINAL = re.compile(r"(<[^<> ]+>)")
+
+class Grammar(object):
+    """
+    Grammar derives structured strings from a context free grammar, either
+    every derivation in order of depth or random derivations. Expansions of
+    nonterminals are memoized by depth, so a nonterminal used in many places
+    is only expanded once.
+
+    Methods:
+
+    public:
+        __init__(self, grammar, start="<start>")
+        derivations(self, max_depth=10)
+        random_derivation(self, generator, max_depth=10)
+    private:
+        _exact(self, symbol, depth)
+        _up_to(self, symbol, depth)
+        _alternative(self, alternative, depth)
+        _minimum_depths(self)
+        _choices(self, symbol, depth)
+    """
+    def __init__(self, grammar, start="<start>"):
+        """
+        Arguments:
+
+        grammar: A dictionary of every nonterminal to a list of its
+        alternatives, such as {"<start>": ["<digit>", "<digit><start>"],
+        "<digit>": ["0", "1"]}. An alternative is a string, where every
+        "<name>" is a nonterminal and the rest is literal text, or a tuple
+        of nonterminals and literals. BNF text can be converted with
+        `parse_bnf`.
+
+        start: The nonterminal every derivation starts from.
+        """
+        if not isinstance(grammar, dict):
+            raise TypeError("`grammar` must be a dictionary.")
+        if start not in grammar:
+            raise ValueError("The start symbol `%s` is not in the grammar."
+                             % start)
+        self.start = start
+        #every alternative as a tuple of literals and nonterminals.
+        self.rules = {}
+        for symbol, alternatives in grammar.items():
+            if not alternatives:
+                raise ValueError("`%s` has no alternatives." % symbol)
+            self.rules[symbol] = list(
+                tuple(alternative) if isinstance(alternative, tuple)
+                else tuple(token for token in NONTERMINAL.split(alternative)
+                           if token)
+                for alternative in alternatives)
+        for symbol, alternatives in self.rules.items():
+            for alternative in alternatives:
+                for token in alternative:
+                    if NONTERMINAL.match(token) and token not in self.rules:
+                        raise ValueError("`%s` used by `%s` is not defined."
+                                         % (token, symbol))
+        self.depths = self._minimum_depths()
+        if self.start not in self.depths:
+            raise ValueError("`%s` can never be fully derived." % self.start)
+        #expansions of nonterminals by depth, built on demand.
+        self._expansions = {}
+        #alternatives that fit in a depth, built on demand.
+        self._fitting = {}
+
+    def derivations(self, max_depth=10):
+        """
+        Yield every string derived from the start symbol with a derivation
+        tree at most `max_depth` deep, shallower derivations first. Only
+        the expansions of nonterminals below the start symbol are kept in
+        memory. An ambiguous grammar yields a string once per derivation.
+        """
+        for depth in xrange(1, max_depth + 1):
+            for alternative in self.rules[self.start]:
+                for derivation in self._alternative(alternative, depth):
+                    yield derivation
+
+    def random_derivation(self, generator, max_depth=10):
+        """
+        Return a random string derived from the start symbol, with a
+        derivation tree at most `max_depth` deep. Alternatives that could
+        not be finished within the depth left are never chosen.
+
+        Arguments:
+
+        generator: The `random.Random` instance to draw choices from.
+        """
+        if self.depths[self.start] > max_depth:
+            raise ValueError("`%s` needs a depth of at least %s."
+                             % (self.start, self.depths[self.start]))
+        parts = []
+        #symbols left to expand, with the depth left for each, in reverse.
+        stack = [(self.start, max_depth)]
+        while stack:
+            token, depth = stack.pop()
+            if token not in self.rules:
+                parts.append(token)
+                continue
+            alternative = generator.choice(self._choices(token, depth))
+            stack.extend((child, depth - 1)
+                         for child in reversed(alternative))
+        return "".join(parts)
+
+    def _exact(self, symbol, depth):
+        """
+        Return every string derived from `symbol` with a derivation tree of
+        exactly `depth`. Memoized.
+        """
+        key = (symbol, depth)
+        if key not in self._expansions:
+            self._expansions[key] = list(
+                derivation for alternative in self.rules[symbol]
+                for derivation in self._alternative(alternative, depth))
+        return self._expansions[key]
+
+    def _up_to(self, symbol, depth):
+        """
+        Return every string derived from `symbol` with a derivation tree of
+        at most `depth`, shallower derivations first.
+        """
+        return list(itertools.chain.from_iterable(
+                        self._exact(symbol, level)
+                        for level in xrange(self.depths.get(symbol,
+                                                            depth + 1),
+                                            depth + 1)))
+
+    def _alternative(self, alternative, depth):
+        """
+        Yield every string derived from an alternative with a derivation
+        tree of exactly `depth`, counting the alternative's own symbol.
+        """
+        children = list(index for index, token in enumerate(alternative)
+                        if token in self.rules)
+        if len(children) == 0:
+            if depth == 1:
+                yield "".join(alternative)
+            return
+        if depth < 2:
+            return
+        #the first nonterminal reaching the full depth is `deepest`; ones
+        #before it stay shallower, so every combination is made once.
+        for deepest in children:
+            options = []
+            for index, token in enumerate(alternative):
+                if token not in self.rules:
+                    options.append((token,))
+                elif index < deepest:
+                    options.append(self._up_to(token, depth - 2))
+                elif index == deepest:
+                    options.append(self._exact(token, depth - 1))
+                else:
+                    options.append(self._up_to(token, depth - 1))
+            for parts in itertools.product(*options):
+                yield "".join(parts)
+
+    def _minimum_depths(self):
+        """
+        Return the smallest derivation depth of every nonterminal. Symbols
+        that can never be fully derived are left out.
+        """
+        depths = {}
+        changed = True
+        while changed:
+            changed = False
+            for symbol, alternatives in self.rules.items():
+                for alternative in alternatives:
+                    children = list(depths.get(token) for token in alternative
+                                    if token in self.rules)
+                    if None in children:
+                        continue
+                    depth = 1 + max(children or [0])
+                    if depth < depths.get(symbol, depth + 1):
+                        depths[symbol] = depth
+                        changed = True
+        return depths
+
+    def _choices(self, symbol, depth):
+        """
+        Return the alternatives of `symbol` that can be finished within
+        `depth`. Memoized.
+        """
+        key = (symbol, depth)
+        if key not in self._fitting:
+            self._fitting[key] = list(
+                alternative for alternative in self.rules[symbol]
+                if all(self.depths.get(token, depth) <= depth - 1
+                       for token in alternative if token in self.rules))
+        return self._fitting[key]
+
+def parse_bnf(text):
+    """
+    Convert BNF text into a grammar dictionary for `Grammar`. Every rule is
+    `<name> ::= alternative | alternative`, and may continue on lines that
+    start with "|". An alternative is a sequence of nonterminals and double
+    quoted literals, separated by spaces, and may be empty. Lines starting
+    with "#" are skipped.
+    """
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "::=" in line:
+            symbol, line = line.split("::=", 1)
+            rules.append([symbol.strip(), line])
+        elif rules and line.startswith("|"):
+            rules[-1][1] += " " + line
+        else:
+            raise ValueError("Expected a rule: `%s`." % line)
+    grammar = {}
+    for symbol, definition in rules:
+        if not NONTERMINAL.match(symbol):
+            raise ValueError("`%s` is not a nonterminal." % symbol)
+        alternatives = [[]]
+        position = 0
+        while position < len(definition):
+            match = BNF_TOKEN.match(definition, position)
+            if match is None:
+                raise ValueError("Unexpected text in the rule of `%s`."
+                                 % symbol)
+            position = match.end()
+            nonterminal, literal, bar = match.groups()
+            if bar:
+                alternatives.append([])
+            elif nonterminal:
+                alternatives[-1].append(nonterminal)
+            elif literal is not None:
+                alternatives[-1].append(literal.decode("string_escape"))
+        grammar.setdefault(symbol, []).extend(
+            tuple(alternative) for alternative in alternatives)
+    return grammar
+
+#a nonterminal, a double quoted literal, a bar or trailing space.
+BNF_TOKEN = re.compile(r'\s*(?:(<[^<> ]+>)|"((?:[^"\\]|\\.)*)"|(\|)|$)')
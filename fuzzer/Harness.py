@@ -0,0 +1,311 @@
+from types import NoneType
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import threading
+import time
+import traceback
+import Queue
+
+#the number of seconds an idle worker has to clean up when stopped.
+KILL_GRACE = 5
+
+class Harness(object):
+    """
+    Harness runs a target on attempts in a pool of forked worker processes.
+    Each worker handles one attempt at a time, so an attempt that hangs or
+    crashes its worker is known exactly. Hung workers are killed and every
+    lost worker is replaced, so the run carries on.
+
+    Methods:
+
+    public:
+        __init__(self, target, workers=None, timeout=10)
+        start(self)
+        stop(self)
+        run(self, jobs)
+    private:
+        _spawn(self)
+        _replace(self, worker)
+        _kill(self, worker, graceful=False)
+    """
+    def __init__(self, target, workers=None, timeout=10):
+        """
+        Arguments:
+
+        target: The function run on every attempt. A true return value is a
+        success and a false one a failure. Raising TargetCrashed or
+        TargetTimeout records a crash or timeout of a program it runs.
+        Workers are forked, so it does not have to be picklable. If it has
+        a `close` method, such as an Executor, it is called by idle workers
+        as they stop and by the harness once every worker is gone.
+
+        workers: The number of worker processes. Defaults to the number of
+        cores.
+
+        timeout: The number of seconds an attempt may run before its worker
+        is killed. None waits forever.
+        """
+        if not isinstance(workers, NoneType) and \
+           (not isinstance(workers, int) or workers < 1):
+            raise ValueError("`workers` must be a positive integer.")
+        if not isinstance(timeout, (NoneType, int, float)) or \
+           (not isinstance(timeout, NoneType) and timeout <= 0):
+            raise ValueError("`timeout` must be a positive number.")
+        self.target = target
+        self.workers = workers or multiprocessing.cpu_count()
+        self.timeout = timeout
+        self.pool = []
+    def start(self):
+        """
+        Start the worker processes.
+        """
+        while len(self.pool) < self.workers:
+            self.pool.append(self._spawn())
+    def stop(self):
+        """
+        Stop the worker processes, then close the target. Idle workers are
+        asked to stop, so they close the target too, busy ones are killed.
+        """
+        for worker in self.pool:
+            self._kill(worker, graceful=worker.job is None)
+        self.pool = []
+        if hasattr(self.target, "close"):
+            self.target.close()
+    def run(self, jobs):
+        """
+        Run the target on every attempt, yielding a (key, outcome, detail)
+        tuple in the order attempts finish. `outcome` is "success", "fail",
+        "exception" when the target raised, "crash" when the worker died, or
+        "timeout" when it was killed. `detail` holds the traceback, exit
+        code or timeout, and is None otherwise. Workers are started if
+        needed, and stopped once `jobs` is exhausted.
+
+        Arguments:
+
+        jobs: An iterable of (key, attempt) tuples. The key is passed back
+        with the outcome.
+        """
+        self.start()
+        jobs = iter(jobs)
+        exhausted = False
+        try:
+            while True:
+                for worker in self.pool:
+                    if worker.job is None and not exhausted:
+                        try:
+                            worker.job = next(jobs)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        worker.connection.send(worker.job[1])
+                        worker.started = time.time()
+                busy = list(worker for worker in self.pool
+                            if worker.job is not None)
+                if len(busy) == 0:
+                    return
+                wait = None
+                if not isinstance(self.timeout, NoneType):
+                    wait = max(0, min(worker.started for worker in busy) +
+                                  self.timeout - time.time())
+                ready = select.select(list(worker.connection
+                                           for worker in busy),
+                                      [], [], wait)[0]
+                for worker in busy:
+                    key = worker.job[0]
+                    if worker.connection in ready:
+                        try:
+                            outcome, detail = worker.connection.recv()
+                        except (EOFError, IOError):
+                            #the target took the worker down with it.
+                            worker.process.join()
+                            outcome = "crash"
+                            detail = "exit code %s" % worker.process.exitcode
+                            self._replace(worker)
+                        else:
+                            worker.job = None
+                    elif not isinstance(self.timeout, NoneType) and \
+                         time.time() - worker.started >= self.timeout:
+                        outcome = "timeout"
+                        detail = "%s seconds" % self.timeout
+                        self._replace(worker)
+                    else:
+                        continue
+                    yield key, outcome, detail
+        finally:
+            self.stop()
+
+    def _spawn(self):
+        """
+        Fork a worker process, returning its Worker.
+        """
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_serve,
+                                          args=(self.target, child))
+        process.daemon = True
+        process.start()
+        #only the worker holds its end, so its death is seen as an EOF.
+        child.close()
+        return Worker(process, parent)
+    def _replace(self, worker):
+        """
+        Kill a worker and put a new one in its place in the pool.
+        """
+        self._kill(worker)
+        self.pool[self.pool.index(worker)] = self._spawn()
+    def _kill(self, worker, graceful=False):
+        """
+        Kill a worker process and close its connection. A `graceful` stop
+        sends SIGTERM first, so the worker closes its target, and only kills
+        it if it does not stop within `KILL_GRACE` seconds. Hung and crashed
+        workers are killed at once, so they never hold up the others.
+        """
+        if worker.process.is_alive():
+            if graceful:
+                worker.process.terminate()
+                worker.process.join(KILL_GRACE)
+            if worker.process.is_alive():
+                os.kill(worker.process.pid, signal.SIGKILL)
+        worker.process.join()
+        worker.connection.close()
+
+class Worker(object):
+    """
+    A worker process of a Harness, with the attempt it is running.
+    """
+    def __init__(self, process, connection):
+        self.process = process
+        self.connection = connection
+        #the (key, attempt) being run, None while idle.
+        self.job = None
+        self.started = None
+
+class ThreadedHarness(object):
+    """
+    ThreadedHarness runs a target on many attempts at once in a pool of
+    threads, for targets that spend their time waiting on I/O such as
+    network services. Threads release the interpreter while they wait, so
+    hundreds of attempts can be in flight. Threads can not be killed, so
+    targets must time out on their own, for example with socket timeouts.
+
+    Methods:
+
+    public:
+        __init__(self, target, concurrency=100)
+        run(self, jobs)
+    """
+    def __init__(self, target, concurrency=100):
+        """
+        Arguments:
+
+        target: The function run on every attempt, the same as for Harness.
+        It is called from many threads at once. A `socket.timeout` it raises
+        is recorded as a timeout.
+
+        concurrency: The number of attempts in flight at once.
+        """
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise ValueError("`concurrency` must be a positive integer.")
+        self.target = target
+        self.concurrency = concurrency
+    def run(self, jobs):
+        """
+        Run the target on every attempt, yielding a (key, outcome, detail)
+        tuple in the order attempts finish, the same as `Harness.run`.
+        Attempts are taken from `jobs` in this thread only, so generators
+        that are not thread safe can be used.
+        """
+        pending = Queue.Queue()
+        finished = Queue.Queue()
+        threads = list(threading.Thread(target=_work,
+                                        args=(self.target, pending, finished))
+                       for count in xrange(self.concurrency))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        jobs = iter(jobs)
+        in_flight = 0
+        try:
+            while True:
+                #keep every thread busy, with one more job waiting for each.
+                while in_flight < 2 * self.concurrency:
+                    try:
+                        pending.put(next(jobs))
+                    except StopIteration:
+                        break
+                    in_flight += 1
+                if in_flight == 0:
+                    return
+                yield finished.get()
+                in_flight -= 1
+        finally:
+            #stop the threads once the jobs before the sentinels are done.
+            for thread in threads:
+                pending.put(None)
+
+def _outcome(target, attempt):
+    """
+    Run the target on an attempt, returning its (outcome, detail).
+    """
+    try:
+        return ("success" if target(attempt) else "fail", None)
+    except TargetCrashed as error:
+        return ("crash", str(error))
+    except (TargetTimeout, socket.timeout) as error:
+        return ("timeout", str(error))
+    except Exception:
+        return ("exception", traceback.format_exc())
+
+def _serve(target, connection):
+    """
+    Run the target on every attempt received, sending back its outcome.
+    Runs inside the worker processes of a Harness. If the target has a
+    `close` method, such as an Executor, it is called when an idle worker
+    is stopped, so the target can stop the programs it runs.
+    """
+    #workers are stopped with SIGTERM, which must unwind to the `finally`.
+    signal.signal(signal.SIGTERM, _terminated)
+    try:
+        while True:
+            try:
+                attempt = connection.recv()
+            except EOFError:
+                return
+            connection.send(_outcome(target, attempt))
+    finally:
+        if hasattr(target, "close"):
+            target.close()
+
+def _terminated(signum, frame):
+    """
+    Signal handler that exits the worker like an uncaught SIGTERM would.
+    """
+    raise SystemExit(128 + signum)
+
+def _work(target, pending, finished):
+    """
+    Run the target on jobs until a None job is received, putting back a
+    (key, outcome, detail) tuple for each. Runs in the threads of a
+    ThreadedHarness.
+    """
+    while True:
+        job = pending.get()
+        if job is None:
+            return
+        finished.put((job[0],) + _outcome(target, job[1]))
+
+class TargetCrashed(Exception):
+    """
+    Raised by a target when the program it runs crashed, so the attempt is
+    recorded as a crash instead of an exception.
+    """
+    pass
+
+class TargetTimeout(Exception):
+    """
+    Raised by a target when the program it runs was killed for running too
+    long, so the attempt is recorded as a timeout.
+    """
+    pass
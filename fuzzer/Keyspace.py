@@ -0,0 +1,821 @@
+import bisect
+import itertools
+import random
+import collections
+import string
+import struct
+
+class KeyspaceView(object):
+    """
+    Base class of keyspaces, holding the bounds of a view into them. A view
+    covers every `step`th index of the whole keyspace from `start` up to
+    `stop`, and is narrowed by slicing.
+
+    Methods:
+
+    public:
+        count(self)
+        __len__(self)
+    private:
+        _view(self, key)
+        _clamp(self, index, count)
+        _absolute(self, index)
+    """
+    def __len__(self):
+        """
+        Return the number of candidates in the keyspace. Keyspaces too large
+        for `len` should use `count` instead.
+        """
+        return self.count
+
+    @property
+    def count(self):
+        """
+        The number of candidates in this view of the keyspace.
+        """
+        if self.stop <= self.start:
+            return 0
+        return (self.stop - self.start + self.step - 1) // self.step
+
+    def _view(self, key):
+        """
+        Return a new view narrowed by a slice. Slices must have a positive
+        step.
+        """
+        count = self.count
+        step = 1 if key.step is None else key.step
+        if step <= 0:
+            raise ValueError("slice step must be positive.")
+        start = self._clamp(0 if key.start is None else key.start, count)
+        stop = self._clamp(count if key.stop is None else key.stop, count)
+        view = object.__new__(self.__class__)
+        view.__dict__.update(self.__dict__)
+        view.start = self.start + start * self.step
+        view.stop = self.start + max(start, stop) * self.step
+        view.step = self.step * step
+        return view
+
+    def _clamp(self, index, count):
+        """
+        Normalize a slice bound against the number of candidates.
+        """
+        if index < 0:
+            index += count
+        return min(max(index, 0), count)
+
+    def _absolute(self, index):
+        """
+        Convert an index in this view to an index in the whole keyspace.
+        """
+        count = self.count
+        if index < 0:
+            index += count
+        if index < 0 or index >= count:
+            raise IndexError("keyspace index out of range.")
+        return self.start + index * self.step
+
+class Keyspace(KeyspaceView):
+    """
+    Keyspace maps every candidate of a sequential run to a unique integer
+    index and back. Each position of a candidate is a digit in a mixed radix
+    number, where the radix of a position is the size of its alphabet. This
+    lets any candidate be reached directly by index, without iterating up
+    to it.
+
+    Methods:
+
+    public:
+        __init__(self, length=5, minimum=0, maximum=255,
+                 character_evaluator=chr, alphabet=None, prohibit=None,
+                 pure_evaluator=False, evaluator_cache_size=None,
+                 alphabets=None)
+        values(self, index)
+        index(self, candidate)
+        __getitem__(self, key)
+        __iter__(self)
+        iter_digits(self)
+        iter_bytes(self, output_format="{fuzzed_string}", element_width=1,
+                   byteorder="big", reuse_buffer=False)
+        batches(self, batch_size)
+    private:
+        _iter_changes(self)
+        _digits(self, absolute)
+        _advance(self, digits, amount)
+        _evaluate(self, digits)
+        _character_tables(self, pure)
+    """
+    def __init__(self, length=5, minimum=0, maximum=255,
+                 character_evaluator=chr, alphabet=None, prohibit=None,
+                 pure_evaluator=False, evaluator_cache_size=None,
+                 alphabets=None):
+        """
+        Arguments:
+
+        length: The length of every candidate in the keyspace.
+
+        minimum: The lowest number used at every position. Ignored when
+        `alphabet` is given.
+
+        maximum: The highest number used at every position. Ignored when
+        `alphabet` is given.
+
+        character_evaluator: The function used to convert a number into a
+        character. It must accept one required parameter and return one
+        character.
+
+        alphabet: An optional list of the numbers used at every position,
+        in order. Defaults to every number from `minimum` to `maximum`.
+
+        prohibit: An optional list of prohibited characters. Numbers that
+        evaluate to one of them are removed from the alphabet, so candidates
+        containing them are never built.
+
+        pure_evaluator: Declares that `character_evaluator` always returns
+        the same character for a number. Its character for every number of
+        the alphabet is then computed once into a table, and generation
+        indexes the table instead of calling it. `chr` and `unichr` are
+        always treated as pure.
+
+        evaluator_cache_size: For evaluators that are not pure, the number
+        of recent characters to keep in a least recently used cache.
+        Defaults to no cache.
+
+        alphabets: An optional list with a list of numbers for every
+        position, such as returned by `parse_mask`. Overrides `length`,
+        `minimum`, `maximum` and `alphabet`.
+        """
+        if alphabets is None:
+            if not isinstance(length, (int, long)):
+                raise TypeError("`length` must be an integer.")
+            if length < 0:
+                raise ValueError("`length` must not be negative.")
+            if alphabet is None:
+                if minimum > maximum:
+                    raise ValueError("`minimum` must be less than `maximum`.")
+                alphabet = range(minimum, maximum + 1)
+            alphabet = prune_alphabet(alphabet, character_evaluator, prohibit)
+            if len(alphabet) == 0:
+                raise ValueError("`alphabet` must not be empty.")
+            #every position has its own alphabet so that the radix is mixed.
+            alphabets = [alphabet] * length
+        else:
+            alphabets = list(prune_alphabet(place, character_evaluator,
+                                            prohibit)
+                             for place in alphabets)
+            if not all(alphabets):
+                raise ValueError("Every alphabet in `alphabets` must not be\
+                                  empty.")
+            length = len(alphabets)
+        if evaluator_cache_size and not pure_evaluator:
+            character_evaluator = CachedEvaluator(character_evaluator,
+                                                  evaluator_cache_size)
+        self.length = length
+        self.character_evaluator = character_evaluator
+        self.prohibit = prohibit
+        self.alphabets = alphabets
+        #the characters of every position, indexed by digit.
+        pure = pure_evaluator or character_evaluator in PURE_EVALUATORS
+        self.characters = self._character_tables(pure)
+        self.radices = list(len(place) for place in self.alphabets)
+        self.size = 1
+        for radix in self.radices:
+            self.size *= radix
+        #bounds of the view into the keyspace, narrowed by slicing.
+        self.start = 0
+        self.stop = self.size
+        self.step = 1
+        #reverse lookups from a character to its digit, built on demand.
+        self._lookups = None
+
+    def __getitem__(self, key):
+        """
+        Return the candidate at an index, or a new keyspace view when given
+        a slice. Slices must have a positive step.
+        """
+        if isinstance(key, slice):
+            return self._view(key)
+        return self._evaluate(self._digits(self._absolute(key)))
+
+    def __iter__(self):
+        """
+        Iterate through the candidates in order. Moving to the next candidate
+        only touches the positions that carry, and only those positions are
+        evaluated again, so each step is O(1) amortized apart from joining
+        the string.
+        """
+        tables = self.characters
+        characters = None
+        for digits, changed in self._iter_changes():
+            if characters is None:
+                characters = list(table[digit] for table, digit in
+                                  zip(tables, digits))
+            else:
+                #only the positions the carry reached are evaluated again.
+                for place in xrange(changed, self.length):
+                    characters[place] = tables[place][digits[place]]
+            yield "".join(characters)
+
+    def iter_digits(self):
+        """
+        Iterate through the mixed radix digits of the candidates in order.
+        The same list is updated in place and yielded every time, copy it
+        to keep it.
+        """
+        for digits, changed in self._iter_changes():
+            yield digits
+
+    def iter_bytes(self, output_format="{fuzzed_string}", element_width=1,
+                   byteorder="big", reuse_buffer=False):
+        """
+        Iterate through the candidates as byte strings formatted into
+        `output_format`. Numbers are packed into `element_width` bytes each
+        instead of going through the character evaluator, and the format is
+        compiled once, so no per character calls or format parsing happen
+        per candidate. Only the bytes of the positions that changed are
+        rewritten between candidates.
+
+        Arguments:
+
+        output_format: The format the candidate is placed into, anywhere
+        `{fuzzed_string}` is located.
+
+        element_width: The number of bytes every number is packed into.
+
+        byteorder: "big" or "little", the byte order of wide elements.
+
+        reuse_buffer: If True, the same bytearray is updated in place and
+        yielded for every candidate, so nothing is copied. Copy it to keep
+        it. Otherwise an immutable copy is yielded.
+        """
+        segments = compile_output_format(output_format)
+        tables = list(encode_alphabet(alphabet, element_width, byteorder)
+                      for alphabet in self.alphabets)
+        size = self.length * element_width
+        buffer = bytearray(("\x00" * size).join(segments))
+        #where the candidate starts for every `{fuzzed_string}`.
+        offsets = []
+        offset = 0
+        for segment in segments[:-1]:
+            offset += len(segment)
+            offsets.append(offset)
+            offset += size
+        for digits, changed in self._iter_changes():
+            #only the bytes of the positions the carry reached are written.
+            suffix = "".join([tables[place][digits[place]]
+                              for place in xrange(changed, self.length)])
+            for offset in offsets:
+                buffer[offset + changed * element_width:offset + size] = suffix
+            yield buffer if reuse_buffer else bytes(buffer)
+
+    def batches(self, batch_size):
+        """
+        Iterate through the candidates in order, in lists of `batch_size`
+        candidates. The last list may be smaller. Runs of the last position
+        share one evaluated prefix, so the evaluator is called about once
+        per candidate instead of once per character.
+        """
+        count = self.count
+        if self.step != 1 or self.length == 0:
+            candidates = iter(self)
+            while count > 0:
+                batch = list(itertools.islice(candidates, batch_size))
+                count -= len(batch)
+                yield batch
+            return
+        last = self.length - 1
+        digits = self._digits(self.start)
+        pending = []
+        while count > 0:
+            #characters may be longer than one byte, so the prefix is built
+            #from every position but the last.
+            prefix = "".join([table[digit] for table, digit in
+                              zip(self.characters[:last], digits[:last])])
+            first = digits[last]
+            run = min(self.radices[last] - first, count)
+            pending.extend(prefix + character for character in
+                           self.characters[last][first:first + run])
+            count -= run
+            self._advance(digits, run)
+            while len(pending) >= batch_size:
+                yield pending[:batch_size]
+                del pending[:batch_size]
+        if pending:
+            yield pending
+
+    def values(self, index):
+        """
+        Return the internal number list of the candidate at `index`.
+        """
+        digits = self._digits(self._absolute(index))
+        return list(alphabet[digit] for alphabet, digit in
+                    zip(self.alphabets, digits))
+
+    def index(self, candidate):
+        """
+        Return the index of `candidate` in this view of the keyspace.
+        Raises ValueError if the candidate is not in the keyspace.
+        """
+        if len(candidate) != self.length:
+            raise ValueError("%r is not in the keyspace." % (candidate,))
+        if self._lookups is None:
+            self._lookups = list(
+                dict((character, digit) for digit, character in
+                     enumerate(table[0:len(alphabet)]))
+                for table, alphabet in zip(self.characters, self.alphabets))
+        absolute = 0
+        for lookup, radix, character in zip(self._lookups, self.radices,
+                                             candidate):
+            if character not in lookup:
+                raise ValueError("%r is not in the keyspace." % (candidate,))
+            absolute = absolute * radix + lookup[character]
+        offset, remainder = divmod(absolute - self.start, self.step)
+        if remainder or offset < 0 or absolute >= self.stop:
+            raise ValueError("%r is not in the keyspace." % (candidate,))
+        return offset
+
+    def _digits(self, absolute):
+        """
+        Convert an index in the whole keyspace to its mixed radix digits.
+        The first position is the most significant.
+        """
+        digits = [0] * self.length
+        for place in xrange(self.length - 1, -1, -1):
+            absolute, digits[place] = divmod(absolute, self.radices[place])
+        return digits
+
+    def _iter_changes(self):
+        """
+        Iterate through the digits of the candidates in order, along with
+        the first position that changed since the previous candidate. The
+        same list is updated in place and yielded every time.
+        """
+        count = self.count
+        if count == 0:
+            return
+        digits = self._digits(self.start)
+        yield digits, 0
+        #a plain counter, xrange cannot hold the size of large keyspaces.
+        remaining = count - 1
+        while remaining:
+            yield digits, self._advance(digits, self.step)
+            remaining -= 1
+
+    def _advance(self, digits, amount):
+        """
+        Add `amount` to the digits in place, carrying towards the first
+        position. Stops as soon as there is nothing left to carry. Returns
+        the first position that changed.
+        """
+        place = self.length - 1
+        while amount and place >= 0:
+            amount, digits[place] = divmod(digits[place] + amount,
+                                           self.radices[place])
+            place -= 1
+        return place + 1
+
+    def _evaluate(self, digits):
+        """
+        Turn digits into the candidate string.
+        """
+        return "".join([table[digit] for table, digit in
+                        zip(self.characters, digits)])
+
+    def _character_tables(self, pure):
+        """
+        Build what maps a digit to its character for every position. Pure
+        evaluators get a precomputed list, others are evaluated on lookup.
+        Positions sharing an alphabet share a table.
+        """
+        tables = {}
+        for alphabet in self.alphabets:
+            if id(alphabet) not in tables:
+                tables[id(alphabet)] = character_table(
+                                           alphabet, self.character_evaluator,
+                                           pure)
+        return list(tables[id(alphabet)] for alphabet in self.alphabets)
+
+class LengthSweep(KeyspaceView):
+    """
+    LengthSweep joins the keyspaces of every length from `min_length` to
+    `max_length` into one continuous keyspace, shorter lengths first. It
+    is indexed, sliced and iterated like a Keyspace, so one position covers
+    the whole sweep and slices may span several lengths.
+
+    Methods:
+
+    public:
+        __init__(self, min_length=1, max_length=5, minimum=0, maximum=255,
+                 character_evaluator=chr, alphabet=None, prohibit=None,
+                 pure_evaluator=False, evaluator_cache_size=None,
+                 alphabets=None)
+        values(self, index)
+        index(self, candidate)
+        __getitem__(self, key)
+        __iter__(self)
+        iter_bytes(self, output_format="{fuzzed_string}", element_width=1,
+                   byteorder="big", reuse_buffer=False)
+        batches(self, batch_size)
+    private:
+        _parts(self)
+        _locate(self, absolute)
+    """
+    def __init__(self, min_length=1, max_length=5, minimum=0, maximum=255,
+                 character_evaluator=chr, alphabet=None, prohibit=None,
+                 pure_evaluator=False, evaluator_cache_size=None,
+                 alphabets=None):
+        """
+        Arguments:
+
+        min_length: The length of the first candidates.
+
+        max_length: The length of the last candidates.
+
+        alphabets: An optional list with a list of numbers for every
+        position, such as returned by `parse_mask`. Every length uses the
+        alphabets of its first positions, so `max_length` must not be
+        larger than the number of alphabets.
+
+        The remaining arguments are the same as `Keyspace`.
+        """
+        if not isinstance(min_length, (int, long)) or \
+           not isinstance(max_length, (int, long)):
+            raise TypeError("`min_length` and `max_length` must be integers.")
+        if min_length < 0 or min_length > max_length:
+            raise ValueError("`min_length` must be between 0 and\
+                              `max_length`.")
+        if alphabets is not None and max_length > len(alphabets):
+            raise ValueError("`max_length` must not be larger than the\
+                              number of alphabets.")
+        if evaluator_cache_size and not pure_evaluator:
+            #one cache shared by every length.
+            character_evaluator = CachedEvaluator(character_evaluator,
+                                                  evaluator_cache_size)
+        self.prohibit = prohibit
+        self.keyspaces = list(
+            Keyspace(length=length, minimum=minimum, maximum=maximum,
+                     character_evaluator=character_evaluator,
+                     alphabet=alphabet, prohibit=prohibit,
+                     pure_evaluator=pure_evaluator,
+                     alphabets=None if alphabets is None
+                               else alphabets[:length])
+            for length in xrange(min_length, max_length + 1))
+        #the index of the first candidate of every length.
+        self.offsets = []
+        self.size = 0
+        for keyspace in self.keyspaces:
+            self.offsets.append(self.size)
+            self.size += keyspace.count
+        #bounds of the view into the sweep, narrowed by slicing.
+        self.start = 0
+        self.stop = self.size
+        self.step = 1
+
+    def __getitem__(self, key):
+        """
+        Return the candidate at an index, or a new view when given a slice.
+        Slices must have a positive step.
+        """
+        if isinstance(key, slice):
+            return self._view(key)
+        keyspace, index = self._locate(self._absolute(key))
+        return keyspace[index]
+
+    def __iter__(self):
+        """
+        Iterate through the candidates in order, shorter lengths first.
+        """
+        for part in self._parts():
+            for candidate in part:
+                yield candidate
+
+    def iter_bytes(self, output_format="{fuzzed_string}", element_width=1,
+                   byteorder="big", reuse_buffer=False):
+        """
+        Iterate through the candidates as byte strings, see
+        `Keyspace.iter_bytes`.
+        """
+        for part in self._parts():
+            for candidate in part.iter_bytes(output_format, element_width,
+                                             byteorder, reuse_buffer):
+                yield candidate
+
+    def batches(self, batch_size):
+        """
+        Iterate through the candidates in order, in lists of `batch_size`
+        candidates. Batches may span several lengths, and only the last one
+        may be smaller.
+        """
+        pending = []
+        for part in self._parts():
+            for batch in part.batches(batch_size):
+                pending.extend(batch)
+                while len(pending) >= batch_size:
+                    yield pending[:batch_size]
+                    del pending[:batch_size]
+        if pending:
+            yield pending
+
+    def values(self, index):
+        """
+        Return the internal number list of the candidate at `index`.
+        """
+        keyspace, index = self._locate(self._absolute(index))
+        return keyspace.values(index)
+
+    def index(self, candidate):
+        """
+        Return the index of `candidate` in this view of the sweep. Raises
+        ValueError if the candidate is not in the sweep.
+        """
+        for keyspace, offset in zip(self.keyspaces, self.offsets):
+            if keyspace.length == len(candidate):
+                absolute = offset + keyspace.index(candidate)
+                offset, remainder = divmod(absolute - self.start, self.step)
+                if remainder or offset < 0 or absolute >= self.stop:
+                    break
+                return offset
+        raise ValueError("%r is not in the keyspace." % (candidate,))
+
+    def _parts(self):
+        """
+        Yield a Keyspace view for every length that overlaps this view,
+        holding the candidates of this view in that length.
+        """
+        for keyspace, offset in zip(self.keyspaces, self.offsets):
+            end = min(self.stop, offset + keyspace.count)
+            #the first index of this view at or after the start of the length.
+            first = max(self.start, offset)
+            first += (self.start - first) % self.step
+            if first < end:
+                yield keyspace[first - offset:end - offset:self.step]
+
+    def _locate(self, absolute):
+        """
+        Return the keyspace holding an index of the whole sweep, and the
+        index within it.
+        """
+        length = bisect.bisect_right(self.offsets, absolute) - 1
+        return self.keyspaces[length], absolute - self.offsets[length]
+
+#evaluators that always return the same character for a number.
+PURE_EVALUATORS = (chr, unichr)
+
+def character_table(alphabet, character_evaluator, pure=False):
+    """
+    Return what maps a digit of `alphabet` to its character. Pure evaluators
+    are evaluated once for every number into a list, others are wrapped so
+    they are called on lookup.
+    """
+    if pure or character_evaluator in PURE_EVALUATORS:
+        return list(character_evaluator(value) for value in alphabet)
+    return EvaluatedAlphabet(alphabet, character_evaluator)
+
+class EvaluatedAlphabet(object):
+    """
+    Maps a digit to its character by calling the evaluator on lookup, for
+    evaluators that are not pure. Indexes like a list of the characters.
+    """
+    def __init__(self, alphabet, character_evaluator):
+        self.alphabet = alphabet
+        self.character_evaluator = character_evaluator
+    def __len__(self):
+        return len(self.alphabet)
+    def __getitem__(self, digit):
+        if isinstance(digit, slice):
+            return list(self.character_evaluator(value)
+                        for value in self.alphabet[digit])
+        return self.character_evaluator(self.alphabet[digit])
+
+class CachedEvaluator(object):
+    """
+    Wraps a character evaluator with a bounded least recently used cache,
+    for evaluators that are costly but not declared pure, or ranges too
+    large for a table.
+    """
+    def __init__(self, character_evaluator, cache_size):
+        self.character_evaluator = character_evaluator
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+    def __call__(self, value):
+        cache = self.cache
+        if value in cache:
+            #move the character to the most recently used end.
+            character = cache[value] = cache.pop(value)
+            return character
+        character = self.character_evaluator(value)
+        cache[value] = character
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return character
+
+def prune_alphabet(alphabet, character_evaluator, prohibit):
+    """
+    Return the numbers of `alphabet` whose character is not prohibited.
+
+    Arguments:
+
+    alphabet: The numbers to prune.
+
+    character_evaluator: The function used to convert a number into a
+    character.
+
+    prohibit: A list of prohibited characters, or None.
+    """
+    if prohibit is None:
+        return list(alphabet)
+    prohibit = set(prohibit)
+    return list(value for value in alphabet
+                if character_evaluator(value) not in prohibit)
+
+#the built in charsets of masks, as in hashcat.
+CHARSETS = {
+    "l": string.ascii_lowercase,
+    "u": string.ascii_uppercase,
+    "d": string.digits,
+    "h": string.digits + "abcdef",
+    "H": string.digits + "ABCDEF",
+    "s": " !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~",
+    "a": string.ascii_lowercase + string.ascii_uppercase + string.digits +
+         " !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~",
+    "b": "".join(chr(value) for value in xrange(256)),
+}
+
+def parse_mask(mask, charsets=None):
+    """
+    Turn a hashcat style mask into a list with the alphabet of every
+    position, to build a Keyspace with `alphabets`. Every position is either
+    a literal character, "??" for a literal "?", or a charset: ?l, ?u, ?d,
+    ?h, ?H, ?s, ?a, ?b, or a custom charset from `charsets`.
+
+    Arguments:
+
+    mask: The mask, for example "?u?l?l?d?d".
+
+    charsets: An optional dictionary of custom charsets by name, such as
+    {"1": "abc?d"}, used in the mask as "?1". A custom charset may contain
+    the built in charsets.
+    """
+    custom = dict((name, expand_charset(charset))
+                  for name, charset in (charsets or {}).items())
+    alphabets = []
+    index = 0
+    while index < len(mask):
+        character = mask[index]
+        index += 1
+        if character != "?":
+            alphabets.append([ord(character)])
+            continue
+        if index == len(mask):
+            raise ValueError("Mask `%s` ends with \"?\"." % mask)
+        name = mask[index]
+        index += 1
+        if name == "?":
+            alphabets.append([ord("?")])
+        elif name in custom:
+            alphabets.append(custom[name])
+        elif name in CHARSETS:
+            alphabets.append(expand_charset("?" + name))
+        else:
+            raise ValueError("Unknown charset `?%s` in mask `%s`."
+                             % (name, mask))
+    return alphabets
+
+def expand_charset(charset):
+    """
+    Return the numbers of a charset, in order and without repeats. The
+    charset may contain built in charsets such as "?d".
+    """
+    values = []
+    seen = set()
+    index = 0
+    while index < len(charset):
+        characters = charset[index]
+        index += 1
+        if characters == "?" and index < len(charset):
+            name = charset[index]
+            index += 1
+            if name in CHARSETS:
+                characters = CHARSETS[name]
+            elif name != "?":
+                raise ValueError("Unknown charset `?%s` in charset `%s`."
+                                 % (name, charset))
+        for character in characters:
+            if character not in seen:
+                seen.add(character)
+                values.append(ord(character))
+    return values
+
+def compile_output_format(output_format):
+    """
+    Split an output format into the literal byte segments around every
+    `{fuzzed_string}`, so that a candidate is placed with
+    `candidate.join(segments)`. Raises ValueError for any other field, or a
+    conversion or format spec, since those cannot be precompiled.
+    """
+    segments = [""]
+    for literal, field, format_spec, conversion in \
+            string.Formatter().parse(output_format):
+        segments[-1] += literal
+        if field is None:
+            continue
+        if field != "fuzzed_string" or format_spec or conversion:
+            raise ValueError("Only plain `{fuzzed_string}` fields can be\
+                              used in a bytes output_format.")
+        segments.append("")
+    return segments
+
+#struct codes for each supported element width.
+ELEMENT_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+def encode_alphabet(alphabet, element_width=1, byteorder="big"):
+    """
+    Pack every number of `alphabet` into `element_width` bytes.
+    """
+    if element_width not in ELEMENT_FORMATS:
+        raise ValueError("`element_width` must be one of %s."
+                         % sorted(ELEMENT_FORMATS))
+    if byteorder not in ("big", "little"):
+        raise ValueError("`byteorder` must be \"big\" or \"little\".")
+    code = (">" if byteorder == "big" else "<") + \
+           ELEMENT_FORMATS[element_width]
+    try:
+        return list(struct.pack(code, value) for value in alphabet)
+    except struct.error:
+        raise ValueError("Every number must fit in `element_width` bytes.")
+
+class Permutation(object):
+    """
+    Permutation is a keyed, pseudo-random bijection over range(size) that
+    uses constant memory. It is a balanced Feistel network over the
+    smallest even number of bits that holds `size`, and indexes that land
+    outside of the range are walked through the network again until they
+    land inside it. Iterating visits every index exactly once.
+
+    Methods:
+
+    public:
+        __init__(self, size, generator=None, rounds=4)
+        __len__(self)
+        __getitem__(self, index)
+        __iter__(self)
+    private:
+        _encrypt(self, value)
+    """
+    #large odd multiplier used to mix the round function.
+    MULTIPLIER = 0x9E3779B97F4A7C15
+
+    def __init__(self, size, generator=None, rounds=4):
+        """
+        Arguments:
+
+        size: The number of indexes to permute.
+
+        generator: A random.Random used to draw the round keys. The same
+        keys give the same permutation. Defaults to a fresh generator
+        seeded from the operating system.
+
+        rounds: The number of Feistel rounds.
+        """
+        if size < 0:
+            raise ValueError("`size` must not be negative.")
+        if generator is None:
+            generator = random.Random()
+        self.size = size
+        bits = max(2, (size - 1).bit_length() if size > 1 else 0)
+        self.half_bits = (bits + 1) // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        self.keys = list(generator.getrandbits(self.half_bits)
+                         for round_number in range(rounds))
+    def __len__(self):
+        return self.size
+    def __getitem__(self, index):
+        """
+        Return the index that `index` is moved to.
+        """
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError("permutation index out of range.")
+        value = self._encrypt(index)
+        #cycle walking, the domain holds less than four times the size so
+        #only a few extra passes are expected.
+        while value >= self.size:
+            value = self._encrypt(value)
+        return int(value)
+    def __iter__(self):
+        index = 0
+        while index < self.size:
+            yield self[index]
+            index += 1
+    def _encrypt(self, value):
+        """
+        Run a value through the Feistel network.
+        """
+        half_bits = self.half_bits
+        mask = self.half_mask
+        left, right = value >> half_bits, value & mask
+        for key in self.keys:
+            mixed = ((right ^ key) * self.MULTIPLIER) & mask
+            mixed ^= mixed >> (half_bits // 2 + 1)
+            left, right = right, left ^ mixed
+        return (left << half_bits) | right
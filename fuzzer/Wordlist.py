@@ -0,0 +1,257 @@
+from types import NoneType
+import itertools
+import mmap
+import os
+
+class Wordlist(object):
+    """
+    Wordlist streams the words of a file, one per line, through a memory
+    map and mutates every word with hashcat style rules. Words are split out
+    of large chunks at a time, so a wordlist never has to fit in memory and
+    is not read line by line.
+
+    Methods:
+
+    public:
+        __init__(self, path, rules=None, chunk_size=1048576)
+        __iter__(self)
+        words(self)
+        chunks(self)
+    """
+    def __init__(self, path, rules=None, chunk_size=1048576):
+        """
+        Arguments:
+
+        path: The path of the wordlist. Lines may end in "\\n" or "\\r\\n".
+
+        rules: A list of rules, every word is yielded once per rule. A rule
+        is either a hashcat rule string, see `compile_rule`, or a function
+        that takes a word and returns the mutated word, or None to reject
+        it. Defaults to yielding every word unchanged.
+
+        chunk_size: The number of bytes split into words at a time.
+        """
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise ValueError("`chunk_size` must be a positive integer.")
+        self.path = path
+        self.chunk_size = chunk_size
+        if isinstance(rules, NoneType):
+            self.rules = None
+        else:
+            self.rules = list(compile_rule(rule) if isinstance(rule, str)
+                              else rule for rule in rules)
+    def __iter__(self):
+        """
+        Yield every mutated word, each word once per rule in order.
+        """
+        for words in self.chunks():
+            for word in words:
+                yield word
+    def words(self):
+        """
+        Yield every line of the wordlist, without mutations.
+        """
+        for lines in self._lines():
+            for line in lines:
+                yield line
+    def chunks(self):
+        """
+        Yield lists of mutated words, one list for every chunk of the file.
+        Rejected candidates are left out.
+        """
+        rules = self.rules
+        for lines in self._lines():
+            if isinstance(rules, NoneType):
+                yield lines
+                continue
+            #every rule is mapped over the whole chunk, then the columns are
+            #interleaved so each word's mutations stay together.
+            columns = list(lines if rule is _unchanged else map(rule, lines)
+                           for rule in rules)
+            if len(columns) == 1:
+                words = columns[0]
+            else:
+                words = list(itertools.chain.from_iterable(
+                                 itertools.izip(*columns)))
+            if None in words:
+                words = list(word for word in words if word is not None)
+            yield words
+
+    def _lines(self):
+        """
+        Yield lists of the lines in every chunk of the file. A line cut by
+        the end of a chunk is carried over to the next one.
+        """
+        with open(self.path, "rb") as wordlist:
+            if os.fstat(wordlist.fileno()).st_size == 0:
+                #an empty file can not be mapped.
+                return
+            mapped = mmap.mmap(wordlist.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                carry = ""
+                for offset in xrange(0, len(mapped), self.chunk_size):
+                    lines = (carry +
+                             mapped[offset:offset + self.chunk_size]
+                            ).split("\n")
+                    carry = lines.pop()
+                    yield _strip_returns(lines)
+                if carry:
+                    yield _strip_returns([carry])
+            finally:
+                mapped.close()
+
+def _strip_returns(lines):
+    """
+    Remove the carriage returns of "\\r\\n" line endings. Every line is
+    checked, as a wordlist may mix line endings.
+    """
+    return list(line[:-1] if line.endswith("\r") else line for line in lines)
+
+#substitutions for `compile_rule`, "sa4se3si1so0ss5st7" as a rule.
+LEETSPEAK = "".join("s%s%s" % pair for pair in
+                    [("a", "4"), ("e", "3"), ("i", "1"),
+                     ("o", "0"), ("s", "5"), ("t", "7")])
+
+#positions are written 0-9 then A-Z, as in hashcat.
+POSITIONS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def _unchanged(word):
+    return word
+
+def _toggle(word, position):
+    if position >= len(word):
+        return word
+    return word[:position] + word[position].swapcase() + word[position + 1:]
+
+def _delete(word, position):
+    return word[:position] + word[position + 1:]
+
+def _insert(word, position, character):
+    if position > len(word):
+        return word
+    return word[:position] + character + word[position:]
+
+def _overwrite(word, position, character):
+    if position >= len(word):
+        return word
+    return word[:position] + character + word[position + 1:]
+
+def _extract(word, position, count):
+    if position >= len(word):
+        return word
+    return word[position:position + count]
+
+def _omit(word, position, count):
+    if position >= len(word):
+        return word
+    return word[:position] + word[position + count:]
+
+#rule functions by name, with the kinds of arguments they take. "N" is a
+#position or count, "X" is a character.
+RULE_FUNCTIONS = {
+    ":": ("", _unchanged),
+    "l": ("", str.lower),
+    "u": ("", str.upper),
+    "c": ("", lambda word: word[:1].upper() + word[1:].lower()),
+    "C": ("", lambda word: word[:1].lower() + word[1:].upper()),
+    "t": ("", str.swapcase),
+    "T": ("N", _toggle),
+    "r": ("", lambda word: word[::-1]),
+    "d": ("", lambda word: word + word),
+    "p": ("N", lambda word, count: word * (count + 1)),
+    "f": ("", lambda word: word + word[::-1]),
+    "{": ("", lambda word: word[1:] + word[:1]),
+    "}": ("", lambda word: word[-1:] + word[:-1]),
+    "$": ("X", lambda word, character: word + character),
+    "^": ("X", lambda word, character: character + word),
+    "[": ("", lambda word: word[1:]),
+    "]": ("", lambda word: word[:-1]),
+    "D": ("N", _delete),
+    "x": ("NN", _extract),
+    "O": ("NN", _omit),
+    "i": ("NX", _insert),
+    "o": ("NX", _overwrite),
+    "'": ("N", lambda word, position: word[:position]),
+    "s": ("XX", lambda word, old, new: word.replace(old, new)),
+    "@": ("X", lambda word, character: word.replace(character, "")),
+    "z": ("N", lambda word, count: word[:1] * count + word),
+    "Z": ("N", lambda word, count: word + word[-1:] * count),
+    "q": ("", lambda word: "".join(character * 2 for character in word)),
+}
+
+#reject functions, a word is rejected when they return True.
+REJECT_FUNCTIONS = {
+    "<": ("N", lambda word, length: len(word) > length),
+    ">": ("N", lambda word, length: len(word) < length),
+    "_": ("N", lambda word, length: len(word) != length),
+    "!": ("X", lambda word, character: character in word),
+    "/": ("X", lambda word, character: character not in word),
+}
+
+def compile_rule(rule):
+    """
+    Compile a hashcat style rule into a function that takes a word and
+    returns the mutated word, or None when the word is rejected. Functions
+    are applied left to right and spaces between them are ignored.
+
+    Supported functions are : l u c C t TN r d pN f { } $X ^X [ ] DN xNM
+    ONM iNX oNX 'N sXY @X zN ZN q, and the reject functions <N >N _N !X
+    /X. Positions past the end of a word leave it unchanged. Raises
+    ValueError on an unknown function or missing argument.
+    """
+    steps = []
+    index = 0
+    while index < len(rule):
+        name = rule[index]
+        index += 1
+        if name == " ":
+            continue
+        if name in RULE_FUNCTIONS:
+            kinds, function = RULE_FUNCTIONS[name]
+            reject = False
+        elif name in REJECT_FUNCTIONS:
+            kinds, function = REJECT_FUNCTIONS[name]
+            reject = True
+        else:
+            raise ValueError("Unknown rule function `%s` in rule `%s`."
+                             % (name, rule))
+        if index + len(kinds) > len(rule):
+            raise ValueError("Rule function `%s` is missing arguments in\
+                              rule `%s`." % (name, rule))
+        arguments = []
+        for kind in kinds:
+            argument = rule[index]
+            index += 1
+            if kind == "N":
+                if argument not in POSITIONS:
+                    raise ValueError("`%s` is not a position in rule `%s`."
+                                     % (argument, rule))
+                argument = POSITIONS.index(argument)
+            arguments.append(argument)
+        if function is not _unchanged:
+            steps.append((function, tuple(arguments), reject))
+
+    #single functions are returned as they are, to save a call per word.
+    if len(steps) == 0:
+        return _unchanged
+    if len(steps) == 1 and not steps[0][1] and not steps[0][2]:
+        return steps[0][0]
+
+    def mutate(word):
+        for function, arguments, reject in steps:
+            if reject:
+                if function(word, *arguments):
+                    return None
+            else:
+                word = function(word, *arguments)
+        return word
+    return mutate
+
+def read_rules(path):
+    """
+    Read the rules of a hashcat rule file, one per line. Blank lines and
+    lines starting with "#" are skipped.
+    """
+    with open(path, "rb") as rules:
+        return list(line.rstrip("\r\n") for line in rules
+                    if line.strip() and not line.startswith("#"))
@@ -1,2 +1,8 @@
 from Fuzzer import Fuzzer
-__all__ = ["Fuzzer"]
\ No newline at end of file
+from Keyspace import Keyspace, LengthSweep
+from Coordinator import Coordinator
+from Wordlist import Wordlist
+from Grammar import Grammar
+from Executor import Executor
+__all__ = ["Fuzzer", "Keyspace", "LengthSweep", "Coordinator", "Wordlist",
+           "Grammar", "Executor"]
\ No newline at end of file
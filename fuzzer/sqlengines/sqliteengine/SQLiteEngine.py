@@ -1,22 +1,105 @@
+from types import NoneType
+import atexit
+import collections
+import operator
+import os
 import sqlite3
-from threading import Lock
+import time
+from threading import Condition, Lock, Thread, local
 
 class SQLEngine(object):
     """
     SQLite3 engine for the Fuzzer. It is multi-threadable and pluggable
-    directly to the fuzzer.
+    directly to the fuzzer. Every thread keeps one connection open for all
+    of its queries, and the database is put in WAL mode so readers and the
+    writer do not block each other. Optionally, a background writer thread
+    commits the pool as it fills, so results reach the database while
+    fuzzing.
     """
-    def __init__(self, database_path, tables_to_cache=False):
+    def __init__(self, database_path, tables_to_cache=False,
+                 flush_every=None, flush_interval=None, max_pool=None,
+                 journal_mode="WAL", synchronous=None, cache_size=None,
+                 mmap_size=None, temp_store=None):
+        """
+        Arguments:
+
+        database_path: The path of the SQLite database.
+
+        tables_to_cache: Keep the table names in memory instead of looking
+        them up on every commit.
+
+        flush_every: Start a writer thread that commits the pool once it
+        holds this many items.
+
+        flush_interval: Start a writer thread that commits the pool at least
+        this often, in seconds.
+
+        max_pool: The most items the pool may hold while a writer thread
+        runs. Adding items to a full pool blocks until the writer has taken
+        it, so memory stays bounded when results come faster than they are
+        written.
+
+        journal_mode, synchronous, cache_size, mmap_size, temp_store: The
+        SQLite pragmas set on every connection, such as journal_mode="WAL",
+        synchronous="NORMAL", cache_size=-65536 (in KiB when negative),
+        mmap_size=268435456 and temp_store="MEMORY". None leaves SQLite's
+        default. WAL mode is kept by the database file once set.
+        """
+        for name, value in (("flush_every", flush_every),
+                            ("flush_interval", flush_interval),
+                            ("max_pool", max_pool)):
+            if not isinstance(value, (NoneType, int, long, float)) or \
+               (not isinstance(value, NoneType) and value <= 0):
+                raise ValueError("`%s` must be a positive number." % name)
+        if not isinstance(max_pool, NoneType) and \
+           isinstance(flush_every, NoneType) and \
+           isinstance(flush_interval, NoneType):
+            raise ValueError("`max_pool` needs `flush_every` or\
+                              `flush_interval`.")
+        self.pragmas = []
+        for name, value in (("journal_mode", journal_mode),
+                            ("synchronous", synchronous),
+                            ("cache_size", cache_size),
+                            ("mmap_size", mmap_size),
+                            ("temp_store", temp_store)):
+            if isinstance(value, NoneType):
+                continue
+            if not isinstance(value, (int, long)) and \
+               (not isinstance(value, str) or not value.isalpha()):
+                raise ValueError("`%s` must be a number or a word." % name)
+            self.pragmas.append((name, value))
         self.database_path = database_path
         self.tables_to_cache = tables_to_cache
         self.cached_tablenames = []
+        #tables whose pooled values are stored as they are, not as repr.
+        self.raw_tables = set()
 
+        #the pool lock is only held to add items or swap the pool out, so
+        #producers never wait on the database. Commits wait on each other.
         self.pool_lock = Lock()
-        self.pool_lock_activated = False
-        self.insert_pool = []
+        self.commit_lock = Lock()
+        self.insert_pool = collections.deque()
+        #the connection of every thread, reused by all of its queries.
+        self.connections = local()
+        #the writer waits for the pool to fill, full pools wait to drain.
+        self.pool_filled = Condition(self.pool_lock)
+        self.pool_drained = Condition(self.pool_lock)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.max_pool = max_pool
+        self.writer = None
+        self.writer_error = None
+        self.closing = False
 
         if self.tables_to_cache:
             self.cache_tablenames()
+        if not isinstance(flush_every, NoneType) or \
+           not isinstance(flush_interval, NoneType):
+            self.writer = Thread(target=self._write)
+            self.writer.daemon = True
+            self.writer.start()
+            #flush whatever is left when the interpreter exits.
+            atexit.register(self.close)
 
     def create_database(self, table_name, *columns):
         """
@@ -25,7 +108,7 @@ class SQLEngine(object):
         where both elements of the tuple are strings. table_name will be
         used to create the table with the given columns.
         """
-        cursor = Connection(self.database_path)
+        cursor = self._connection()
         table_exists = self.table_exists(table_name)
         if not table_exists:
             query = "CREATE TABLE %s" % table_name
@@ -35,21 +118,53 @@ class SQLEngine(object):
                                     ])
             query += ");"
             cursor.execute(query)
+            cursor.commit()
             if self.tables_to_cache:
                 self.cache_tablenames()
         if table_exists:
             raise TableAlreadyExists("Table: `%s` already exists." % table_name)
-        cursor.close()
         return True
 
     def read_query(self, query, *args):
         """
         Execute and return results for a query.
         """
-        cursor = Connection(self.database_path, commit_after_execute=False)
+        cursor = self._connection()
         for result in cursor.execute(query, *args).fetchall():
             yield result
-        cursor.close()
+    def write_query(self, query, *args):
+        """
+        Execute a query that changes the database, and commit it. Returns
+        the number of rows changed so that conditional updates can tell if
+        they matched.
+        """
+        cursor = self._connection()
+        try:
+            changed = cursor.execute(query, *args).rowcount
+            cursor.commit()
+        except Exception:
+            cursor.rollback()
+            raise
+        return changed
+    def write_many(self, query, rows):
+        """
+        Execute a query once for every row of parameters in one transaction.
+        """
+        cursor = self._connection()
+        try:
+            cursor.executemany(query, rows)
+            cursor.commit()
+        except Exception:
+            cursor.rollback()
+            raise
+        return True
+    def store_raw(self, table_name):
+        """
+        Store the values of items pooled for a table as they are, instead of
+        as their repr, so numbers stay numbers and buffers become BLOBs.
+        """
+        self.raw_tables.add(table_name)
+        return True
     def cache_tablenames(self):
         """
         Create an in-memory list of all table names.
@@ -66,25 +181,22 @@ class SQLEngine(object):
         """
         Determine if a table exists in the database.
         """
-        cursor = Connection(self.database_path, commit_after_execute=False)
+        cursor = self._connection()
         query = "SELECT name FROM sqlite_master\
                  WHERE type = 'table' AND name = ?;"
         if len(cursor.execute(query, (table_name,)).fetchall()) == 1:
-            cursor.close()
             return True
         else:
-            cursor.close()
             return False
 
     def all_tables(self):
         """
         Return the name of all tables in the database.
         """
-        cursor = Connection(self.database_path, commit_after_execute=False)
+        cursor = self._connection()
         query = "SELECT name FROM sqlite_master \
                  WHERE type = 'table'"
         res = cursor.execute(query).fetchall()
-        cursor.close()
         return res
 
     def append_to_pool(self, item, table_name):
@@ -100,56 +212,122 @@ class SQLEngine(object):
         if new_item.get("__table_name") != None:
             raise ItemKeyReserved("`__table_name` is a reserved key.")
         new_item["__table_name"] = table_name
-        while self.pool_lock_activated:
-            pass
-        self.insert_pool.append(new_item)
+        with self.pool_lock:
+            self._wait_for_room()
+            self.insert_pool.append(new_item)
+            self._notify_writer()
+        return True
+    def extend_pool(self, items, table_name):
+        """
+        Append many items to the list to be entered into the DB at once.
+        Same as calling `append_to_pool` for every item, without waiting on
+        the pool for each one.
+        """
+        new_items = []
+        for item in items:
+            if not isinstance(item, dict):
+                raise TypeError("`item` must be type: `dict`.")
+            if item.get("__table_name") != None:
+                raise ItemKeyReserved("`__table_name` is a reserved key.")
+            new_item = item.copy()
+            new_item["__table_name"] = table_name
+            new_items.append(new_item)
+        with self.pool_lock:
+            self._wait_for_room()
+            self.insert_pool.extend(new_items)
+            self._notify_writer()
         return True
 
     def commit_pool(self):
         """
-        Insert all items currently in the pool to the database.
+        Insert all items currently in the pool to the database. Items are
+        grouped by table and columns, and every group is inserted with one
+        prepared statement, all in a single transaction. If an insert fails
+        nothing is committed and the items are put back in the pool.
+
+        The pool is swapped for an empty one before inserting, so items can
+        be added while the commit runs. They are left for the next commit.
         """
-        cursor = Connection(self.database_path)
-        if self.pool_lock.acquire():
-            current_pool = list(self.insert_pool)
-        for item in current_pool:
-            table_exists = True
-            if self.tables_to_cache:
-                if item["__table_name"] in self.cached_tablenames:
-                    pass
-                else:
-                    table_exists = False
-            else:
-                if self.table_exists(item["__table_name"]):
-                    pass
-                else:
-                    table_exists = False
-            if not table_exists:
-                raise InvalidTablename("The table `%s` does not exist."
-                                       % item["__table_name"])
-
-            columns = set(list(item.keys())) - set(["__table_name"])
-            column_values = list(repr(item.get(value))
-                                 if isinstance(value, str)
-                                 else item.get(value)
-                                 for value in columns)
-            query = "INSERT INTO %s" % item["__table_name"] + \
-                    "(" + ",".join(columns) + ")"
-            query += "VALUES (" + (",".join(
-                             list("?" for x in range(len(columns)))))+\
-                             ")"
-            cursor.execute(query, column_values)
-        self.pool_lock_activated = True
-        self.insert_pool = list(value for value in self.insert_pool
-                                if value not in current_pool)
-        self.pool_lock_activated = False
-        self.pool_lock.release()
-        cursor.close()
+        with self.commit_lock:
+            cursor = self._connection()
+            with self.pool_lock:
+                current_pool = self.insert_pool
+                self.insert_pool = collections.deque()
+                self.pool_drained.notify_all()
+            try:
+                #items built alike list their keys in the same order, so
+                #grouping on the unsorted keys is cheap and still correct.
+                groups = collections.OrderedDict()
+                for item in current_pool:
+                    groups.setdefault((item["__table_name"], tuple(item)),
+                                      []).append(item)
+                for table_name in set(table for table, keys in groups):
+                    if self.tables_to_cache:
+                        table_exists = table_name in self.cached_tablenames
+                    else:
+                        table_exists = self.table_exists(table_name)
+                    if not table_exists:
+                        raise InvalidTablename("The table `%s` does not exist."
+                                               % table_name)
+                try:
+                    for (table_name, keys), items in groups.items():
+                        columns = tuple(key for key in keys
+                                        if key != "__table_name")
+                        query = "INSERT INTO %s" % table_name + \
+                                "(" + ",".join(columns) + ")"
+                        query += "VALUES (" + ",".join("?" for column in
+                                                       columns) + ")"
+                        #values are stored as their repr, as they always were,
+                        #unless the table stores them raw.
+                        values = operator.itemgetter(*columns)
+                        if table_name in self.raw_tables:
+                            if len(columns) == 1:
+                                rows = ((values(item),) for item in items)
+                            else:
+                                rows = (values(item) for item in items)
+                        elif len(columns) == 1:
+                            rows = ((repr(values(item)),) for item in items)
+                        else:
+                            rows = (map(repr, values(item)) for item in items)
+                        cursor.executemany(query, rows)
+                    cursor.commit()
+                except Exception:
+                    cursor.rollback()
+                    raise
+            except Exception:
+                #keep the items, ahead of any added during the commit.
+                with self.pool_lock:
+                    current_pool.extend(self.insert_pool)
+                    self.insert_pool = current_pool
+                raise
+        return True
+    def close(self):
+        """
+        Stop the writer thread, if there is one, commit what is left in the
+        pool and close the calling thread's connection. Raises the error
+        that stopped the writer instead, if any.
+        """
+        if not isinstance(self.writer, NoneType):
+            with self.pool_lock:
+                self.closing = True
+                self.pool_filled.notify()
+            self.writer.join()
+            self.writer = None
+        try:
+            if not isinstance(self.writer_error, NoneType):
+                #raised once, the items it left in the pool can be committed
+                #later.
+                error, self.writer_error = self.writer_error, None
+                raise error
+            if len(self.insert_pool):
+                self.commit_pool()
+        finally:
+            self._close_connection()
         return True
     def convert_db_to_csv(self, path):
         """"""
         self.cache_tablenames()
-        con = Connection(self.database_path, commit_after_execute=False)
+        con = self._connection()
         for table in self.cached_tablenames:
             #empty query, used for descriptor
             t_rows = con.execute("SELECT * FROM %s LIMIT 1;" % table)
@@ -162,18 +340,100 @@ class SQLEngine(object):
                 for row in con.execute("SELECT * FROM %s;" % table):
                     #table rows
                     o_file.write(",".join(row) + "\n")
-        con.close()
         return True
 
+    def _connection(self):
+        """
+        Return the calling thread's connection, opening it on first use. A
+        forked process opens its own instead of sharing its parent's.
+        """
+        connections = self.connections
+        if getattr(connections, "pid", None) != os.getpid():
+            connections.connection = Connection(self.database_path,
+                                                commit_after_execute=False,
+                                                pragmas=self.pragmas)
+            connections.pid = os.getpid()
+        return connections.connection
+    def _close_connection(self):
+        """
+        Close the calling thread's connection, if it has one open.
+        """
+        if getattr(self.connections, "pid", None) == os.getpid():
+            self.connections.connection.close()
+        self.connections.__dict__.clear()
+    def _wait_for_room(self):
+        """
+        Block while the pool is full, until the writer has taken it. Called
+        with the pool lock held.
+        """
+        while not isinstance(self.writer, NoneType) and \
+              not isinstance(self.max_pool, NoneType) and \
+              len(self.insert_pool) >= self.max_pool and \
+              isinstance(self.writer_error, NoneType):
+            self.pool_drained.wait()
+        if not isinstance(self.writer_error, NoneType):
+            raise WriterFailed("The writer thread stopped: %s"
+                               % self.writer_error)
+    def _notify_writer(self):
+        """
+        Wake the writer if the pool is due to be committed. Called with the
+        pool lock held.
+        """
+        if isinstance(self.writer, NoneType):
+            return
+        if (not isinstance(self.flush_every, NoneType) and
+            len(self.insert_pool) >= self.flush_every) or \
+           (not isinstance(self.max_pool, NoneType) and
+            len(self.insert_pool) >= self.max_pool):
+            self.pool_filled.notify()
+    def _write(self):
+        """
+        Commit the pool whenever it fills or the flush interval passes,
+        until the engine is closed. Runs in the writer thread. An error
+        stops the writer, and is raised to the producers.
+        """
+        while True:
+            with self.pool_lock:
+                if not isinstance(self.flush_interval, NoneType):
+                    deadline = time.time() + self.flush_interval
+                while not self.closing and \
+                      (isinstance(self.flush_every, NoneType) or
+                       len(self.insert_pool) < self.flush_every) and \
+                      (isinstance(self.max_pool, NoneType) or
+                       len(self.insert_pool) < self.max_pool):
+                    if isinstance(self.flush_interval, NoneType):
+                        self.pool_filled.wait()
+                    else:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        self.pool_filled.wait(remaining)
+                closing = self.closing
+            if len(self.insert_pool):
+                try:
+                    self.commit_pool()
+                except Exception as error:
+                    with self.pool_lock:
+                        self.writer_error = error
+                        self.pool_drained.notify_all()
+                    self._close_connection()
+                    return
+            if closing:
+                self._close_connection()
+                return
+
 class Connection(object):
     """
     Connection provides a simple connection method to simplify SQL statement
     execution.
     """
-    def __init__(self, database, commit_after_execute=True):
+    def __init__(self, database, commit_after_execute=True, pragmas=None):
         self.database = sqlite3.connect(database)
         self.connection = self.database.cursor()
         self.commit_after_execute = commit_after_execute
+        #(name, value) pairs, applied before anything else.
+        for name, value in pragmas or []:
+            self.connection.execute("PRAGMA %s=%s;" % (name, value))
     def execute(self, sql_query, *args):
         """
         Execute an sql query and commit immediately afterwards.
@@ -182,6 +442,26 @@ class Connection(object):
         if self.commit_after_execute:
             self.database.commit()
         return self.connection
+    def executemany(self, sql_query, rows):
+        """
+        Execute an sql query for every row and commit once afterwards.
+        """
+        self.connection.executemany(sql_query, rows)
+        if self.commit_after_execute:
+            self.database.commit()
+        return self.connection
+    def commit(self):
+        """
+        Commit the changes made since the last commit.
+        """
+        self.database.commit()
+        return True
+    def rollback(self):
+        """
+        Discard the changes made since the last commit.
+        """
+        self.database.rollback()
+        return True
     def cursor(self):
         """
         Return self because execute is accessable through the class already.
@@ -220,3 +500,8 @@ class ItemKeyReserved(GeneralException):
     Raised when the __table_name is used in an item.
     """
     pass
+class WriterFailed(GeneralException):
+    """
+    Raised when items are added after the writer thread stopped on an error.
+    """
+    pass
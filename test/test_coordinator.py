@@ -0,0 +1,188 @@
+import fuzzer
+import unittest
+import multiprocessing
+import sqlite3
+import os
+from fuzzer.Coordinator import KeyspaceMismatch
+
+def run_worker(queue, worker_id):
+    """
+    Module level worker so that it can be run in its own process. Every
+    worker uses its own fuzzer on the shared database.
+    """
+    coordinator = fuzzer.Coordinator(
+                      fuzzer.Fuzzer(database="test_fuzzer_db.db",
+                                    table_name="attempts"),
+                      fuzzer.Keyspace(length=2, minimum=97, maximum=106),
+                      shard_size=7
+                  )
+    for result in coordinator.work(worker_id=worker_id, heartbeat_every=3):
+        queue.put(result.value)
+    queue.put(None)
+
+class TestCoordinator(unittest.TestCase):
+    """
+    Test that shards are leased without overlap.
+    """
+    def setUp(self):
+        self.keyspace = fuzzer.Keyspace(length=2, minimum=97, maximum=106)
+        self.fuzzer = fuzzer.Fuzzer(database="test_fuzzer_db.db",
+                                    table_name="attempts")
+        self.coordinator = fuzzer.Coordinator(self.fuzzer, self.keyspace,
+                                              shard_size=7)
+        self.coordinator.initialize()
+    def tearDown(self):
+        self.fuzzer.close()
+        os.remove("test_fuzzer_db.db")
+    def test_initialize(self):
+        """
+        Test to make sure that the shards cover the keyspace.
+        """
+        self.assertTrue(
+            self.coordinator.progress() == (0, 15),
+            msg="There should be 15 shards, none completed."
+        )
+        self.assertTrue(
+            self.coordinator.initialize(),
+            msg="initialize should accept an existing shard table."
+        )
+        with self.assertRaises(KeyspaceMismatch):
+            fuzzer.Coordinator(self.fuzzer, fuzzer.Keyspace(length=3),
+                               shard_size=7).initialize()
+    def test_claim_release(self):
+        """
+        Test to make sure that a leased shard is not claimed twice.
+        """
+        first = self.coordinator.claim("first")
+        second = self.coordinator.claim("second")
+        self.assertTrue(
+            (first.start, first.stop, second.start, second.stop) ==
+            (0, 7, 7, 14),
+            msg="Workers should claim consecutive shards."
+        )
+        self.assertTrue(
+            self.coordinator.heartbeat(first),
+            msg="A held lease should be renewable."
+        )
+        self.assertTrue(
+            self.coordinator.release(first, completed=False),
+            msg="A held lease should be releasable."
+        )
+        self.assertTrue(
+            self.coordinator.claim("third").shard_id == first.shard_id,
+            msg="A released shard should be claimed again."
+        )
+    def test_expired_lease(self):
+        """
+        Test to make sure that an expired lease is reassigned.
+        """
+        self.coordinator.lease_timeout = -1
+        crashed = self.coordinator.claim("crashed")
+        retried = self.coordinator.claim("retry")
+        self.assertTrue(
+            retried.shard_id == crashed.shard_id,
+            msg="An expired shard should be claimed by the next worker."
+        )
+        self.assertFalse(
+            self.coordinator.heartbeat(crashed),
+            msg="The original worker should learn that it lost the lease."
+        )
+    def test_work_commits(self):
+        """
+        Test to make sure that the outcomes of a shard are committed before
+        it is marked completed.
+        """
+        self.fuzzer.initialize()
+        connection = sqlite3.connect("test_fuzzer_db.db")
+        committed = None
+        for result in self.coordinator.work(worker_id="worker"):
+            if committed is None and self.coordinator.progress()[0] == 1:
+                committed = connection.execute(
+                                "SELECT COUNT(*) FROM attempts;").fetchone()[0]
+            result.fail()
+        connection.close()
+        self.assertTrue(
+            committed == 7,
+            msg="A completed shard's outcomes should be in the database."
+        )
+    def test_large_keyspace(self):
+        """
+        Test to make sure that shards beyond the range of an SQLite INTEGER
+        are handed out, and only stored once claimed.
+        """
+        coordinator = fuzzer.Coordinator(
+                          fuzzer.Fuzzer(database="test_fuzzer_db.db",
+                                        table_name="large"),
+                          fuzzer.Keyspace(length=8), shard_size=2 ** 62)
+        coordinator.initialize()
+        self.assertTrue(
+            coordinator.progress() == (0, 4),
+            msg="There should be 4 shards, none completed."
+        )
+        self.assertTrue(
+            list(self.fuzzer.sql_engine.read_query(
+                "SELECT COUNT(*) FROM large_shards;")) == [(0,)],
+            msg="No shard should be stored before it is claimed."
+        )
+        leases = list(coordinator.claim("worker") for number in range(5))
+        self.assertTrue(
+            list((lease.start, lease.stop) for lease in leases[:4]) ==
+            list((number * 2 ** 62, (number + 1) * 2 ** 62)
+                 for number in range(4)),
+            msg="The shard bounds should be computed without overflowing."
+        )
+        self.assertTrue(
+            leases[4] is None,
+            msg="There should be no shard past the end of the keyspace."
+        )
+        coordinator.fuzzer.close()
+    def test_length_sweep(self):
+        """
+        Test to make sure that a sweep over several lengths can be divided.
+        """
+        sweep = fuzzer.LengthSweep(min_length=1, max_length=2, minimum=97,
+                                   maximum=99)
+        coordinator = fuzzer.Coordinator(
+                          fuzzer.Fuzzer(database="test_fuzzer_db.db",
+                                        table_name="sweep"),
+                          sweep, shard_size=5)
+        coordinator.initialize()
+        self.assertTrue(
+            list(result.value for result in coordinator.work()) ==
+            list(sweep),
+            msg="Shards should span the lengths of the sweep."
+        )
+        coordinator.fuzzer.close()
+    def test_workers(self):
+        """
+        Test to make sure that several worker processes cover the keyspace
+        exactly once.
+        """
+        queue = multiprocessing.Queue()
+        workers = list(multiprocessing.Process(target=run_worker,
+                                               args=(queue, "w%s" % number))
+                       for number in range(3))
+        for worker in workers:
+            worker.start()
+        values = []
+        finished = 0
+        while finished < len(workers):
+            value = queue.get(timeout=30)
+            if value is None:
+                finished += 1
+            else:
+                values.append(value)
+        for worker in workers:
+            worker.join()
+        self.assertTrue(
+            sorted(values) == list(self.keyspace),
+            msg="Every candidate should be generated exactly once."
+        )
+        self.assertTrue(
+            self.coordinator.progress() == (15, 15),
+            msg="Every shard should be completed."
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import random
+from fuzzer.Corpus import Corpus, MUTATIONS
+
+class TestCorpus(unittest.TestCase):
+    """
+    Test the corpus of coverage guided fuzzing.
+    """
+    def setUp(self):
+        self.corpus = Corpus(random.Random(1), max_length=64)
+    def test_add(self):
+        """
+        Test to make sure that only inputs reaching new features are kept.
+        """
+        self.assertTrue(
+            self.corpus.add("a", [1, 2]).new_features == 2 and
+            self.corpus.add("b", [2]) is None and
+            self.corpus.add("c", [2, 3]).new_features == 1 and
+            self.corpus.add("d", [], force=True).new_features == 0,
+            msg="Inputs should be kept for new features only."
+        )
+        self.assertTrue(
+            list(entry.value for entry in self.corpus) == ["a", "c", "d"] and
+            self.corpus.features == set([1, 2, 3]),
+            msg="Kept inputs and reached features should be recorded."
+        )
+    def test_schedule(self):
+        """
+        Test to make sure that entries are repeated for their energy, which
+        favors new features and decays with picks.
+        """
+        first = self.corpus.add("a", [1, 2, 3])
+        second = self.corpus.add("b" * 100, [4])
+        self.assertTrue(
+            self.corpus.energy(first) > self.corpus.energy(second),
+            msg="More new features and smaller inputs should get more energy."
+        )
+        energy = self.corpus.energy(first)
+        schedule = self.corpus.schedule()
+        picked = list(next(schedule) for count in
+                      range(energy + self.corpus.energy(second)))
+        self.assertTrue(
+            picked.count(first) == energy and picked[-1] is second,
+            msg="Every entry should be picked for its energy in turn."
+        )
+        first.picks = 40
+        self.assertTrue(
+            self.corpus.energy(first) < energy,
+            msg="Energy should decay as an entry is picked."
+        )
+    def test_mutate(self):
+        """
+        Test to make sure that mutations change inputs within max_length.
+        """
+        self.corpus.add("seed", [1])
+        self.corpus.add("other", [2])
+        mutated = list(self.corpus.mutate("seed") for count in range(500))
+        self.assertTrue(
+            all(isinstance(value, str) and len(value) <= 64
+                for value in mutated) and
+            len(set(mutated)) > 400,
+            msg="Mutations should be varied and bounded."
+        )
+        generator = random.Random(2)
+        for mutation in MUTATIONS:
+            for value in ["", "a", "abcdef"]:
+                self.assertTrue(
+                    isinstance(mutation(bytearray(value), generator),
+                               bytearray),
+                    msg="%s should handle %r." % (mutation.__name__, value)
+                )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import unittest
+import os
+import sys
+import time
+import fuzzer
+from fuzzer import Executor
+from fuzzer.Harness import TargetCrashed, TargetTimeout
+
+#a persistent target, answering every attempt with a status code.
+PERSISTENT = """
+import os, struct, sys
+while True:
+    size = sys.stdin.read(4)
+    if len(size) < 4:
+        break
+    attempt = sys.stdin.read(struct.unpack(">I", size)[0])
+    if attempt == "crash":
+        os.kill(os.getpid(), 11)
+    if attempt == "exit":
+        sys.exit(0)
+    sys.stdout.write("0\\n" if attempt == "hit" else "1\\n")
+    sys.stdout.flush()
+"""
+
+#the same target, reading an attempt per line.
+PERSISTENT_LINES = """
+import sys
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    sys.stdout.write("0\\n" if line == "hit\\n" else "1\\n")
+    sys.stdout.flush()
+"""
+
+class TestExecutor(unittest.TestCase):
+    """
+    Test the execution of external programs as targets.
+    """
+    def test_modes(self):
+        """
+        Test to make sure that attempts reach the program in every mode.
+        """
+        stdin = Executor([sys.executable, "-c",
+                          "import sys; sys.exit(sys.stdin.read() != 'hit')"])
+        argv = Executor([sys.executable, "-c",
+                         "import sys; sys.exit(sys.argv[1] != 'hit')", "@@"],
+                        mode="argv")
+        path = Executor([sys.executable, "-c",
+                         "import sys; sys.exit(open(sys.argv[1]).read() !=\
+                                               'hit')", "@@"],
+                        mode="file")
+        for executor in [stdin, argv, path]:
+            self.assertTrue(
+                executor("hit") and not executor("miss"),
+                msg="The %s mode should give the program the attempt."
+                    % executor.mode
+            )
+        path.close()
+        with self.assertRaises(ValueError):
+            Executor(["cat"], mode="file")
+    def test_outcomes(self):
+        """
+        Test to make sure that signals and hangs are reported.
+        """
+        crash = Executor([sys.executable, "-c",
+                          "import os; os.kill(os.getpid(), 11)"])
+        with self.assertRaises(TargetCrashed):
+            crash("")
+        hang = Executor([sys.executable, "-c", "import time; time.sleep(30)"],
+                        timeout=0.3)
+        started = time.time()
+        with self.assertRaises(TargetTimeout):
+            hang("")
+        self.assertTrue(
+            time.time() - started < 5,
+            msg="A hung program should be killed at the timeout."
+        )
+    def test_persistent(self):
+        """
+        Test to make sure that a persistent program handles many attempts,
+        and is started again after it exits.
+        """
+        executor = Executor([sys.executable, "-c", PERSISTENT],
+                            persistent=True, timeout=5)
+        outcomes = list(executor(attempt) for attempt in
+                        ["miss", "hit"] * 200)
+        process = executor.process
+        self.assertTrue(
+            outcomes == [False, True] * 200,
+            msg="Every attempt should get the program's answer."
+        )
+        with self.assertRaises(TargetCrashed):
+            executor("crash")
+        self.assertTrue(
+            executor("exit") is True and executor("hit") and
+            executor.process is not process,
+            msg="The program should be started again once it exits."
+        )
+        executor.close()
+        self.assertTrue(executor.process is None,
+                        msg="Closing should stop the program.")
+    def test_persistent_framing(self):
+        """
+        Test to make sure that attempts containing newlines are sent whole,
+        and that a delimiter found in an attempt raises an error.
+        """
+        executor = Executor([sys.executable, "-c", PERSISTENT],
+                            persistent=True, timeout=5)
+        outcomes = list(executor(attempt) for attempt in
+                        ["a\nhit", "miss", "hit\n", "hit", "", "hit"])
+        executor.close()
+        self.assertTrue(
+            outcomes == [False, False, False, True, False, True],
+            msg="Every attempt should reach the program whole."
+        )
+        executor = Executor([sys.executable, "-c", PERSISTENT_LINES],
+                            persistent=True, delimiter="\n", timeout=5)
+        with self.assertRaises(ValueError, msg=
+            "An attempt containing the delimiter should raise an error."):
+            executor("a\nhit")
+        self.assertTrue(
+            executor("miss") is False and executor("hit") is True,
+            msg="Attempts after a rejected one should get their own answer."
+        )
+        executor.close()
+    def test_persistent_partial_line(self):
+        """
+        Test to make sure that a program hanging part way through its
+        status line still times out.
+        """
+        executor = Executor([sys.executable, "-c",
+                             "import sys, time; sys.stdin.read(5);\
+                              sys.stdout.write('0'); sys.stdout.flush();\
+                              time.sleep(30)"],
+                            persistent=True, timeout=0.5)
+        started = time.time()
+        with self.assertRaises(TargetTimeout):
+            executor("x")
+        self.assertTrue(
+            time.time() - started < 5,
+            msg="A partial line should not block past the timeout."
+        )
+        executor.close()
+    def test_run(self):
+        """
+        Test to make sure that an executor is a target for `Fuzzer.run`.
+        """
+        fuzz_instance = fuzzer.Fuzzer(database="test_fuzzer_db.db")
+        fuzz_instance.initialize()
+        executor = Executor([sys.executable, "-c", PERSISTENT],
+                            persistent=True, timeout=5)
+        try:
+            results = list(fuzz_instance.run(
+                               executor, fuzz_instance.grammar_fuzz(
+                                             {"<start>": ["hit", "miss",
+                                                          "crash"]}),
+                               workers=2, timeout=10))
+        finally:
+            fuzz_instance.close()
+            os.remove("test_fuzzer_db.db")
+        self.assertTrue(
+            sorted((result.value, result.successful, result.crash and
+                    result.crash[0]) for result in results) ==
+            [("crash", False, "crash"), ("hit", True, None),
+             ("miss", False, None)],
+            msg="Outcomes should come from the program."
+        )
+    def test_run_cleanup(self):
+        """
+        Test to make sure that the attempt files of forked workers are
+        removed once a run ends, even those of workers killed for hanging.
+        """
+        fuzz_instance = fuzzer.Fuzzer(database="test_fuzzer_db.db")
+        fuzz_instance.initialize()
+        executor = Executor([sys.executable, "-c",
+                             "import sys, time; attempt = open(sys.argv[1])\
+                              .read(); attempt != 'hang' or time.sleep(30);\
+                              sys.exit(attempt != 'hit')", "@@"],
+                            mode="file")
+        try:
+            results = list(fuzz_instance.run(
+                               executor, fuzz_instance.grammar_fuzz(
+                                             {"<start>": ["hit", "miss",
+                                                          "hang"]}),
+                               workers=2, timeout=1))
+            leftover = os.listdir(executor.directory)
+        finally:
+            fuzz_instance.close()
+            os.remove("test_fuzzer_db.db")
+        self.assertTrue(
+            sorted((result.value, result.crash and result.crash[0])
+                   for result in results) ==
+            [("hang", "timeout"), ("hit", None), ("miss", None)],
+            msg="The hung attempt should time out."
+        )
+        self.assertTrue(
+            leftover == [],
+            msg="Every worker's attempt file should be removed."
+        )
+
+if __name__ == "__main__":
+    unittest.main()
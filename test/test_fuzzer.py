@@ -2,12 +2,60 @@ import fuzzer
 import unittest
 import sqlite3
 import os
+import socket
+import threading
+import time
+import SocketServer
+from fuzzer.Fuzzer import Result
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def ends_with_z(attempt):
+    """
+    Module level check so that it can be sent to worker processes.
+    """
+    return attempt.endswith("z")
+
+def upper_character(value):
+    """
+    Module level evaluator so that it can be checkpointed.
+    """
+    return chr(value).upper()
+
+def magic_target(attempt):
+    """
+    Toy target exposing branch ids, nesting deeper for every matching byte
+    of "FUZ".
+    """
+    branches = [0]
+    for depth, character in enumerate("FUZ"):
+        if attempt[depth:depth + 1] != character:
+            break
+        branches.append(depth + 1)
+    return branches
+
+class EchoHandler(SocketServer.StreamRequestHandler):
+    """
+    Local network target, echoing every line back.
+    """
+    def handle(self):
+        self.wfile.write(self.rfile.readline())
+
+class EchoServer(SocketServer.ThreadingTCPServer):
+    """
+    Echo server with room for every concurrent connection in its backlog.
+    """
+    daemon_threads = True
+    request_queue_size = 128
 
 class TestFuzzer(unittest.TestCase):
     def setUp(self):
         self.fuzzer = fuzzer.Fuzzer(database="test_fuzzer_db.db")
         self.connection = sqlite3.connect("test_fuzzer_db.db")
     def tearDown(self):
+        self.fuzzer.close()
         self.connection.close()
         os.remove("test_fuzzer_db.db")
     def test_initialize(self):
@@ -29,6 +77,21 @@ class TestFuzzer(unittest.TestCase):
             ) == 1,
             msg="The table should be created for the fuzzer."
         )
+    def test_engine_options(self):
+        """
+        Test to make sure that engine options reach the database engine.
+        """
+        tuned = fuzzer.Fuzzer(database="test_fuzzer_db.db",
+                              engine_options={"synchronous": "NORMAL",
+                                              "flush_every": 10})
+        try:
+            self.assertTrue(
+                list(tuned.sql_engine.read_query("PRAGMA synchronous;")) ==
+                [(1,)] and tuned.sql_engine.flush_every == 10,
+                msg="Engine options should be passed to the engine."
+            )
+        finally:
+            tuned.close()
     def test_sequential_fuzz_default(self):
         """
         Test to make sure that the fuzzer works as expected (proper output).
@@ -153,6 +216,652 @@ class TestFuzzer(unittest.TestCase):
                     msg="All characters should be under the maximum value."
                 )
 
+    def test_sequential_fuzz_resume(self):
+        """
+        Test to make sure that a run continues from its last checkpoint.
+        """
+        self.fuzzer.initialize()
+
+        expected = list(result.value for result in
+                        self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                    maximum=106))
+        seen = []
+        for result in self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                  maximum=106,
+                                                  checkpoint_every=10):
+            if len(seen) == 35:
+                #simulate the run dying part way through.
+                break
+            seen.append(result.value)
+            result.success()
+        self.assertTrue(
+            self.connection.execute("SELECT COUNT(*) FROM %s;"
+                                    % self.fuzzer.table_name).fetchone()[0]
+            == 30,
+            msg="Outcomes before the last checkpoint should be committed."
+        )
+        for result in self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                  maximum=106,
+                                                  checkpoint_every=10,
+                                                  resume=True):
+            seen.append(result.value)
+        self.assertTrue(
+            seen == expected[:35] + expected[30:],
+            msg="The run should resume from the last checkpoint."
+        )
+        self.assertTrue(
+            list(self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                             maximum=106,
+                                             resume=True)) == [],
+            msg="A finished run should have nothing left to resume."
+        )
+        self.assertTrue(
+            len(list(self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                 maximum=107,
+                                                 resume=True))) == 121,
+            msg="Checkpoints should only apply to the same parameters."
+        )
+        for evaluator in [lambda value: chr(value), self.fuzzer.close]:
+            with self.assertRaises(ValueError):
+                list(self.fuzzer.sequential_fuzz(length=1,
+                                                 character_evaluator=evaluator,
+                                                 checkpoint_every=10))
+        self.assertTrue(
+            len(list(self.fuzzer.sequential_fuzz(length=1, minimum=97,
+                                                 maximum=106,
+                                                 character_evaluator=
+                                                     upper_character,
+                                                 resume=True))) == 10,
+            msg="Module level evaluators should be checkpointed."
+        )
+    def test_mask_fuzz(self):
+        """
+        Test to make sure that every position uses its own charset, and
+        masks resume from checkpoints.
+        """
+        self.fuzzer.initialize()
+
+        values = list(result.value for result in
+                      self.fuzzer.mask_fuzz("?u-?1??", charsets={"1": "x?d"},
+                                            prohibit=["5"]))
+        self.assertTrue(
+            values == list(upper + "-" + custom + "?"
+                           for upper in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+                           for custom in "x012346789"),
+            msg="Every position should be generated from its charset."
+        )
+        self.assertTrue(
+            self.fuzzer.mask_keyspace("?u?l?l?d?d").count == 26**3 * 100,
+            msg="The keyspace of a mask should have its exact size."
+        )
+        seen = []
+        for result in self.fuzzer.mask_fuzz("?d?h", checkpoint_every=20):
+            if len(seen) == 50:
+                break
+            seen.append(result.value)
+        for result in self.fuzzer.mask_fuzz("?d?h", checkpoint_every=20,
+                                            resume=True):
+            seen.append(result.value)
+        expected = list(digit + hexadecimal for digit in "0123456789"
+                        for hexadecimal in "0123456789abcdef")
+        self.assertTrue(
+            seen == expected[:50] + expected[40:],
+            msg="A mask run should resume from the last checkpoint."
+        )
+        self.assertTrue(
+            list(value for batch in
+                 self.fuzzer.sequential_fuzz_batches(batch_size=7, mask="?d?h")
+                 for value in batch) == expected,
+            msg="Batches should accept a mask."
+        )
+        with self.assertRaises(ValueError):
+            list(self.fuzzer.mask_fuzz("?l?"))
+        self.assertTrue(
+            list(result.value for result in
+                 self.fuzzer.sequential_fuzz(
+                     mask="a?d", character_evaluator=lambda value:
+                                                     chr(value).upper())) ==
+            list("a" + digit for digit in "0123456789"),
+            msg="Mask characters should not be evaluated."
+        )
+    def test_sequential_fuzz_lengths(self):
+        """
+        Test to make sure that a length sweep resumes and shards across
+        lengths.
+        """
+        self.fuzzer.initialize()
+
+        parameters = dict(minimum=97, maximum=99, min_length=1, max_length=3)
+        expected = list(result.value for result in
+                        self.fuzzer.sequential_fuzz(**parameters))
+        self.assertTrue(
+            expected[:4] == ["a", "b", "c", "aa"] and len(expected) == 39,
+            msg="Shorter lengths should be generated first."
+        )
+        seen = []
+        for result in self.fuzzer.sequential_fuzz(checkpoint_every=5,
+                                                  **parameters):
+            if len(seen) == 12:
+                break
+            seen.append(result.value)
+        for result in self.fuzzer.sequential_fuzz(checkpoint_every=5,
+                                                  resume=True, **parameters):
+            seen.append(result.value)
+        self.assertTrue(
+            seen == expected[:12] + expected[10:],
+            msg="A sweep should resume across lengths."
+        )
+        results = list(self.fuzzer.parallel_sequential_fuzz(
+                           ends_with_z, workers=2, shard_size=5, minimum=120,
+                           maximum=122, max_length=3))
+        self.assertTrue(
+            list(result.value for result in results) ==
+            list(result.value for result in self.fuzzer.sequential_fuzz(
+                     minimum=120, maximum=122, max_length=3)),
+            msg="Shards should be split across lengths."
+        )
+    def test_sequential_fuzz_bytes(self):
+        """
+        Test to make sure that bytes mode matches text mode for chr, and
+        supports wide elements.
+        """
+        self.fuzzer.initialize()
+
+        parameters = dict(length=2, minimum=97, maximum=106, prohibit=["c"],
+                          output_format="<{fuzzed_string}|{fuzzed_string}>")
+        self.assertTrue(
+            list(result.value for result in
+                 self.fuzzer.sequential_fuzz(mode="bytes", **parameters)) ==
+            list(result.value for result in
+                 self.fuzzer.sequential_fuzz(**parameters)),
+            msg="Bytes mode should produce the same attempts as chr."
+        )
+        values = list(result.value for result in
+                      self.fuzzer.sequential_fuzz(length=1, minimum=255,
+                                                  maximum=256, mode="bytes",
+                                                  element_width=2,
+                                                  byteorder="little"))
+        self.assertTrue(
+            values == ["\xff\x00", "\x00\x01"],
+            msg="Wide elements should be packed in the given byte order."
+        )
+        with self.assertRaises(ValueError):
+            list(self.fuzzer.sequential_fuzz(mode="bytes",
+                                             output_format="{fuzzed_string!r}"))
+    def test_random_fuzz_bytes(self):
+        """
+        Test to make sure that random bytes mode packs allowed numbers.
+        """
+        self.fuzzer.initialize()
+
+        for number, result in enumerate(
+                                  self.fuzzer.random_fuzz(
+                                       mode="bytes", minimum=97, maximum=100,
+                                       prohibit=["a"],
+                                       output_format="test:{fuzzed_string}"
+                                  )
+                              ):
+            if number >= 600:
+                break
+            self.assertTrue(
+                result.value.startswith("test:") and len(result.value) == 10
+                and set(result.value[5:]) <= set("bcd"),
+                msg="Bytes mode should only pack allowed numbers."
+            )
+        values = list(result.value for result in
+                      self.fuzzer.random_fuzz(length=2, minimum=97,
+                                              maximum=100, mode="bytes",
+                                              unique=True))
+        self.assertTrue(
+            sorted(values) == sorted(a + b for a in "abcd" for b in "abcd"),
+            msg="Unique bytes mode should visit every possibility once."
+        )
+    def test_wordlist_fuzz(self):
+        """
+        Test to make sure that wordlist results are mutated, filtered and
+        committed.
+        """
+        self.fuzzer.initialize()
+        with open("test_wordlist.txt", "wb") as wordlist:
+            wordlist.write("alpha\nbeta\ngamma\n")
+
+        try:
+            results = list(self.fuzzer.wordlist_fuzz(
+                               "test_wordlist.txt", rules=[":", "u"],
+                               prohibit=["B"],
+                               output_format="test:{fuzzed_string}",
+                               chunk_size=4
+                           ))
+            for result in results:
+                result.success()
+            self.fuzzer.commit_to_database()
+        finally:
+            os.remove("test_wordlist.txt")
+        self.assertTrue(
+            list(result.value for result in results) ==
+            ["test:alpha", "test:ALPHA", "test:beta", "test:gamma",
+             "test:GAMMA"],
+            msg="Every word should be yielded once per allowed rule."
+        )
+        self.assertTrue(
+            self.connection.execute("SELECT COUNT(*) FROM %s;"
+                                    % self.fuzzer.table_name).fetchone()[0]
+            == 5,
+            msg="Wordlist results should be committed."
+        )
+    def test_grammar_fuzz(self):
+        """
+        Test to make sure that grammar results are derived and committed.
+        """
+        self.fuzzer.initialize()
+
+        grammar = """
+            <start> ::= "/" <segment> | "/" <segment> <start>
+            <segment> ::= "a" | "b" | "c"
+        """
+        results = list(self.fuzzer.grammar_fuzz(
+                           grammar, max_depth=3, prohibit=["c"],
+                           output_format="GET {fuzzed_string}"))
+        for result in results:
+            result.success()
+        self.fuzzer.commit_to_database()
+        self.assertTrue(
+            list(result.value for result in results) ==
+            ["GET /a", "GET /b", "GET /a/a", "GET /a/b", "GET /b/a",
+             "GET /b/b"],
+            msg="Every allowed derivation should be yielded."
+        )
+        self.assertTrue(
+            self.connection.execute("SELECT COUNT(*) FROM %s;"
+                                    % self.fuzzer.table_name).fetchone()[0]
+            == 6,
+            msg="Grammar results should be committed."
+        )
+
+        def draw(seed):
+            return list(result.value for number, result in
+                        zip(range(20), self.fuzzer.grammar_fuzz(
+                                           grammar, strategy="random",
+                                           seed=seed)))
+        self.assertTrue(
+            draw(5) == draw(5) and
+            all(value.startswith("/") for value in draw(6)),
+            msg="Random derivations should be reproducible by seed."
+        )
+    def test_coverage_fuzz(self):
+        """
+        Test to make sure that coverage feedback finds a magic value, and
+        the corpus is saved and resumed.
+        """
+        self.fuzzer.initialize()
+
+        found = None
+        for result in self.fuzzer.coverage_fuzz(seeds=["hello"], seed=1,
+                                                iterations=200000):
+            branches = magic_target(result.value)
+            result.report(branches)
+            if 3 in branches:
+                found = result.value
+                break
+        self.assertTrue(
+            found is not None and found.startswith("FUZ"),
+            msg="Coverage feedback should reach the deepest branch."
+        )
+        corpus = self.connection.execute(
+                     "SELECT value, features FROM %s_corpus ORDER BY entry_id;"
+                     % self.fuzzer.table_name).fetchall()
+        #the input reaching branch 3 is not kept, the loop stopped on it.
+        self.assertTrue(
+            list(str(value).decode("hex") for value, features in corpus)[0] ==
+            "hello" and len(corpus) == 3,
+            msg="The seed and every input with new coverage should be saved."
+        )
+        resumed = list(result.value for result in
+                       self.fuzzer.coverage_fuzz(seeds=["unused"], seed=2,
+                                                 iterations=50, resume=True))
+        self.assertTrue(
+            len(resumed) == 50 and "unused" not in resumed,
+            msg="A resumed run should mutate the saved corpus."
+        )
+    def test_run(self):
+        """
+        Test to make sure that the harness submits outcomes and records
+        crashes.
+        """
+        self.fuzzer.initialize()
+
+        def target(attempt):
+            if attempt == "ab":
+                raise KeyError(attempt)
+            if attempt == "ba":
+                os._exit(3)
+            return attempt.endswith("b")
+        results = list(self.fuzzer.run(
+                           target, self.fuzzer.sequential_fuzz(
+                                       length=2, minimum=97, maximum=99),
+                           workers=2, timeout=5))
+        self.fuzzer.commit_to_database()
+        self.assertTrue(
+            sorted((result.value, result.successful, result.crash and
+                    result.crash[0]) for result in results) ==
+            [("aa", False, None), ("ab", False, "exception"),
+             ("ac", False, None), ("ba", False, "crash"), ("bb", True, None),
+             ("bc", False, None), ("ca", False, None), ("cb", True, None),
+             ("cc", False, None)],
+            msg="Every attempt should be run once and get its outcome."
+        )
+        self.assertTrue(
+            self.connection.execute(
+                "SELECT COUNT(*), SUM(successful = 'True') FROM %s;"
+                % self.fuzzer.table_name).fetchone() == (9, 2),
+            msg="Outcomes should be submitted automatically."
+        )
+        self.assertTrue(
+            self.connection.execute(
+                "SELECT attempted, kind, detail FROM %s_crashes ORDER BY kind;"
+                % self.fuzzer.table_name).fetchall() ==
+            [("'ba'", "crash", "exit code 3"),
+             ("'ab'", "exception", results[[result.value for result in
+                                            results].index("ab")].crash[1])],
+            msg="Crashes should be recorded."
+        )
+    def test_run_checkpoint(self):
+        """
+        Test to make sure that a checkpointed run only records candidates
+        whose outcomes are in, and that reused buffers are not rewritten
+        while in flight.
+        """
+        self.fuzzer.initialize()
+
+        def slow_target(attempt):
+            time.sleep(1 if attempt == "a" else 0.05)
+            return False
+        seen = []
+        for result in self.fuzzer.run(
+                          slow_target, self.fuzzer.sequential_fuzz(
+                                           length=1, minimum=97, maximum=104,
+                                           checkpoint_every=1),
+                          workers=2, timeout=5):
+            seen.append(result.value)
+            if len(seen) == 3:
+                #simulate the run dying while "a" is still in flight.
+                break
+        resumed = list(result.value for result in
+                       self.fuzzer.sequential_fuzz(length=1, minimum=97,
+                                                   maximum=104,
+                                                   checkpoint_every=1,
+                                                   resume=True))
+        self.assertTrue(
+            "a" not in seen and resumed == list("abcdefgh"),
+            msg="The run should resume from the lowest unfinished candidate."
+        )
+        for run in [self.fuzzer.run, self.fuzzer.arun]:
+            results = list(run(lambda attempt: attempt == bytearray("c"),
+                               self.fuzzer.sequential_fuzz(
+                                   length=1, minimum=97, maximum=100,
+                                   mode="bytes", reuse_buffer=True)))
+            self.assertTrue(
+                sorted((str(result.value), result.successful)
+                       for result in results) ==
+                [("a", False), ("b", False), ("c", True), ("d", False)],
+                msg="Every result should keep its own attempt."
+            )
+    def test_arun(self):
+        """
+        Test to make sure that a network target is run concurrently against
+        a local echo server.
+        """
+        self.fuzzer.initialize()
+        server = EchoServer(("127.0.0.1", 0), EchoHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        def target(attempt):
+            connection = socket.create_connection(server.server_address,
+                                                  timeout=5)
+            try:
+                connection.sendall(attempt + "\n")
+                echoed = connection.makefile().readline()
+            finally:
+                connection.close()
+            return echoed == "zz\n"
+        try:
+            results = list(self.fuzzer.arun(
+                               target, self.fuzzer.sequential_fuzz(
+                                           length=2, minimum=97, maximum=122),
+                               concurrency=32))
+            self.fuzzer.commit_to_database()
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertTrue(
+            sorted(result.value for result in results) ==
+            sorted(result.value for result in self.fuzzer.sequential_fuzz(
+                                                  length=2, minimum=97,
+                                                  maximum=122)) and
+            list(result.value for result in results
+                 if result.successful) == ["zz"],
+            msg="Every attempt should be sent and checked once."
+        )
+        self.assertTrue(
+            self.connection.execute("SELECT COUNT(*) FROM %s;"
+                                    % self.fuzzer.table_name).fetchone()[0]
+            == 676,
+            msg="Outcomes should be submitted."
+        )
+    def test_parallel_sequential_fuzz(self):
+        """
+        Test to make sure that every candidate is checked exactly once across
+        the worker processes.
+        """
+        self.fuzzer.initialize()
+
+        expected = list(result.value for result in
+                        self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                    maximum=122))
+        results = list(self.fuzzer.parallel_sequential_fuzz(
+                           ends_with_z, workers=3, shard_size=7,
+                           length=2, minimum=97, maximum=122
+                       ))
+        self.assertTrue(
+            list(result.value for result in results) == expected,
+            msg="No candidate should be generated twice or skipped."
+        )
+        for result in results:
+            self.assertTrue(
+                result.successful == result.value.endswith("z"),
+                msg="The check outcome should be set on the result."
+            )
+    def test_parallel_sequential_fuzz_successes_only(self):
+        """
+        Test to make sure that only successful results are returned when
+        requested.
+        """
+        self.fuzzer.initialize()
+
+        results = list(self.fuzzer.parallel_sequential_fuzz(
+                           ends_with_z, workers=2, successes_only=True,
+                           shard_size=5, length=2, minimum=97, maximum=122,
+                           prohibit=["a"]
+                       ))
+        self.assertTrue(
+            len(results) == 25,
+            msg="Only successful results should be returned."
+        )
+        for result in results:
+            self.assertTrue(
+                result.successful and "a" not in result.value,
+                msg="Results should be successful and not prohibited."
+            )
+    def test_sequential_fuzz_batches(self):
+        """
+        Test to make sure that batches hold the same attempts as
+        sequential_fuzz, in order.
+        """
+        self.fuzzer.initialize()
+
+        expected = list(result.value for result in
+                        self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                    maximum=106,
+                                                    output_format="x{fuzzed_string}"))
+        batches = list(self.fuzzer.sequential_fuzz_batches(
+                           batch_size=30, length=2, minimum=97, maximum=106,
+                           output_format="x{fuzzed_string}"
+                       ))
+        self.assertTrue(
+            list(len(batch) for batch in batches) == [30, 30, 30, 10],
+            msg="Batches should be full except for the last one."
+        )
+        self.assertTrue(
+            list(value for batch in batches for value in batch) == expected,
+            msg="Batches should contain every attempt in order."
+        )
+    def test_result_batch_outcomes(self):
+        """
+        Test to make sure that a batch submits outcomes for its attempts.
+        """
+        self.fuzzer.initialize()
+
+        batch = next(self.fuzzer.sequential_fuzz_batches(batch_size=10))
+        batch.success([1, 3])
+        batch.fail()
+        self.assertTrue(
+            len(self.fuzzer.sql_engine.insert_pool) == 12,
+            msg="Every marked attempt should be in the insert pool."
+        )
+        self.fuzzer.commit_to_database()
+        check_cursor = self.connection.cursor()
+        self.assertTrue(
+            len(
+                check_cursor.execute(
+                    "SELECT * FROM %s;" % self.fuzzer.table_name
+                ).fetchall()
+            ) == 12,
+            msg="Every marked attempt should be committed."
+        )
+    def test_compact_schema(self):
+        """
+        Test to make sure that the compact schema stores candidates as
+        BLOBs with integer outcomes and times, skips duplicates, and that
+        text tables can be migrated to it.
+        """
+        with self.assertRaises(ValueError, msg=
+            "An unknown schema should raise an error."):
+            fuzzer.Fuzzer(database="test_fuzzer_db.db", schema="binary")
+        with self.assertRaises(ValueError, msg=
+            "Deduplicating a text table should raise an error."):
+            fuzzer.Fuzzer(database="test_fuzzer_db.db", deduplicate=True)
+        compact = fuzzer.Fuzzer(database="test_fuzzer_db.db",
+                                table_name="compact", schema="compact",
+                                deduplicate=True)
+        try:
+            compact.initialize()
+            for result in compact.sequential_fuzz(length=1, minimum=97,
+                                                  maximum=99, prohibit=["b"]):
+                if result.value == "a":
+                    result.success()
+                else:
+                    result.fail()
+            for batch in compact.sequential_fuzz_batches(length=1,
+                                                         minimum=97,
+                                                         maximum=99,
+                                                         prohibit=["b"]):
+                batch.fail()
+            compact.commit_to_database()
+            rows = self.connection.execute(
+                       "SELECT attempted, prohibit_id, successful, created_at\
+                        FROM compact ORDER BY attempt_id;").fetchall()
+            self.assertTrue(
+                list((str(attempted), successful)
+                     for attempted, prohibit_id, successful, created_at
+                     in rows) == [("a", 1), ("c", 0)] and
+                all(isinstance(created_at, int) and
+                    abs(created_at - time.time()) < 60
+                    for attempted, prohibit_id, successful, created_at
+                    in rows),
+                msg="Candidates should be stored once, with integers."
+            )
+            self.assertTrue(
+                self.connection.execute("SELECT prohibit_id, prohibited FROM\
+                                         compact_prohibits;").fetchall() ==
+                [(rows[0][1], "['b']")],
+                msg="The prohibit list should be stored once."
+            )
+            tailed = next(compact.tail("compact", order_by="attempt_id"))
+            self.assertTrue(
+                tailed.value == "a" and tailed.prohibited == ["b"],
+                msg="Tailing should read compact rows."
+            )
+
+            self.fuzzer.initialize()
+            values = ["it's", 'say "\\x"', "\xff\x00", "\n"]
+            for value in values:
+                Result(self.fuzzer, value).success()
+            Result(self.fuzzer, "c", prohibited=["b"]).fail()
+            self.fuzzer.commit_to_database()
+            self.assertTrue(
+                compact.migrate(self.fuzzer.table_name, chunk_size=2) == 5,
+                msg="Every row of the text table should be read."
+            )
+            rows = self.connection.execute(
+                       "SELECT attempted, prohibit_id, successful FROM compact\
+                        ORDER BY attempt_id;").fetchall()
+            self.assertTrue(
+                list(str(row[0]) for row in rows) == ["a", "c"] + values and
+                list(row[2] for row in rows[2:]) == [1, 1, 1, 1] and
+                rows[2][1] != rows[0][1],
+                msg="Migrated candidates should be exact and deduplicated."
+            )
+        finally:
+            compact.close()
+    def test_random_fuzz_batches(self):
+        """
+        Test to make sure that random batches hold valid attempts, with and
+        without NumPy.
+        """
+        self.fuzzer.initialize()
+
+        prohibited = ["a", "b"]
+        for vectorized in [False, True]:
+            batch = next(self.fuzzer.random_fuzz_batches(
+                             batch_size=600, minimum=97, maximum=100,
+                             prohibit=prohibited, vectorized=vectorized
+                         ))
+            self.assertTrue(
+                len(batch) == 600,
+                msg="The batch should be the requested size."
+            )
+            for value in batch:
+                self.assertTrue(
+                    len(value) == 5 and set(value) <= set("cd"),
+                    msg="Attempts should only use allowed characters."
+                )
+    @unittest.skipIf(numpy is None, "numpy is not installed.")
+    def test_random_fuzz_batches_numpy(self):
+        """
+        Test to make sure that the NumPy path covers the whole range and
+        supports custom evaluators.
+        """
+        self.fuzzer.initialize()
+
+        batch = next(self.fuzzer.random_fuzz_batches(batch_size=20000,
+                                                     length=4))
+        self.assertTrue(
+            set("".join(batch.values)) == set(map(chr, range(256))),
+            msg="Every character from minimum to maximum should be drawn."
+        )
+        batch = next(self.fuzzer.random_fuzz_batches(
+                         batch_size=100, minimum=1000, maximum=1010,
+                         character_evaluator=lambda value: str(value % 10),
+                         output_format="test:{fuzzed_string}"
+                     ))
+        for value in batch:
+            self.assertTrue(
+                value.startswith("test:") and value[5:].isdigit() and
+                len(value) == 10,
+                msg="Custom evaluators should be looked up per character."
+            )
     def test_random_fuzz(self):
         """
         Test to make sure that generated characters are valid.
@@ -169,6 +878,60 @@ class TestFuzzer(unittest.TestCase):
                     ord(character) in range(256),
                     msg="Random character should be in ASCII range."
                 )
+    def test_random_fuzz_seed(self):
+        """
+        Test to make sure that seeded runs are reproducible and streams are
+        independent.
+        """
+        self.fuzzer.initialize()
+
+        def draw(**parameters):
+            return list(result.value for number, result in
+                        zip(range(50), self.fuzzer.random_fuzz(**parameters)))
+        self.assertTrue(
+            draw(seed=7) == draw(seed=7),
+            msg="The same seed should reproduce the same run."
+        )
+        self.assertTrue(
+            draw(seed=7) != draw(seed=8),
+            msg="Different seeds should give different runs."
+        )
+        self.assertTrue(
+            draw(seed=7, stream_id=0) != draw(seed=7, stream_id=1),
+            msg="Streams of the same seed should be independent."
+        )
+        for vectorized in [False, True]:
+            batches = list(next(self.fuzzer.random_fuzz_batches(
+                                    batch_size=50, seed=7, stream_id=stream,
+                                    vectorized=vectorized
+                                )).values for stream in [0, 0, 1])
+            self.assertTrue(
+                batches[0] == batches[1] and batches[0] != batches[2],
+                msg="Seeded batches should be reproducible per stream."
+            )
+    def test_random_fuzz_unique(self):
+        """
+        Test to make sure that unique random runs visit every possibility
+        exactly once and then stop.
+        """
+        self.fuzzer.initialize()
+
+        expected = sorted(result.value for result in
+                          self.fuzzer.sequential_fuzz(length=2, minimum=97,
+                                                      maximum=106,
+                                                      prohibit=["c"]))
+        values = list(result.value for result in
+                      self.fuzzer.random_fuzz(length=2, minimum=97,
+                                              maximum=106, prohibit=["c"],
+                                              unique=True, seed=3))
+        self.assertTrue(
+            sorted(values) == expected,
+            msg="Every possibility should be generated exactly once."
+        )
+        self.assertTrue(
+            values != expected,
+            msg="The possibilities should be in a random order."
+        )
     def test_random_fuzz_prohibit(self):
         """
         Test to make sure that generated characters are not in the prohibited
@@ -0,0 +1,97 @@
+import unittest
+import random
+import json
+from fuzzer import Grammar
+from fuzzer.Grammar import parse_bnf
+
+JSON_GRAMMAR = {
+    "<start>": ["<value>"],
+    "<value>": ["<object>", "<array>", "<number>", "\"<string>\"", "null"],
+    "<object>": ["{}", "{\"<string>\": <value>}"],
+    "<array>": ["[]", "[<value>]", "[<value>, <value>]"],
+    "<number>": ["<digit>", "-<digit>"],
+    "<digit>": ["0", "1", "9"],
+    "<string>": ["a", "<string>b"]
+}
+
+class TestGrammar(unittest.TestCase):
+    """
+    Test the derivations of grammars.
+    """
+    def test_derivations(self):
+        """
+        Test to make sure that every derivation is generated once,
+        shallower derivations first.
+        """
+        grammar = Grammar({"<start>": ["<digit>", "<digit><start>"],
+                           "<digit>": ["0", "1"]})
+        derivations = list(grammar.derivations(4))
+        self.assertTrue(
+            derivations == ["0", "1", "00", "01", "10", "11",
+                            "000", "001", "010", "011",
+                            "100", "101", "110", "111"],
+            msg="Derivations should be ordered by depth."
+        )
+        derivations = list(Grammar(JSON_GRAMMAR).derivations(6))
+        self.assertTrue(
+            len(derivations) == len(set(derivations)) and
+            all(json.loads(derivation) is not None or derivation == "null"
+                for derivation in derivations),
+            msg="Every derivation should be valid and unique."
+        )
+        grammar = Grammar(JSON_GRAMMAR)
+        list(grammar.derivations(5))
+        self.assertTrue(
+            ("<value>", 3) in grammar._expansions,
+            msg="Expansions of nonterminals should be memoized."
+        )
+    def test_random_derivation(self):
+        """
+        Test to make sure that random derivations stay within the depth.
+        """
+        grammar = Grammar(JSON_GRAMMAR)
+        allowed = set(Grammar(JSON_GRAMMAR).derivations(5))
+        generator = random.Random(3)
+        for attempt in range(200):
+            self.assertTrue(
+                grammar.random_derivation(generator, 5) in allowed,
+                msg="Random derivations should not be deeper than allowed."
+            )
+        with self.assertRaises(ValueError):
+            grammar.random_derivation(generator, 1)
+    def test_parse_bnf(self):
+        """
+        Test to make sure that BNF text is converted into a grammar.
+        """
+        grammar = parse_bnf("""
+            # sums
+            <start> ::= <number> | <number> " + " <start>
+            <number> ::= "1" | "2"
+                       | "(" <start> ")" | ""
+        """)
+        self.assertTrue(
+            grammar == {"<start>": [("<number>",),
+                                    ("<number>", " + ", "<start>")],
+                        "<number>": [("1",), ("2",),
+                                     ("(", "<start>", ")"), ("",)]},
+            msg="Rules, continuations and literals should be parsed."
+        )
+        self.assertTrue(
+            list(Grammar(grammar).derivations(3))[:4] == ["1", "2", "", "1 + 1"],
+            msg="A parsed grammar should be derivable."
+        )
+        for text in ["start ::= \"a\"", "<start> ::= a", "| \"a\""]:
+            with self.assertRaises(ValueError):
+                parse_bnf(text)
+    def test_invalid(self):
+        """
+        Test to make sure that broken grammars are rejected.
+        """
+        for grammar in [{"<start>": ["<missing>"]},
+                        {"<start>": ["<start>"]},
+                        {"<begin>": ["a"]}]:
+            with self.assertRaises(ValueError):
+                Grammar(grammar)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import os
+import signal
+import time
+from fuzzer.Harness import Harness, ThreadedHarness
+
+def flaky_target(attempt):
+    """
+    Toy target that hangs, crashes or raises on some attempts.
+    """
+    if attempt == "hang":
+        time.sleep(30)
+    if attempt == "crash":
+        os.kill(os.getpid(), signal.SIGSEGV)
+    if attempt == "raise":
+        raise ValueError(attempt)
+    return attempt == "hit"
+
+class TestHarness(unittest.TestCase):
+    """
+    Test the isolation of targets in worker processes.
+    """
+    def test_outcomes(self):
+        """
+        Test to make sure that every attempt gets an outcome, and lost
+        workers are replaced.
+        """
+        attempts = ["miss", "hang", "hit", "crash", "raise", "miss", "crash",
+                    "hit"]
+        harness = Harness(flaky_target, workers=2, timeout=0.5)
+        started = time.time()
+        outcomes = dict((key, (outcome, detail)) for key, outcome, detail in
+                        harness.run(enumerate(attempts)))
+        self.assertTrue(
+            time.time() - started < 10,
+            msg="A hung attempt should be killed at the timeout."
+        )
+        self.assertTrue(
+            list(outcomes[key][0] for key in range(len(attempts))) ==
+            ["fail", "timeout", "success", "crash", "exception", "fail",
+             "crash", "success"],
+            msg="Every attempt should get its own outcome."
+        )
+        self.assertTrue(
+            outcomes[3][1] == "exit code %s" % -signal.SIGSEGV and
+            "ValueError: raise" in outcomes[4][1],
+            msg="Crashes should record their exit code and exceptions their\
+                 traceback."
+        )
+        self.assertTrue(
+            harness.pool == [],
+            msg="Workers should be stopped when the attempts run out."
+        )
+    def test_native_hang(self):
+        """
+        Test to make sure that a target hung outside the interpreter, where
+        it can not handle signals, is killed at the timeout.
+        """
+        harness = Harness(lambda attempt: sum(xrange(10 ** 11)), workers=2,
+                          timeout=0.5)
+        started = time.time()
+        outcomes = list(outcome for key, outcome, detail in
+                        harness.run(enumerate(range(4))))
+        self.assertTrue(
+            outcomes == ["timeout"] * 4 and time.time() - started < 5,
+            msg="Hung workers should be killed without waiting."
+        )
+    def test_closures(self):
+        """
+        Test to make sure that targets do not have to be picklable.
+        """
+        expected = "b"
+        harness = Harness(lambda attempt: attempt == expected, workers=3)
+        self.assertTrue(
+            sorted(harness.run((value, value) for value in "abcdef")) ==
+            list((value, "success" if value == "b" else "fail", None)
+                 for value in "abcdef"),
+            msg="Closures should run in the forked workers."
+        )
+    def test_threaded(self):
+        """
+        Test to make sure that threaded attempts are in flight at once.
+        """
+        def slow_target(attempt):
+            time.sleep(0.2)
+            if attempt == "raise":
+                raise ValueError(attempt)
+            return attempt == "hit"
+        attempts = ["miss"] * 98 + ["hit", "raise"]
+        started = time.time()
+        outcomes = list(ThreadedHarness(slow_target, concurrency=50).run(
+                            enumerate(attempts)))
+        self.assertTrue(
+            time.time() - started < 2,
+            msg="Attempts should wait in parallel."
+        )
+        outcomes = sorted((key, outcome) for key, outcome, detail in outcomes)
+        self.assertTrue(
+            list(key for key, outcome in outcomes) == list(range(100)) and
+            outcomes[97:] == [(97, "fail"), (98, "success"),
+                              (99, "exception")],
+            msg="Every attempt should get its own outcome."
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,301 @@
+import unittest
+import itertools
+import random
+from fuzzer import Keyspace
+from fuzzer.Keyspace import Permutation, CachedEvaluator, parse_mask, \
+                            LengthSweep
+
+class TestKeyspace(unittest.TestCase):
+    """
+    Test the index mapping of the keyspace.
+    """
+    def setUp(self):
+        self.keyspace = Keyspace(length=3, minimum=97, maximum=100)
+    def test_len(self):
+        """
+        Test to make sure that the keyspace reports its size.
+        """
+        self.assertTrue(
+            len(self.keyspace) == 4 ** 3,
+            msg="The keyspace should contain every combination."
+        )
+        self.assertTrue(
+            Keyspace(length=8).count == 256 ** 8,
+            msg="count should support keyspaces too large for len."
+        )
+    def test_iteration_order(self):
+        """
+        Test to make sure that iteration is sequential and complete.
+        """
+        expected = list("".join(combination) for combination in
+                        itertools.product("abcd", repeat=3))
+        self.assertTrue(
+            list(self.keyspace) == expected,
+            msg="Iteration should walk every candidate in order."
+        )
+    def test_getitem(self):
+        """
+        Test to make sure that any index can be reached directly.
+        """
+        for index, candidate in enumerate(self.keyspace):
+            self.assertTrue(
+                self.keyspace[index] == candidate,
+                msg="Indexing should match iteration at %s." % index
+            )
+        self.assertTrue(
+            self.keyspace[-1] == "ddd",
+            msg="Negative indexes should count from the end."
+        )
+        with self.assertRaises(IndexError):
+            self.keyspace[len(self.keyspace)]
+        self.assertTrue(
+            Keyspace(length=5)[256 ** 5 - 1] == "\xff" * 5,
+            msg="The last candidate should be reachable without iterating."
+        )
+    def test_index(self):
+        """
+        Test to make sure that candidates map back to their index.
+        """
+        for index, candidate in enumerate(self.keyspace):
+            self.assertTrue(
+                self.keyspace.index(candidate) == index,
+                msg="index should be the inverse of indexing."
+            )
+        with self.assertRaises(ValueError):
+            self.keyspace.index("aaz")
+    def test_slicing(self):
+        """
+        Test to make sure that slices are views matching list slicing.
+        """
+        everything = list(self.keyspace)
+        for bounds in [(None, None, None), (5, 20, None), (3, None, 7),
+                       (-10, None, 2), (40, 10, None), (1, 63, 5)]:
+            view = self.keyspace[slice(*bounds)]
+            self.assertTrue(
+                list(view) == everything[slice(*bounds)],
+                msg="Slice %r should match list slicing." % (bounds,)
+            )
+            self.assertTrue(
+                len(view) == len(everything[slice(*bounds)]),
+                msg="Slice %r should report its length." % (bounds,)
+            )
+        view = self.keyspace[3::7]
+        self.assertTrue(
+            view.index(view[4]) == 4,
+            msg="index should be relative to the view."
+        )
+        self.assertTrue(
+            list(view[2:5]) == everything[3::7][2:5],
+            msg="Slices of slices should compose."
+        )
+    def test_batches(self):
+        """
+        Test to make sure that batches match iteration.
+        """
+        for view in [self.keyspace, self.keyspace[5:50], self.keyspace[::3]]:
+            batches = list(view.batches(7))
+            self.assertTrue(
+                sum(batches, []) == list(view),
+                msg="Batches should contain every candidate in order."
+            )
+            self.assertTrue(
+                all(len(batch) == 7 for batch in batches[:-1]),
+                msg="Every batch but the last should be full."
+            )
+    def test_batches_wide_characters(self):
+        """
+        Test to make sure that batches are right when characters are longer
+        than one byte.
+        """
+        for evaluator in [lambda value: "%02x" % value,
+                          lambda value: unichr(value).encode("utf-8")]:
+            keyspace = Keyspace(length=3, minimum=126, maximum=130,
+                                character_evaluator=evaluator)
+            self.assertTrue(
+                sum(list(keyspace[3:].batches(4)), []) == list(keyspace[3:]),
+                msg="Batches should match iteration for wide characters."
+            )
+        self.assertTrue(
+            next(Keyspace(length=2, minimum=0, maximum=1,
+                          character_evaluator=lambda value: "%02x" % value
+                         ).batches(2)) == ["0000", "0001"],
+            msg="The prefix should hold whole characters."
+        )
+    def test_iter_bytes(self):
+        """
+        Test to make sure that bytes iteration matches string iteration,
+        with and without a reused buffer.
+        """
+        view = Keyspace(length=3, minimum=97, maximum=100)[5::3]
+        expected = list("<%s|%s>" % (value, value) for value in view)
+        self.assertTrue(
+            list(view.iter_bytes("<{fuzzed_string}|{fuzzed_string}>")) ==
+            expected,
+            msg="Bytes iteration should match string iteration."
+        )
+        buffers = []
+        for buffer in view.iter_bytes("<{fuzzed_string}|{fuzzed_string}>",
+                                      reuse_buffer=True):
+            buffers.append(buffer)
+            self.assertTrue(
+                str(buffer) == expected[len(buffers) - 1],
+                msg="The reused buffer should hold the current candidate."
+            )
+        self.assertTrue(
+            all(buffer is buffers[0] for buffer in buffers),
+            msg="The same buffer should be yielded every time."
+        )
+    def test_incremental_evaluation(self):
+        """
+        Test to make sure that only the positions that changed are
+        evaluated again.
+        """
+        calls = []
+        def counting_evaluator(value):
+            calls.append(value)
+            return chr(value)
+        keyspace = Keyspace(length=6, minimum=97, maximum=99,
+                            character_evaluator=counting_evaluator)
+        self.assertTrue(
+            list(keyspace) == list(Keyspace(length=6, minimum=97,
+                                            maximum=99)),
+            msg="Incremental evaluation should not change the candidates."
+        )
+        self.assertTrue(
+            len(calls) < 2 * len(keyspace),
+            msg="The evaluator should be called about once per candidate."
+        )
+    def test_values(self):
+        """
+        Test to make sure that the internal number list is exposed.
+        """
+        self.assertTrue(
+            self.keyspace.values(5) == [97, 98, 98],
+            msg="values should return the numbers at an index."
+        )
+    def test_prohibit(self):
+        """
+        Test to make sure that prohibited characters are pruned from the
+        alphabet instead of being filtered out.
+        """
+        keyspace = Keyspace(length=3, minimum=97, maximum=100,
+                            prohibit=["b", "d"])
+        self.assertTrue(
+            len(keyspace) == 2 ** 3,
+            msg="Only allowed characters should be counted."
+        )
+        self.assertTrue(
+            list(keyspace) == ["aaa", "aac", "aca", "acc",
+                               "caa", "cac", "cca", "ccc"],
+            msg="Prohibited characters should never be generated."
+        )
+        with self.assertRaises(ValueError):
+            Keyspace(length=3, minimum=97, maximum=98, prohibit=["a", "b"])
+    def test_permutation(self):
+        """
+        Test to make sure that a permutation is a keyed bijection.
+        """
+        for size in [0, 1, 2, 3, 17, 1000, 4097]:
+            self.assertTrue(
+                sorted(Permutation(size, random.Random(size))) ==
+                list(range(size)),
+                msg="Every index should be visited once for size %s." % size
+            )
+        self.assertTrue(
+            list(Permutation(100, random.Random(1))) ==
+            list(Permutation(100, random.Random(1))),
+            msg="The same keys should give the same permutation."
+        )
+        self.assertTrue(
+            list(Permutation(100, random.Random(1))) !=
+            list(Permutation(100, random.Random(2))),
+            msg="Different keys should give different permutations."
+        )
+    def test_evaluator_tables(self):
+        """
+        Test to make sure that a pure evaluator is only called once per
+        alphabet value and that the cache stays bounded.
+        """
+        calls = []
+
+        def evaluator(value):
+            calls.append(value)
+            return chr(value)
+        keyspace = Keyspace(length=3, minimum=97, maximum=100,
+                            character_evaluator=evaluator, pure_evaluator=True)
+        del calls[:]
+        candidates = list(keyspace)
+        self.assertTrue(
+            candidates == list(self.keyspace) and len(calls) == 0,
+            msg="A pure evaluator should only be called to build its table."
+        )
+        cached = CachedEvaluator(evaluator, 2)
+        del calls[:]
+        for value in [97, 98, 97, 99, 98, 97]:
+            self.assertTrue(cached(value) == chr(value),
+                            msg="The cache should return the evaluated value.")
+        self.assertTrue(
+            calls == [97, 98, 99, 98, 97] and len(cached.cache) == 2,
+            msg="The cache should hold at most `cache_size` values."
+        )
+    def test_mask(self):
+        """
+        Test to make sure that a mask gives every position its own alphabet.
+        """
+        keyspace = Keyspace(alphabets=parse_mask("?d?l-", {"1": "ab"}))
+        self.assertTrue(
+            keyspace.count == 260 and keyspace.length == 3,
+            msg="The size should be the product of the charset sizes."
+        )
+        self.assertTrue(
+            keyspace[0] == "0a-" and keyspace[27] == "1b-" and
+            keyspace.index("9z-") == 259,
+            msg="Indexes should follow the mixed radix of the mask."
+        )
+        self.assertTrue(
+            parse_mask("?1??", {"1": "b?da"}) ==
+            [[98] + list(range(48, 58)) + [97], [63]],
+            msg="Custom charsets should expand built in charsets."
+        )
+        for mask in ["?", "?x", "?1"]:
+            with self.assertRaises(ValueError):
+                parse_mask(mask)
+        with self.assertRaises(ValueError):
+            Keyspace(alphabets=parse_mask("?da"), prohibit=["a"])
+    def test_length_sweep(self):
+        """
+        Test to make sure that a sweep is one keyspace across lengths.
+        """
+        sweep = LengthSweep(min_length=1, max_length=3, minimum=97,
+                            maximum=99)
+        expected = list("".join(candidate) for length in [1, 2, 3]
+                        for candidate in itertools.product("abc",
+                                                           repeat=length))
+        self.assertTrue(
+            list(sweep) == expected and sweep.count == 39,
+            msg="Shorter lengths should come first."
+        )
+        for start, stop, step in [(0, 39, 1), (2, 20, 5), (3, 12, 2),
+                                  (11, 39, 3), (5, 5, 1)]:
+            self.assertTrue(
+                list(sweep[start:stop:step]) == expected[start:stop:step] and
+                list(value for batch in sweep[start:stop:step].batches(4)
+                     for value in batch) == expected[start:stop:step],
+                msg="Slices should span lengths: %s." % [start, stop, step]
+            )
+        self.assertTrue(
+            sweep[3] == "aa" and sweep.index("aab") == 13 and
+            sweep[10:].index("aab") == 3 and sweep.values(2) == [99],
+            msg="Indexes should count across lengths."
+        )
+        self.assertTrue(
+            list(LengthSweep(min_length=0, max_length=2,
+                             alphabets=parse_mask("?d?l"))[:4]) ==
+            ["", "0", "1", "2"],
+            msg="Masks should sweep over their prefixes."
+        )
+        with self.assertRaises(ValueError):
+            sweep.index("abcd")
+
+if __name__ == "__main__":
+    unittest.main()
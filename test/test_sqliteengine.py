@@ -1,4 +1,4 @@
-import unittest, os, sqlite3
+import unittest, os, sqlite3, threading, time
 import fuzzer.sqlengines.sqliteengine as SQLEngine
 
 class TestSQLEngine(unittest.TestCase):
@@ -12,6 +12,7 @@ class TestSQLEngine(unittest.TestCase):
         self.db_connection = sqlite3.connect(self.database_path)
         self.cursor = self.db_connection.cursor()
     def tearDown(self):
+        self.engine.close()
         self.db_connection.close()
         os.remove("test_fuzzer_db.db")
     def test_create_database(self):
@@ -137,6 +138,204 @@ class TestSQLEngine(unittest.TestCase):
             len(self.engine.insert_pool) == 0,
             msg="There should be no elements in the insert pool after commit."
         )
+    def test_commit_pool_groups(self):
+        """
+        Test to make sure that items of different tables and columns are all
+        committed, and that nothing is committed when a table is missing.
+        """
+        self.engine.create_database(self.testing_table_name,
+                                   ("test_row", "INT"), ("other_row", "TEXT"))
+        self.engine.create_database("second_table", ("test_row", "INT"))
+        self.engine.extend_pool(list({"test_row":number}
+                                     for number in range(100)),
+                                self.testing_table_name)
+        self.engine.append_to_pool({"test_row":1, "other_row":"a"},
+                                   self.testing_table_name)
+        self.engine.append_to_pool({"test_row":2}, "second_table")
+        self.engine.commit_pool()
+        rows = self.cursor.execute("SELECT test_row, other_row FROM %s" %
+                                   self.testing_table_name).fetchall()
+        self.assertTrue(
+            len(rows) == 101 and (1, u"'a'") in rows,
+            msg="Every item should be committed with its values as repr."
+        )
+        self.assertTrue(
+            self.cursor.execute("SELECT test_row FROM second_table"
+                               ).fetchall() == [(2,)],
+            msg="Items of another table should be committed to it."
+        )
+        self.engine.append_to_pool({"test_row":3}, self.testing_table_name)
+        self.engine.append_to_pool({"test_row":4}, "missing_table")
+        with self.assertRaises(SQLEngine.InvalidTablename, msg=
+            "commit_pool should raise an error for a missing table."):
+            self.engine.commit_pool()
+        self.assertTrue(
+            len(self.engine.insert_pool) == 2 and
+            len(self.cursor.execute("SELECT * FROM %s" %
+                                    self.testing_table_name).fetchall()) == 101,
+            msg="Nothing should be committed when a table is missing."
+        )
+        self.engine.insert_pool.clear()
+    def test_commit_pool_while_appending(self):
+        """
+        Test to make sure that items appended while the pool is committed are
+        kept for the next commit, and none are lost or committed twice.
+        """
+        self.engine.create_database(self.testing_table_name,
+                                   ("test_row", "INT"))
+        def produce():
+            for number in range(2000):
+                self.engine.append_to_pool({"test_row":number},
+                                           self.testing_table_name)
+        producers = list(threading.Thread(target=produce) for count in
+                         range(4))
+        for producer in producers:
+            producer.start()
+        while any(producer.is_alive() for producer in producers):
+            self.engine.commit_pool()
+        self.engine.commit_pool()
+        self.assertTrue(
+            len(self.engine.insert_pool) == 0 and
+            self.cursor.execute("SELECT COUNT(*) FROM %s" %
+                                self.testing_table_name).fetchall() ==
+            [(8000,)],
+            msg="Every appended item should be committed exactly once."
+        )
+    def test_writer(self):
+        """
+        Test to make sure that the writer thread commits the pool once it is
+        full or the interval passes, and flushes the rest on close.
+        """
+        self.engine.create_database(self.testing_table_name,
+                                   ("test_row", "INT"))
+        def committed():
+            return self.cursor.execute("SELECT COUNT(*) FROM %s" %
+                                       self.testing_table_name).fetchone()[0]
+        def wait_for(count):
+            deadline = time.time() + 5
+            while committed() < count and time.time() < deadline:
+                time.sleep(0.01)
+        engine = SQLEngine.SQLEngine(self.database_path, flush_every=10)
+        engine.extend_pool(list({"test_row":number} for number in range(25)),
+                           self.testing_table_name)
+        wait_for(25)
+        self.assertTrue(
+            committed() == 25 and len(engine.insert_pool) == 0,
+            msg="A full pool should be committed without commit_pool."
+        )
+        engine.append_to_pool({"test_row":25}, self.testing_table_name)
+        time.sleep(0.1)
+        self.assertTrue(
+            committed() == 25,
+            msg="A pool below flush_every should not be committed."
+        )
+        engine.close()
+        self.assertTrue(
+            committed() == 26 and not engine.writer,
+            msg="close should stop the writer and commit the rest."
+        )
+        engine = SQLEngine.SQLEngine(self.database_path, flush_interval=0.05,
+                                     max_pool=4)
+        for number in range(20):
+            engine.append_to_pool({"test_row":number},
+                                  self.testing_table_name)
+            self.assertTrue(
+                len(engine.insert_pool) <= 4,
+                msg="The pool should never grow past max_pool."
+            )
+        wait_for(46)
+        self.assertTrue(
+            committed() == 46,
+            msg="The pool should be committed once the interval passes."
+        )
+        engine.close()
+    def test_writer_error(self):
+        """
+        Test to make sure that an error in the writer thread is raised to
+        producers and on close, and that bad settings are rejected.
+        """
+        with self.assertRaises(ValueError, msg=
+            "max_pool without a writer should raise an error."):
+            SQLEngine.SQLEngine(self.database_path, max_pool=10)
+        engine = SQLEngine.SQLEngine(self.database_path, flush_every=1)
+        engine.append_to_pool({"test_row":1}, "missing_table")
+        engine.writer.join(5)
+        with self.assertRaises(SQLEngine.WriterFailed, msg=
+            "Items added after the writer failed should raise an error."):
+            engine.append_to_pool({"test_row":2}, "missing_table")
+        with self.assertRaises(SQLEngine.InvalidTablename, msg=
+            "close should raise the error that stopped the writer."):
+            engine.close()
+        self.assertTrue(
+            len(engine.insert_pool) == 1,
+            msg="Items the writer failed to commit should stay in the pool."
+        )
+        engine.insert_pool.clear()
+    def test_connections(self):
+        """
+        Test to make sure that every thread reuses one connection, with the
+        pragmas set, and that reads run while the pool is committed.
+        """
+        engine = SQLEngine.SQLEngine(self.database_path,
+                                     synchronous="NORMAL", cache_size=-4096,
+                                     temp_store="MEMORY")
+        connections = []
+        thread = threading.Thread(
+                     target=lambda: connections.append(engine._connection()))
+        thread.start()
+        thread.join()
+        self.assertTrue(
+            engine._connection() is engine._connection() and
+            connections[0] is not engine._connection(),
+            msg="Threads should reuse their own connection."
+        )
+        self.assertTrue(
+            list(engine.read_query("PRAGMA journal_mode;")) == [("wal",)] and
+            list(engine.read_query("PRAGMA synchronous;")) == [(1,)] and
+            list(engine.read_query("PRAGMA cache_size;")) == [(-4096,)],
+            msg="The pragmas should be set on the connection."
+        )
+        with self.assertRaises(ValueError, msg=
+            "Pragma values that are not numbers or words should raise."):
+            SQLEngine.SQLEngine(self.database_path, synchronous="OFF; DROP")
+        engine.create_database(self.testing_table_name, ("test_row", "INT"))
+        errors = []
+        def read():
+            try:
+                for count in range(200):
+                    list(engine.read_query("SELECT COUNT(*) FROM %s" %
+                                           self.testing_table_name))
+            except Exception as error:
+                errors.append(error)
+        reader = threading.Thread(target=read)
+        reader.start()
+        while reader.is_alive():
+            engine.extend_pool(list({"test_row":number}
+                                    for number in range(1000)),
+                               self.testing_table_name)
+            engine.commit_pool()
+        engine.close()
+        self.assertTrue(
+            errors == [],
+            msg="Reads should not fail while the pool is committed."
+        )
+    def test_store_raw(self):
+        """
+        Test to make sure that values of raw tables are stored as they are.
+        """
+        self.engine.create_database(self.testing_table_name,
+                                   ("test_row", "INT"), ("other_row", "BLOB"))
+        self.engine.store_raw(self.testing_table_name)
+        self.engine.append_to_pool({"test_row":20,
+                                    "other_row":buffer("\xff\x00")},
+                                   self.testing_table_name)
+        self.engine.commit_pool()
+        self.assertTrue(
+            self.cursor.execute("SELECT typeof(test_row), other_row FROM %s"
+                                % self.testing_table_name).fetchall() ==
+            [(u"integer", buffer("\xff\x00"))],
+            msg="Raw values should not be stored as their repr."
+        )
     def test_read_query(self):
         """
         Test to make sure that a read-only query works as expected.
@@ -0,0 +1,97 @@
+import unittest
+import os
+from fuzzer import Wordlist
+from fuzzer.Wordlist import compile_rule, read_rules, LEETSPEAK
+
+class TestWordlist(unittest.TestCase):
+    """
+    Test the streaming and mutation of wordlists.
+    """
+    def setUp(self):
+        with open("test_wordlist.txt", "wb") as wordlist:
+            wordlist.write("password\r\nletmein\r\n\r\nadmin")
+    def tearDown(self):
+        os.remove("test_wordlist.txt")
+    def test_words(self):
+        """
+        Test to make sure that every line is read, across chunks.
+        """
+        for chunk_size in [1, 3, 7, 1048576]:
+            self.assertTrue(
+                list(Wordlist("test_wordlist.txt",
+                              chunk_size=chunk_size).words()) ==
+                ["password", "letmein", "", "admin"],
+                msg="Lines should not depend on chunk size %s." % chunk_size
+            )
+        with open("test_wordlist.txt", "wb") as wordlist:
+            wordlist.write("")
+        self.assertTrue(
+            list(Wordlist("test_wordlist.txt")) == [],
+            msg="An empty wordlist should yield nothing."
+        )
+        with open("test_wordlist.txt", "wb") as wordlist:
+            wordlist.write("x\nab\r\ncd\r\n")
+        self.assertTrue(
+            list(Wordlist("test_wordlist.txt")) == ["x", "ab", "cd"],
+            msg="Mixed line endings should not leave carriage returns."
+        )
+    def test_rules(self):
+        """
+        Test to make sure that every word is mutated once per rule.
+        """
+        wordlist = Wordlist("test_wordlist.txt", rules=[":", "u", "c$1$2"])
+        self.assertTrue(
+            list(wordlist)[:6] == ["password", "PASSWORD", "Password12",
+                                   "letmein", "LETMEIN", "Letmein12"],
+            msg="Rules should be applied in order to every word."
+        )
+        wordlist = Wordlist("test_wordlist.txt",
+                            rules=[">6", lambda word: word[::-1]])
+        self.assertTrue(
+            list(wordlist) == ["password", "drowssap", "letmein", "niemtel",
+                               "", "nimda"],
+            msg="Rejected candidates should be left out."
+        )
+    def test_compile_rule(self):
+        """
+        Test to make sure that rule functions behave like hashcat's.
+        """
+        for rule, expected in [("l", "p@ssword"), ("t", "P@SSWORD"),
+                               ("T0", "P@ssword"), ("r", "drowss@p"),
+                               ("d", "p@sswordp@ssword"),
+                               ("p1", "p@sswordp@ssword"),
+                               ("f", "p@ssworddrowss@p"),
+                               ("^1 ^2", "21p@ssword"), ("$ ", "p@ssword "),
+                               ("[ ]", "@sswor"), ("D1", "pssword"),
+                               ("x14", "@ssw"), ("O14", "pord"),
+                               ("i1!", "p!@ssword"), ("o0P", "P@ssword"),
+                               ("'3", "p@s"), ("s@a", "password"),
+                               ("@s", "p@word"), ("z2", "ppp@ssword"),
+                               ("Z1", "p@sswordd"), ("{", "@sswordp"),
+                               ("}", "dp@sswor"), ("TZ", "p@ssword"),
+                               ("!@", None), ("/@", "p@ssword"),
+                               ("_8", "p@ssword")]:
+            self.assertTrue(
+                compile_rule(rule)("p@ssword") == expected,
+                msg="Rule `%s` should give %r." % (rule, expected)
+            )
+        self.assertTrue(
+            compile_rule(LEETSPEAK)("leetspeak") == "l3375p34k",
+            msg="The leetspeak rule should substitute every letter."
+        )
+        for rule in ["Y", "$", "T?"]:
+            with self.assertRaises(ValueError):
+                compile_rule(rule)
+    def test_read_rules(self):
+        """
+        Test to make sure that comments and blank lines are skipped.
+        """
+        with open("test_wordlist.txt", "wb") as rules:
+            rules.write("# comment\n:\n\n$ \r\nu\n")
+        self.assertTrue(
+            read_rules("test_wordlist.txt") == [":", "$ ", "u"],
+            msg="Only rules should be read."
+        )
+
+if __name__ == "__main__":
+    unittest.main()